@@ -0,0 +1,61 @@
+"""
+Microbenchmark of extract_documentation_content over the offline corpus.
+
+Times extraction of each corpus kind (AWS-style, Sphinx, GitHub README, huge
+pages, see standins.py) with the configured HTML parser, or each parser given
+with --parser.
+
+Usage:
+    python benchmarks/extraction.py [--pages 5] [--runs 5] [--parser lxml html.parser]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+from standins import CORPUS_KINDS, corpus_page, write_run_files  # noqa: E402
+
+from doc2beat.core import Doc2Beat  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure extract_documentation_content per corpus kind")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per kind (default: 5)")
+    parser.add_argument("--runs", type=int, default=5, help="Timed passes over each page (default: 5)")
+    parser.add_argument("--parser", nargs="+", help="HTML parsers to compare (default: html_parser in config.yaml)")
+    args = parser.parse_args()
+
+    print(f"{'parser':<12} {'kind':<8} {'KB/page':>8} {'median ms':>10} {'min ms':>8} {'MB/s':>7} {'chars out':>10}")
+    with tempfile.TemporaryDirectory(prefix="doc2beat-bench-") as directory:
+        for html_parser in args.parser or [None]:
+            overrides = {"html_parser": html_parser} if html_parser else {}
+            doc2beat = Doc2Beat(use_cache=False, **write_run_files(directory, **overrides))
+            for kind in CORPUS_KINDS:
+                pages = [(f"https://docs.example.com/{kind}/{n}", corpus_page(kind, n)) for n in range(args.pages)]
+                timings = []
+                out_chars = 0
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for _ in range(args.runs):
+                        for url, html in pages:
+                            start = time.perf_counter()
+                            text = doc2beat.extract_documentation_content(html, url)
+                            timings.append(time.perf_counter() - start)
+                            out_chars = len(text)
+                size = statistics.mean(len(html.encode("utf-8")) for _, html in pages)
+                median = statistics.median(timings)
+                print(
+                    f"{doc2beat.html_parser:<12} {kind:<8} {size / 1024:>8.1f} {median * 1000:>10.2f} "
+                    f"{min(timings) * 1000:>8.2f} {size / median / 1024 / 1024:>7.1f} {out_chars:>10}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Local stand-ins for OpenRouter and documentation sites, for offline benchmarks.
+
+- FakeOpenAIServer: OpenAI-compatible /v1/chat/completions with configurable
+  latency, server errors and 429s (with Retry-After), streaming and usage.
+  Batched style requests get a JSON answer with one style per requested item.
+- DocsServer: a fixed, generated corpus of documentation pages in the shapes
+  doc2beat meets in the wild: AWS-style, Sphinx, GitHub README and huge pages.
+  Pages carry ETags, so the document cache can revalidate them, and
+  /sitemap.xml lists them with lastmod dates.
+
+Both run on a background thread on an ephemeral port:
+
+    with FakeOpenAIServer(latency=0.2) as llm, DocsServer() as docs:
+        ... llm.base_url, docs.urls(100) ...
+
+Run this file to start both in the foreground:
+    python benchmarks/standins.py [--llm-port 8000] [--docs-port 8001] [--latency 0.2]
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import yaml
+
+CORPUS_KINDS = ["aws", "sphinx", "github", "huge"]
+
+WORDS = (
+    "install configure bucket policy run command check the a to of for with access token "
+    "endpoint request response deploy cluster node region create delete update permission "
+    "role user group key secret version release build test log error retry timeout"
+).split()
+
+REPO_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.yaml")
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng: random.Random, sentences: int = 5) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _aws_page(rng: random.Random, n: int) -> str:
+    steps = "".join(f"<li><p>{_sentence(rng)}</p></li>" for _ in range(6))
+    return (
+        "<!DOCTYPE html><html><head><title>Amazon S3 Guide</title><script>var awsDocs = {};</script>"
+        "<style>.x{}</style></head><body>"
+        "<header><nav>AWS &gt; Documentation &gt; Amazon S3 &gt; User Guide</nav></header>"
+        "<div id=\"left-column\"><ul>" + "".join(f"<li><a href='#'>Topic {i}</a></li>" for i in range(40)) + "</ul></div>"
+        f"<div id=\"main-col-body\"><h1>Working with buckets, part {n}</h1><p>{_paragraph(rng)}</p>"
+        f"<h2>Prerequisites</h2><p>{_paragraph(rng, 3)}</p><h2>Procedure</h2><ol>{steps}</ol>"
+        f"<div class=\"awsui-alert-type-warning\"><p>Warning: {_sentence(rng)}</p></div>"
+        f"<pre><code>aws s3 mb s3://bucket-{n}\naws s3 cp file.txt s3://bucket-{n}/</code></pre>"
+        f"<h2>Related</h2><p>{_paragraph(rng, 2)}</p></div>"
+        "<footer>Privacy | Site terms | Cookie preferences | © 2024, Amazon Web Services</footer></body></html>"
+    )
+
+
+def _sphinx_page(rng: random.Random, n: int) -> str:
+    sections = "".join(
+        f"<section id=\"s{i}\"><h2>Step {i}<a class=\"headerlink\" href=\"#s{i}\">¶</a></h2><p>{_paragraph(rng)}</p>"
+        f"<div class=\"highlight-console notranslate\"><div class=\"highlight\"><pre>$ tool run --step {i}</pre></div></div>"
+        "</section>"
+        for i in range(1, 6)
+    )
+    return (
+        "<html><head><title>Tutorial — Project docs</title></head><body>"
+        "<div class=\"sphinxsidebar\" role=\"navigation\"><ul>" + "".join(f"<li>Chapter {i}</li>" for i in range(30)) + "</ul></div>"
+        f"<div class=\"document\"><div class=\"body\" role=\"main\"><section><h1>Tutorial {n}</h1><p>{_paragraph(rng)}</p>"
+        f"<div class=\"admonition note\"><p class=\"admonition-title\">Note</p><p>{_sentence(rng)}</p></div>"
+        f"{sections}</section></div></div><div class=\"footer\">© Copyright 2024. Built with Sphinx.</div></body></html>"
+    )
+
+
+def _github_page(rng: random.Random, n: int) -> str:
+    items = "".join(f"<li>{_sentence(rng, 8)}</li>" for _ in range(8))
+    return (
+        "<html><body><header class=\"AppHeader\">Sign in Sign up Product Solutions Pricing</header><main>"
+        "<div class=\"repository-content\"><div id=\"readme\"><article class=\"markdown-body entry-content\">"
+        f"<h1>project-{n}</h1><p>{_paragraph(rng)}</p><h2>Installation</h2>"
+        f"<div class=\"highlight\"><pre>pip install project-{n}</pre></div><h2>Features</h2><ul>{items}</ul>"
+        f"<h2>Usage</h2><p>{_paragraph(rng, 4)}</p><blockquote><p>Note: {_sentence(rng)}</p></blockquote>"
+        "</article></div></div></main><footer>© 2024 GitHub, Inc. Terms Privacy Security Status</footer></body></html>"
+    )
+
+
+def _huge_page(rng: random.Random, n: int) -> str:
+    sections = "".join(
+        f"<h2>Reference {i}</h2>" + "".join(f"<p>{_paragraph(rng, 8)}</p>" for _ in range(8)) + "<ul>"
+        + "".join(f"<li><code>option_{i}_{j}</code> {_sentence(rng, 6)}</li>" for j in range(12))
+        + f"</ul><pre>tool configure --section {i}</pre>"
+        for i in range(40)
+    )
+    return f"<html><body><nav>Index</nav><main><h1>Complete reference {n}</h1>{sections}</main></body></html>"
+
+
+PAGE_BUILDERS = {"aws": _aws_page, "sphinx": _sphinx_page, "github": _github_page, "huge": _huge_page}
+
+
+@functools.lru_cache(maxsize=256)
+def corpus_page(kind: str, n: int) -> str:
+    """Page n of a corpus kind; the same arguments always give the same page."""
+    rng = random.Random(f"{kind}:{n}")
+    return PAGE_BUILDERS[kind](rng, n)
+
+
+class _BackgroundServer:
+    """A ThreadingHTTPServer run on a daemon thread."""
+
+    def __init__(self, handler, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _OpenAIHandler(_QuietHandler):
+    def do_POST(self):
+        server = self.server.owner
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, b'{"error": {"message": "not found"}}', "application/json")
+            return
+        server.count("requests")
+        time.sleep(server.delay())
+
+        roll = server.rng.random()
+        if roll < server.throttle_rate:
+            server.count("throttled")
+            body = json.dumps({"error": {"message": "Rate limit exceeded", "code": 429}}).encode()
+            self._send(429, body, "application/json", {"Retry-After": str(server.retry_after)})
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            server.count("errors")
+            self._send(500, b'{"error": {"message": "Internal server error", "code": 500}}', "application/json")
+            return
+
+        content = server.reply(request["messages"])
+        prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": prompt_tokens + len(content) // 4,
+        }
+        if request.get("stream"):
+            self._stream(request, content, usage)
+            return
+        body = json.dumps({
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }).encode()
+        self._send(200, body, "application/json")
+
+    def _stream(self, request: Dict, content: str, usage: Dict):
+        server = self.server.owner
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.close_connection = True
+        chunk_size = 80
+        base = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": request["model"]}
+        try:
+            for start in range(0, len(content), chunk_size):
+                delta = {"content": content[start:start + chunk_size]}
+                event = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(server.token_delay * chunk_size / 4)
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self.wfile.write(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early
+            server.count("streams_closed_early")
+
+
+class FakeOpenAIServer(_BackgroundServer):
+    """OpenAI-compatible chat completions stand-in."""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        lyrics_chars: int = 2500,
+        token_delay: float = 0.0,
+        seed: int = 0,
+        port: int = 0
+    ):
+        """
+        Args:
+            latency: Seconds before each response starts
+            jitter: Extra random delay of up to this many seconds
+            error_rate: Fraction of requests answered with a 500
+            throttle_rate: Fraction of requests answered with a 429
+            retry_after: Retry-After seconds sent with 429s
+            lyrics_chars: Length of generated lyrics
+            token_delay: Seconds per token between streamed chunks
+            seed: Seed for latency jitter and failure injection
+            port: Port to listen on (0 for any free port)
+        """
+        super().__init__(_OpenAIHandler, port=port)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.lyrics_chars = lyrics_chars
+        self.token_delay = token_delay
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.address}/v1"
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def delay(self) -> float:
+        return self.latency + self.rng.uniform(0, self.jitter)
+
+    def reply(self, messages: List[Dict[str, str]]) -> str:
+        """Answer text for a request, shaped like what doc2beat asked for."""
+        prompt = messages[-1]["content"]
+        batch = re.search(r"Generate (\d+) different", prompt)
+        if batch and '"styles"' in prompt:
+            count = int(batch.group(1))
+            return json.dumps({"styles": [
+                {"id": i + 1, "style": f"Upbeat synth-pop, 120 BPM, bright female vocals, take {i + 1}"}
+                for i in range(count)
+            ]})
+        if "song description" in prompt:
+            return "Upbeat synth-pop, 120 BPM, bright female vocals, driving bass, hopeful mood"
+        if prompt.startswith("Condense"):
+            # Section digests for long documents
+            return "- " + "\n- ".join(_sentence(self.rng, 10) for _ in range(6))
+        verse = "Run the command, check the config, watch the logs roll by\n"
+        return (verse * (self.lyrics_chars // len(verse) + 1))[:self.lyrics_chars]
+
+
+class _DocsHandler(_QuietHandler):
+    def do_GET(self):
+        server = self.server.owner
+        time.sleep(server.latency)
+        if self.path == "/sitemap.xml":
+            children = "".join(
+                f"<sitemap><loc>{server.address}/sitemap-{kind}.xml</loc></sitemap>" for kind in CORPUS_KINDS
+            )
+            body = ('<?xml version="1.0" encoding="UTF-8"?><sitemapindex '
+                    f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{children}</sitemapindex>')
+            self._send(200, body.encode("utf-8"), "application/xml")
+            return
+        match = re.match(r"^/sitemap-(\w+)\.xml$", self.path)
+        if match and match.group(1) in PAGE_BUILDERS:
+            kind = match.group(1)
+            urls = "".join(
+                f"<url><loc>{server.address}/{kind}/{n}</loc><lastmod>{server.lastmod(kind, n)}</lastmod></url>"
+                for n in range(server.pages_per_kind)
+            )
+            body = ('<?xml version="1.0" encoding="UTF-8"?><urlset '
+                    f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+            self._send(200, body.encode("utf-8"), "application/xml")
+            return
+        match = re.match(r"^/(\w+)/(\d+)", self.path)
+        if not match or match.group(1) not in PAGE_BUILDERS:
+            self._send(404, b"<html><body>Not found</body></html>", "text/html; charset=utf-8")
+            return
+        body = corpus_page(match.group(1), int(match.group(2))).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+
+class DocsServer(_BackgroundServer):
+    """
+    Serves the generated documentation corpus at /<kind>/<n>.
+
+    /sitemap.xml is a sitemap index of one sitemap per kind, each listing
+    `pages_per_kind` pages. Pages in `changed` get a newer lastmod.
+    """
+
+    def __init__(self, latency: float = 0.02, pages_per_kind: int = 50, port: int = 0):
+        """
+        Args:
+            latency: Seconds before each page is served
+            pages_per_kind: Pages listed in each kind's sitemap
+            port: Port to listen on (0 for any free port)
+        """
+        super().__init__(_DocsHandler, port=port)
+        self.latency = latency
+        self.pages_per_kind = pages_per_kind
+        self.changed = set()
+
+    def lastmod(self, kind: str, n: int) -> str:
+        return "2024-06-01" if f"/{kind}/{n}" in self.changed else "2024-01-01"
+
+    def urls(self, count: int, kinds: Optional[List[str]] = None) -> List[str]:
+        """`count` page URLs cycling through the corpus kinds."""
+        kinds = kinds or CORPUS_KINDS
+        return [f"{self.address}/{kinds[i % len(kinds)]}/{i // len(kinds)}" for i in range(count)]
+
+
+def write_run_files(directory: str, api_base_url: Optional[str] = None, **overrides) -> Dict[str, str]:
+    """
+    Write creds.yaml and config.yaml for a benchmark run.
+
+    The config starts from the repository's config.yaml, with api_base_url and
+    the document cache pointed into `directory`.
+
+    Args:
+        directory: Scratch directory
+        api_base_url: Endpoint of the fake OpenAI server
+        **overrides: Top-level config keys to replace
+
+    Returns:
+        Dictionary with 'creds_path' and 'config_path'
+    """
+    with open(REPO_CONFIG, "r") as f:
+        config = yaml.safe_load(f)
+    if api_base_url:
+        config["api_base_url"] = api_base_url
+    config["cache"] = dict(config.get("cache") or {}, directory=os.path.join(directory, "cache"))
+    config.update(overrides)
+
+    paths = {"creds_path": os.path.join(directory, "creds.yaml"), "config_path": os.path.join(directory, "config.yaml")}
+    with open(paths["creds_path"], "w") as f:
+        yaml.safe_dump({"openrouter_api_key": "sk-offline-benchmark"}, f)
+    with open(paths["config_path"], "w") as f:
+        yaml.safe_dump(config, f)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline stand-in servers in the foreground")
+    parser.add_argument("--llm-port", type=int, default=8000, help="Fake OpenAI server port (default: 8000)")
+    parser.add_argument("--docs-port", type=int, default=8001, help="Docs server port (default: 8001)")
+    parser.add_argument("--latency", type=float, default=0.2, help="LLM response latency in seconds (default: 0.2)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of LLM requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of LLM requests failing with 429")
+    args = parser.parse_args()
+
+    llm = FakeOpenAIServer(
+        latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate, port=args.llm_port
+    )
+    docs = DocsServer(port=args.docs_port)
+    with llm, docs:
+        print(f"Fake OpenAI API: {llm.base_url}  (set api_base_url in config.yaml)")
+        print(f"Docs corpus:     {docs.address}/<{'|'.join(CORPUS_KINDS)}>/<n>")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
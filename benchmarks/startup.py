@@ -0,0 +1,95 @@
+"""
+Startup benchmark for the doc2beat CLI.
+
+Measures, in fresh interpreter processes:
+- import time of doc2beat.cli and of the doc2beat package
+- cold start of `doc2beat --help` and of a usage error (no --url or --input)
+- which heavy dependencies each of those loads
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--max-ms 300]
+
+With --max-ms, exits with status 1 if the median --help cold start is slower,
+or if --help loads pandas or openai.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["pandas", "openai", "bs4", "yaml", "httpx"]
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Each scenario prints the heavy modules it loaded as JSON on its last line
+SCENARIOS = {
+    "import doc2beat.cli": "import doc2beat.cli",
+    "import doc2beat": "import doc2beat",
+    "doc2beat --help": "import sys; sys.argv = ['doc2beat', '--help']\n"
+                       "from doc2beat.cli import main\n"
+                       "try:\n    main()\nexcept SystemExit:\n    pass",
+    "doc2beat (usage error)": "import sys; sys.argv = ['doc2beat']\n"
+                              "from doc2beat.cli import main\n"
+                              "try:\n    main()\nexcept SystemExit:\n    pass",
+}
+
+REPORT = (
+    "\nimport json, sys\n"
+    f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]), file=sys.__stdout__)"
+)
+
+
+def run_scenario(code: str):
+    """Run code in a fresh interpreter and return (seconds, heavy modules loaded)."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", code + REPORT],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+    return elapsed, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure doc2beat CLI startup time")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per scenario (default: 10)")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median --help cold start exceeds this")
+    args = parser.parse_args()
+
+    baseline = statistics.median(run_scenario("pass")[0] for _ in range(args.runs))
+    print(f"{'scenario':<26} {'median ms':>10} {'min ms':>8}  heavy modules loaded")
+    print(f"{'python (empty)':<26} {baseline * 1000:>10.1f} {'':>8}")
+
+    failed = False
+    for name, code in SCENARIOS.items():
+        timings = []
+        loaded = []
+        for _ in range(args.runs):
+            elapsed, loaded = run_scenario(code)
+            timings.append(elapsed)
+        median = statistics.median(timings)
+        print(f"{name:<26} {median * 1000:>10.1f} {min(timings) * 1000:>8.1f}  {', '.join(loaded) or '-'}")
+
+        if name == "doc2beat --help" and args.max_ms is not None:
+            if median * 1000 > args.max_ms:
+                print(f"  FAIL: median {median * 1000:.1f} ms is over {args.max_ms:.1f} ms")
+                failed = True
+            if {"pandas", "openai"} & set(loaded):
+                print("  FAIL: --help should not import pandas or openai")
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+End-to-end batch throughput benchmark, fully offline.
+
+Starts the local stand-ins (fake OpenAI server and docs corpus, see
+standins.py), points a Doc2Beat instance at them through api_base_url, and
+times process_multiple_inputs over the corpus. Per-stage p50/p95 come from the
+run's metrics file. Nothing touches OpenRouter or live sites.
+
+Usage:
+    python benchmarks/throughput.py [--docs 200] [--concurrency 16] [--latency 0.2]
+        [--error-rate 0.02] [--throttle-rate 0.05] [--cache] [--runs 1]
+        [--min-docs-per-sec N]
+
+With --min-docs-per-sec, exits with status 1 if the median run is slower.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+from standins import CORPUS_KINDS, DocsServer, FakeOpenAIServer, write_run_files  # noqa: E402
+
+from doc2beat.core import Doc2Beat  # noqa: E402
+from doc2beat.metrics import STAGES, percentile  # noqa: E402
+
+
+def run_once(args, llm: FakeOpenAIServer, docs: DocsServer, directory: str) -> dict:
+    """Process the corpus once; returns wall time, row counts and per-stage timings."""
+    paths = write_run_files(
+        directory,
+        api_base_url=llm.base_url,
+        stream_lyrics=args.stream,
+        pipeline={"report_interval": 0},
+    )
+    doc2beat = Doc2Beat(use_cache=args.cache, **paths)
+    inputs = [{"document_url": url} for url in docs.urls(args.docs, args.kinds)]
+    output_path = os.path.join(directory, "output.csv")
+    metrics_path = os.path.join(directory, "metrics.jsonl")
+    if os.path.exists(metrics_path):
+        os.remove(metrics_path)
+
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        doc2beat.process_multiple_inputs(
+            inputs, output_path, concurrency=args.concurrency, return_results=False, metrics_path=metrics_path
+        )
+    elapsed = time.perf_counter() - start
+    if args.verbose:
+        print(log.getvalue())
+
+    stages = defaultdict(list)
+    statuses = defaultdict(int)
+    with open(metrics_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            statuses[record["status"]] += 1
+            for stage in STAGES + ("total",):
+                if record[f"{stage}_seconds"]:
+                    stages[stage].append(record[f"{stage}_seconds"])
+    return {"seconds": elapsed, "statuses": dict(statuses), "stages": stages, "retries": doc2beat.controller.retries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure doc2beat batch throughput against local stand-ins")
+    parser.add_argument("--docs", type=int, default=200, help="Documents per run (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Batch concurrency (default: 16)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency in seconds (default: 0.2)")
+    parser.add_argument("--doc-latency", type=float, default=0.02, help="Docs server latency in seconds (default: 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of LLM requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of LLM requests failing with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s (default: 1)")
+    parser.add_argument("--kinds", nargs="+", choices=CORPUS_KINDS, help="Corpus kinds to cycle through (default: all)")
+    parser.add_argument("--stream", action="store_true", help="Stream lyric completions")
+    parser.add_argument("--cache", action="store_true", help="Use the document cache (warm after the first run)")
+    parser.add_argument("--runs", type=int, default=1, help="Runs, reported as the median (default: 1)")
+    parser.add_argument("--min-docs-per-sec", type=float, help="Fail if the median throughput is lower")
+    parser.add_argument("--verbose", action="store_true", help="Show doc2beat's own output")
+    args = parser.parse_args()
+
+    llm = FakeOpenAIServer(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+    )
+    docs = DocsServer(latency=args.doc_latency)
+    results = []
+    with llm, docs, tempfile.TemporaryDirectory(prefix="doc2beat-bench-") as directory:
+        for run in range(1, args.runs + 1):
+            result = run_once(args, llm, docs, directory)
+            results.append(result)
+            print(
+                f"run {run}: {result['seconds']:.2f}s, {args.docs / result['seconds']:.1f} docs/s, "
+                f"rows {result['statuses']}, retries {result['retries']}"
+            )
+
+    median = statistics.median(result["seconds"] for result in results)
+    docs_per_sec = args.docs / median
+    print(f"\n{args.docs} docs, concurrency {args.concurrency}, LLM latency {args.latency}s: "
+          f"median {median:.2f}s, {docs_per_sec:.1f} docs/s")
+    print(f"LLM requests: {llm.stats}")
+
+    last = results[-1]["stages"]
+    print(f"\n{'stage':<10} {'p50 s':>8} {'p95 s':>8}")
+    for stage in STAGES + ("total",):
+        if last.get(stage):
+            print(f"{stage:<10} {percentile(last[stage], 0.5):>8.3f} {percentile(last[stage], 0.95):>8.3f}")
+
+    if args.min_docs_per_sec is not None and docs_per_sec < args.min_docs_per_sec:
+        print(f"FAIL: {docs_per_sec:.1f} docs/s is under {args.min_docs_per_sec:.1f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,12 @@
 
 __version__ = "0.1.0"
 
-from .core import Doc2Beat
-
 __all__ = ["Doc2Beat"]
+
+
+def __getattr__(name):
+    # Imported on first use, so `import doc2beat.cli` doesn't load openai and friends
+    if name == "Doc2Beat":
+        from .core import Doc2Beat
+        return Doc2Beat
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,222 @@
+"""Token-aware trimming of document content for LLM prompts."""
+
+import re
+from collections import Counter
+from typing import Callable, List, Optional, Tuple
+
+
+# Content kinds in the order they are kept when the budget is tight
+HEADING, INSTRUCTION, LIST_ITEM, PROSE = range(4)
+
+NUMBERED_STEP = re.compile(r'\s*(?:\d+[.)]|step\s+\d+\b)', re.IGNORECASE)
+CALLOUT = re.compile(
+    r'(?:> |(?:warning|caution|danger|important|note|tip)\b)', re.IGNORECASE
+)
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# Prose blocks longer than this are split into sentences so that a budget
+# can take the start of a long paragraph (or an unstructured page)
+MAX_BLOCK_CHARS = 1500
+
+# Average characters per token, used when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+
+def _load_token_counter(model: str) -> Tuple[Callable[[str], int], str]:
+    """
+    Pick a token counter for a model.
+
+    OpenAI models get their own tiktoken encoding. Other models (Claude, Llama,
+    ...) use o200k_base, which is close enough for budgeting. Without tiktoken,
+    tokens are estimated from the character count.
+
+    Returns:
+        Tuple of the counting function and a description of it
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return (lambda text: (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN), 'estimated'
+
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model.split('/')[-1])
+        except KeyError:
+            encoding = tiktoken.get_encoding('o200k_base')
+    except Exception:
+        # Encodings are downloaded on first use, which fails offline
+        return (lambda text: (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN), 'estimated'
+    return (lambda text: len(encoding.encode(text, disallowed_special=()))), encoding.name
+
+
+def classify_block(block: str) -> int:
+    """
+    Rank a block of extracted text by how instructional it is.
+
+    Args:
+        block: One block of the Markdown-like text from extraction
+
+    Returns:
+        HEADING, INSTRUCTION (numbered steps, code, commands, warnings),
+        LIST_ITEM or PROSE
+    """
+    if block.startswith('#'):
+        return HEADING
+    if block.startswith('```') or NUMBERED_STEP.match(block) or CALLOUT.match(block) or block.startswith('$ '):
+        return INSTRUCTION
+    if block.lstrip().startswith('- '):
+        return LIST_ITEM
+    return PROSE
+
+
+def split_blocks(text: str) -> List[str]:
+    """
+    Split extracted text into blocks, keeping fenced code blocks whole.
+
+    Args:
+        text: Extracted document text (blocks separated by blank lines)
+
+    Returns:
+        Non-empty blocks in document order
+    """
+    blocks: List[str] = []
+    fence: Optional[List[str]] = None
+    for chunk in re.split(r'\n\s*\n', text):
+        if fence is not None:
+            fence.append(chunk)
+            if chunk.rstrip().endswith('```'):
+                blocks.append('\n\n'.join(fence))
+                fence = None
+            continue
+        chunk = chunk.strip('\n')
+        if not chunk.strip():
+            continue
+        # A code block containing blank lines arrives as several chunks
+        if chunk.startswith('```') and (chunk.count('```') % 2 == 1):
+            fence = [chunk]
+            continue
+        if len(chunk) > MAX_BLOCK_CHARS and classify_block(chunk) == PROSE:
+            blocks.extend(sentence for sentence in SENTENCE_END.split(chunk) if sentence)
+        else:
+            blocks.append(chunk)
+    if fence is not None:
+        blocks.append('\n\n'.join(fence))
+    return blocks
+
+
+class ContentBudget:
+    """
+    Fit document content into a token budget, keeping instructions over prose.
+
+    When the content is over budget, blocks are taken by priority (headings,
+    then numbered steps, code, commands and warnings, then other list items,
+    then prose), each tier in document order, and the blocks that fit are put
+    back in their original order.
+    """
+
+    def __init__(self, model: str, max_tokens: int = 4000):
+        """
+        Args:
+            model: Model the prompt is for, used to pick the tokenizer
+            max_tokens: Token budget for the document content (0 for no limit)
+        """
+        self.model = model
+        self.max_tokens = max_tokens
+        self.count_tokens, self.tokenizer = _load_token_counter(model)
+
+    def fit(self, text: str, max_tokens: Optional[int] = None) -> Tuple[str, int, int]:
+        """
+        Trim text to the budget.
+
+        Args:
+            text: Extracted document text
+            max_tokens: Budget to use instead of self.max_tokens
+
+        Returns:
+            Tuple of the trimmed text, its token count and the token count of the original
+        """
+        max_tokens = self.max_tokens if max_tokens is None else max_tokens
+        total_tokens = self.count_tokens(text)
+        if not max_tokens or total_tokens <= max_tokens:
+            return text, total_tokens, total_tokens
+
+        blocks = split_blocks(text)
+        # Each block costs its own tokens plus roughly one for the separator
+        costs = [self.count_tokens(block) + 1 for block in blocks]
+        kinds = [classify_block(block) for block in blocks]
+
+        keep = [False] * len(blocks)
+        remaining = max_tokens
+        for kind in (HEADING, INSTRUCTION, LIST_ITEM, PROSE):
+            for i, block_kind in enumerate(kinds):
+                if block_kind == kind and costs[i] <= remaining:
+                    keep[i] = True
+                    remaining -= costs[i]
+
+        kept = '\n\n'.join(block for block, kept in zip(blocks, keep) if kept)
+        return kept, max_tokens - remaining, total_tokens
+
+
+def _heading_level(block: str) -> int:
+    return len(block) - len(block.lstrip('#'))
+
+
+def split_sections(
+    text: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+    max_sections: Optional[int] = None
+) -> List[str]:
+    """
+    Split extracted text into sections along heading boundaries.
+
+    Sections start at the top heading level that repeats on the page (e.g. each
+    `##` under a single `#` title), with deeper headings staying inside their
+    section. A section longer than max_tokens is split between blocks, and
+    adjacent small sections are packed together up to max_tokens, so a page of
+    many short sections doesn't turn into as many LLM calls.
+
+    Args:
+        text: Extracted document text
+        max_tokens: Maximum size of a section
+        count_tokens: Token counting function
+        max_sections: Optional cap on the number of sections. Past it, neighbouring
+            sections are merged even if that takes them over max_tokens.
+
+    Returns:
+        Sections in document order
+    """
+    blocks = split_blocks(text)
+    levels = Counter(_heading_level(block) for block in blocks if classify_block(block) == HEADING)
+    repeated = [level for level, count in levels.items() if count > 1]
+    boundary = min(repeated or levels or [0])
+
+    # Heading-delimited pieces of at most max_tokens, with their sizes
+    pieces: List[Tuple[List[str], int]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for block in blocks:
+        tokens = count_tokens(block) + 1
+        starts_section = classify_block(block) == HEADING and _heading_level(block) <= boundary
+        if current and (starts_section or current_tokens + tokens > max_tokens):
+            pieces.append((current, current_tokens))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        pieces.append((current, current_tokens))
+
+    packed: List[Tuple[List[str], int]] = []
+    for piece_blocks, tokens in pieces:
+        if packed and packed[-1][1] + tokens <= max_tokens:
+            packed[-1] = (packed[-1][0] + piece_blocks, packed[-1][1] + tokens)
+        else:
+            packed.append((piece_blocks, tokens))
+
+    if max_sections:
+        while len(packed) > max_sections:
+            # Merge the smallest neighbouring pair
+            i = min(range(len(packed) - 1), key=lambda j: packed[j][1] + packed[j + 1][1])
+            packed[i:i + 2] = [(packed[i][0] + packed[i + 1][0], packed[i][1] + packed[i + 1][1])]
+
+    return ['\n\n'.join(section_blocks) for section_blocks, _ in packed]
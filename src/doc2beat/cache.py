@@ -0,0 +1,249 @@
+"""Persistent on-disk cache of fetched documentation pages."""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Callable, Dict, Mapping, Optional, Union
+
+from .urls import normalize_url
+
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "doc2beat")
+
+
+class DocumentCache:
+    """
+    Cache of raw pages and their extracted text, keyed by normalized URL.
+
+    Each entry is a `<key>.json` metadata file (validators, timestamps and
+    extracted text) next to a `<key>.html` file with the raw response. Entries
+    younger than the TTL are used without touching the network; older ones are
+    revalidated with If-None-Match/If-Modified-Since. Digests of long-document
+    sections are kept alongside as `<hash>.section` files. When the cache grows
+    past its size cap, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        ttl: float = 12 * 3600,
+        max_bytes: int = 500 * 1024 * 1024,
+        extractor_version: Union[str, Callable[[], str]] = ""
+    ):
+        """
+        Open (and create if needed) a cache directory.
+
+        Args:
+            directory: Cache directory
+            ttl: Seconds an entry is served without revalidation
+            max_bytes: Size cap for the cache directory
+            extractor_version: Tag of the extraction code; cached text from another version is re-extracted.
+                A callable is called once, on first use.
+        """
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._extractor_version = extractor_version
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes: Optional[int] = None
+
+
+    @property
+    def extractor_version(self) -> str:
+        if callable(self._extractor_version):
+            self._extractor_version = self._extractor_version()
+        return self._extractor_version
+    def _path(self, url: str, suffix: str) -> str:
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Look up a URL.
+
+        Args:
+            url: Document URL
+
+        Returns:
+            Entry metadata, or None on a miss. 'extracted' is None when the
+            text was produced by a different extractor version.
+        """
+        path = self._path(url, ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("extractor_version") != self.extractor_version:
+            entry["extracted"] = None
+        # Reads count as use for LRU eviction
+        os.utime(path)
+        return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """Whether an entry is within its TTL and can be used without revalidation."""
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    @staticmethod
+    def validators(entry: Optional[Dict]) -> Dict[str, str]:
+        """
+        Build conditional request headers for revalidating an entry.
+
+        Args:
+            entry: Cached entry, or None
+
+        Returns:
+            Headers for the conditional GET (empty if nothing to revalidate)
+        """
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def raw(self, url: str) -> Optional[str]:
+        """Return the cached raw page for a URL, if present."""
+        try:
+            with open(self._path(url, ".html"), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(
+        self,
+        url: str,
+        html_content: str,
+        extracted: str,
+        headers: Mapping[str, str],
+        fetched_at: Optional[float] = None
+    ):
+        """
+        Store a fetched page and its extracted text.
+
+        Args:
+            url: Document URL
+            html_content: Raw page content
+            extracted: Extracted documentation text
+            headers: Response headers (for ETag/Last-Modified)
+            fetched_at: When the page was fetched (default: now)
+        """
+        entry = {
+            "url": url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fetched_at": fetched_at or time.time(),
+            "extractor_version": self.extractor_version,
+            "extracted": extracted,
+        }
+        old_size = self._entry_size(url)
+        self._write(self._path(url, ".html"), html_content)
+        self._write(self._path(url, ".json"), json.dumps(entry))
+        self._account(self._entry_size(url) - old_size)
+
+    def revalidated(self, url: str, entry: Dict, headers: Mapping[str, str]):
+        """
+        Record a 304 Not Modified response, restarting the entry's TTL.
+
+        Args:
+            url: Document URL
+            entry: The entry that was revalidated
+            headers: Response headers (servers may send updated validators)
+        """
+        entry = dict(entry)
+        entry["fetched_at"] = time.time()
+        entry["etag"] = headers.get("etag") or entry.get("etag")
+        entry["last_modified"] = headers.get("last-modified") or entry.get("last_modified")
+        self._write(self._path(url, ".json"), json.dumps(entry))
+
+    def get_section(self, key: str) -> Optional[str]:
+        """
+        Look up the digest of a document section.
+
+        Args:
+            key: Hash of the section text and everything else the digest depends on
+
+        Returns:
+            Cached digest, or None on a miss
+        """
+        path = os.path.join(self.directory, key + ".section")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                digest = f.read()
+        except OSError:
+            return None
+        os.utime(path)
+        return digest
+
+    def put_section(self, key: str, digest: str):
+        """Store the digest of a document section under its content hash."""
+        path = os.path.join(self.directory, key + ".section")
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        self._write(path, digest)
+        self._account(os.path.getsize(path) - old_size)
+
+    def clear(self):
+        """Remove every cached entry."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes = 0
+
+    def _write(self, path: str, data: str):
+        # Write to a temp file and rename so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _entry_size(self, url: str) -> int:
+        size = 0
+        for suffix in (".json", ".html"):
+            try:
+                size += os.path.getsize(self._path(url, suffix))
+            except OSError:
+                pass
+        return size
+
+    def _account(self, delta: int):
+        if self._total_bytes is None:
+            self._total_bytes = sum(
+                entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file()
+            )
+        else:
+            self._total_bytes += delta
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is back under 90% of its cap."""
+        entries = {}
+        for dir_entry in os.scandir(self.directory):
+            key, _, suffix = dir_entry.name.partition(".")
+            if not dir_entry.is_file():
+                continue
+            stat = dir_entry.stat()
+            size, last_used = entries.get(key, (0, 0.0))
+            # The .json and .section files' mtimes are bumped on every read, so they mark last use
+            if suffix in ("json", "section"):
+                last_used = stat.st_mtime
+            entries[key] = (size + stat.st_size, last_used)
+
+        total = sum(size for size, _ in entries.values())
+        target = self.max_bytes * 0.9
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= target:
+                break
+            for suffix in (".json", ".html", ".section"):
+                try:
+                    os.remove(os.path.join(self.directory, key + suffix))
+                except OSError:
+                    pass
+            total -= size
+        self._total_bytes = total
@@ -1,20 +1,31 @@
 """Command-line interface for doc2beat."""
 
 import argparse
+import os
 import sys
-from .core import Doc2Beat
+from .cache import DocumentCache, DEFAULT_CACHE_DIR
+from .output import ResultWriter
+from .pipeline import DEFAULT_CONCURRENCY
+
+# Heavy dependencies (openai, pandas, bs4, yaml) are only imported once the
+# arguments are valid, so --help and usage errors return right away
 
 
 def main():
     """Main CLI entry point."""
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
-        description="Convert technical documentation into songs"
+        description="Convert technical documentation into songs",
+        epilog="Run 'doc2beat serve --help' to keep a warm instance running as a local service."
     )
 
     parser.add_argument(
         "--url",
         type=str,
-        help="Single document URL to process"
+        help="Single document URL (or local file) to process"
     )
 
     parser.add_argument(
@@ -32,7 +43,26 @@ def main():
     parser.add_argument(
         "--input",
         type=str,
-        help="Path to input CSV file with document_url and optional song_style columns"
+        help="Input CSV file with document_url and optional song_style columns, or local docs to read "
+             "directly: a file, a directory or a glob such as 'docs/**/*.md' (quote it)"
+    )
+
+    parser.add_argument(
+        "--sitemap",
+        type=str,
+        help="Doc root or sitemap.xml URL; processes every page the sitemap lists (or that links reach from the root)"
+    )
+
+    parser.add_argument(
+        "--sitemap-state",
+        type=str,
+        help="With --sitemap, JSON file of page lastmods; only pages new or changed since the last run are processed"
+    )
+
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        help="With --sitemap, stop discovering after this many pages (default: sitemap.max_pages in config.yaml, or 5000)"
     )
 
     parser.add_argument(
@@ -56,6 +86,74 @@ def main():
         help="Path to configuration YAML file (default: config.yaml)"
     )
 
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Number of documents to process at the same time with --input (default: {DEFAULT_CONCURRENCY})"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="With --input, keep rows that already succeeded in --output and only process the rest (including failed rows)"
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="With --input or --sitemap, reuse songs from the manifest for documents whose content and model haven't changed"
+    )
+
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default="doc2beat-manifest.jsonl",
+        help="Manifest file used by --incremental (default: doc2beat-manifest.jsonl)"
+    )
+
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        help="In batch runs, write per-row stage timings, bytes fetched, tokens and cost to this JSON lines file"
+    )
+
+    parser.add_argument(
+        "--prometheus",
+        type=str,
+        help="In batch runs, write run totals and stage timings to this Prometheus textfile"
+    )
+
+    parser.add_argument(
+        "--metrics-columns",
+        action="store_true",
+        help="In batch runs, add the per-row metrics to the output CSV as extra columns"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download and re-extract pages instead of using the document cache"
+    )
+
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete the document cache before running (can be used on its own)"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help=f"Document cache directory (default: cache.directory in config.yaml, or {DEFAULT_CACHE_DIR})"
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="With --url, print the lyrics as they are generated"
+    )
+
     parser.add_argument(
         "--extra-creative",
         action="store_true",
@@ -64,38 +162,117 @@ def main():
 
     args = parser.parse_args()
 
+    # --clear-cache on its own doesn't need credentials
+    if args.clear_cache and not args.url and not args.input and not args.sitemap:
+        cache_dir = args.cache_dir
+        if cache_dir is None and os.path.exists(args.config):
+            import yaml
+            with open(args.config, 'r') as f:
+                cache_dir = ((yaml.safe_load(f) or {}).get('cache') or {}).get('directory')
+        cache = DocumentCache(cache_dir or DEFAULT_CACHE_DIR)
+        cache.clear()
+        print(f"Cleared document cache at {cache.directory}")
+        return
+
     # Validate arguments
-    if not args.url and not args.input:
-        parser.error("Either --url or --input must be provided")
+    sources = [name for name in ("url", "input", "sitemap") if getattr(args, name)]
+    if not sources:
+        parser.error("One of --url, --input or --sitemap must be provided")
 
-    if args.url and args.input:
-        parser.error("Cannot use both --url and --input")
+    if len(sources) > 1:
+        parser.error(f"Cannot use {' and '.join('--' + name for name in sources)} together")
+
+    batch = args.input or args.sitemap
+
+    if args.incremental and not batch:
+        parser.error("--incremental requires --input or --sitemap")
+
+    if args.resume and not args.input:
+        parser.error("--resume requires --input")
+
+    if (args.metrics or args.prometheus or args.metrics_columns) and not batch:
+        parser.error("--metrics, --prometheus and --metrics-columns require --input or --sitemap")
+
+    if (args.sitemap_state or args.max_pages) and not args.sitemap:
+        parser.error("--sitemap-state and --max-pages require --sitemap")
+
+    if args.stream and not args.url:
+        parser.error("--stream requires --url")
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    from .core import Doc2Beat
 
     try:
         # Initialize Doc2Beat
-        doc2beat = Doc2Beat(creds_path=args.creds, config_path=args.config, extra_creative=args.extra_creative)
+        doc2beat = Doc2Beat(
+            creds_path=args.creds,
+            config_path=args.config,
+            extra_creative=args.extra_creative,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir
+        )
+        if args.clear_cache and doc2beat.cache:
+            doc2beat.cache.clear()
 
         # Process single URL
         if args.url:
-            result = doc2beat.process_single_input(args.url, args.style, args.genre)
+            streamed = []
+
+            def print_lyrics(text):
+                if not streamed:
+                    print("\nSong Lyrics:")
+                streamed.append(text)
+                sys.stdout.write(text)
+                sys.stdout.flush()
+
+            on_lyrics = print_lyrics if args.stream else None
+            result = doc2beat.process_single_input(args.url, args.style, args.genre, on_lyrics=on_lyrics)
             
             # Save to CSV
-            import pandas as pd
-            df = pd.DataFrame([result])
-            df.to_csv(args.output, index=False)
+            with ResultWriter(args.output) as writer:
+                writer.add(0, result)
             print(f"\nResults saved to {args.output}")
 
             # Display results
             print("\n" + "=" * 80)
             print(f"Document URL: {result['document_url']}")
             print(f"Song Style: {result['song_style']}")
-            print("\nSong Lyrics:")
-            print(result['song_lyrics'])
+            if not args.stream:
+                print("\nSong Lyrics:")
+                print(result['song_lyrics'])
             print("=" * 80)
 
-        # Process from CSV
+        # Process from CSV, or local files
         elif args.input:
-            doc2beat.process_from_csv(args.input, args.output)
+            process = doc2beat.process_from_csv if args.input.lower().endswith('.csv') else doc2beat.process_from_paths
+            process(
+                args.input,
+                args.output,
+                concurrency=args.concurrency,
+                manifest_path=args.manifest if args.incremental else None,
+                resume=args.resume,
+                return_results=False,
+                metrics_path=args.metrics,
+                prometheus_path=args.prometheus,
+                metric_columns=True if args.metrics_columns else None
+            )
+
+        # Process a whole doc site
+        elif args.sitemap:
+            doc2beat.process_sitemap(
+                args.sitemap,
+                args.output,
+                concurrency=args.concurrency,
+                state_path=args.sitemap_state,
+                max_pages=args.max_pages,
+                manifest_path=args.manifest if args.incremental else None,
+                return_results=False,
+                metrics_path=args.metrics,
+                prometheus_path=args.prometheus,
+                metric_columns=True if args.metrics_columns else None
+            )
 
     except FileNotFoundError as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -107,5 +284,78 @@ def main():
         sys.exit(1)
 
 
+def serve(argv):
+    """Entry point of `doc2beat serve`."""
+    parser = argparse.ArgumentParser(
+        prog="doc2beat serve",
+        description="Run doc2beat as a local HTTP service holding one warm instance. "
+                    "POST /jobs with {\"document_url\": ...}, then poll GET /jobs/<id>?wait=30 "
+                    "or stream GET /jobs/<id>/events."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="TCP port (default: serve.port in config.yaml, or 8700)")
+    parser.add_argument("--socket", type=str, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help=f"Jobs processed at the same time (default: serve.concurrency in config.yaml, or {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        help="Jobs waiting for a worker before submissions are refused (default: serve.queue_size in config.yaml, or 100)"
+    )
+    parser.add_argument(
+        "--allow-local-files",
+        action="store_true",
+        default=None,
+        help="Accept local file paths as document_url, not just http(s) URLs "
+             "(default: serve.allow_local_files in config.yaml, or off)"
+    )
+    parser.add_argument("--creds", type=str, default="creds.yaml", help="Path to credentials YAML file (default: creds.yaml)")
+    parser.add_argument("--config", type=str, default="config.yaml", help="Path to configuration YAML file (default: config.yaml)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the document cache")
+    parser.add_argument("--cache-dir", type=str, help="Document cache directory (default: cache.directory in config.yaml)")
+    parser.add_argument("--extra-creative", action="store_true", help="Enable extra creative and experimental style generation")
+    args = parser.parse_args(argv)
+
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.queue_size is not None and args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if args.socket:
+        import socket
+        if not hasattr(socket, "AF_UNIX"):
+            parser.error("--socket needs Unix domain socket support")
+
+    from .core import Doc2Beat
+
+    try:
+        doc2beat = Doc2Beat(
+            creds_path=args.creds,
+            config_path=args.config,
+            extra_creative=args.extra_creative,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir
+        )
+        doc2beat.serve(
+            host=args.host,
+            port=args.port,
+            socket_path=args.socket,
+            concurrency=args.concurrency,
+            queue_size=args.queue_size,
+            allow_local_files=args.allow_local_files
+        )
+    except KeyboardInterrupt:
+        pass
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        print("\nMake sure creds.yaml and config.yaml exist.", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
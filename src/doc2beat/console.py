@@ -0,0 +1,44 @@
+"""Progress messages that embedding code can take over instead of stdout."""
+
+import builtins
+import contextlib
+import contextvars
+from typing import Callable, Optional
+
+
+_handler: contextvars.ContextVar = contextvars.ContextVar('doc2beat_console', default=None)
+
+
+def print(*values, sep: str = ' ', end: str = '\n', **kwargs):
+    """
+    Print a progress message, or hand it to the handler set with redirect().
+
+    Handlers get the message without surrounding whitespace, and blank
+    messages (spacing for the terminal) are not passed on.
+    """
+    handler = _handler.get()
+    if handler is None:
+        builtins.print(*values, sep=sep, end=end, **kwargs)
+        return
+    message = sep.join(str(value) for value in values).strip()
+    if message:
+        handler(message)
+
+
+@contextlib.contextmanager
+def redirect(handler: Optional[Callable[[str], None]]):
+    """
+    Send progress messages printed in this context (and tasks started from it) to a handler.
+
+    Args:
+        handler: Callable receiving each message, or None to go back to stdout
+    """
+    token = _handler.set(handler)
+    try:
+        yield
+    finally:
+        _handler.reset(token)
+
+
+def discard(message: str):
+    """Handler that drops every message."""
@@ -0,0 +1,259 @@
+"""Shared retry and adaptive concurrency control for OpenRouter requests."""
+
+import asyncio
+import email.utils
+import random
+import time
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+from . import console
+
+T = TypeVar("T")
+
+# Throttling statuses shrink the concurrency window; other transient errors only retry
+THROTTLE_STATUSES = {429, 503, 529}
+RETRY_STATUSES = {408, 409, 500, 502, 504}
+
+
+class StreamInterrupted(Exception):
+    """A streamed response failed after some of its text was already handed on, so it can't be retried."""
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Read how long the server asked us to wait.
+
+    Args:
+        headers: Response headers
+
+    Returns:
+        Seconds to wait, or None if the response doesn't say
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Decide how to handle a failed request.
+
+    Args:
+        error: Exception raised by the OpenAI client
+
+    Returns:
+        Tuple of (retryable, throttled, retry_after seconds or None)
+    """
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        status = error.status_code
+        retry_after = parse_retry_after(error.response.headers)
+        if status in THROTTLE_STATUSES:
+            return True, True, retry_after
+        return status in RETRY_STATUSES, False, retry_after
+    if isinstance(error, openai.APIConnectionError):
+        # Includes timeouts
+        return True, False, None
+    return False, False, None
+
+
+class AIMDLimiter:
+    """
+    Concurrency window that grows additively on success and halves on throttling.
+
+    Every successful request made while the window is full adds 1/limit to
+    it, so it grows by about one slot per window's worth of requests. A window
+    that callers don't fill (e.g. fewer workers than its maximum) stays where
+    it is, so a later halving actually cuts the requests in flight. A throttled request halves it,
+    at most once per window of requests already in flight, and a Retry-After
+    pauses new requests for everyone using the limiter.
+    """
+
+    def __init__(self, initial: float = 8, minimum: float = 1, maximum: float = 64):
+        """
+        Args:
+            initial: Starting number of requests in flight
+            minimum: Lowest the window can shrink to
+            maximum: Highest the window can grow to
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.in_flight = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _bind(self) -> asyncio.Condition:
+        # Conditions belong to one event loop, and each run gets a new one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.in_flight = 0
+        return self._condition
+
+    async def acquire(self) -> float:
+        """Wait for a free slot; returns when the request started (for on_throttle)."""
+        condition = self._bind()
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            async with condition:
+                while self.in_flight >= int(self.limit):
+                    await condition.wait()
+                if self._paused_until > time.monotonic():
+                    # A Retry-After arrived while we were waiting
+                    continue
+                self.in_flight += 1
+                return time.monotonic()
+
+    async def release(self):
+        condition = self._bind()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self):
+        # Called while the request still holds its slot
+        if self.in_flight >= int(self.limit):
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self, started: float, retry_after: Optional[float] = None):
+        """
+        Record a throttled request.
+
+        Args:
+            started: When the request got its slot
+            retry_after: Seconds the server asked everyone to wait, if any
+        """
+        self.throttled += 1
+        # Requests sent before the last decrease were sized for the old window
+        if started >= self._last_decrease:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = time.monotonic()
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+class RequestController:
+    """
+    Runs every OpenRouter request with retries, backoff and a per-kind AIMD window.
+
+    Style and lyric calls get separate windows, so a burst of one can't starve
+    the other. Section digests share the lyric window.
+    """
+
+    def __init__(
+        self,
+        budgets: Mapping[str, AIMDLimiter],
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0
+    ):
+        """
+        Args:
+            budgets: Limiter for each kind of request ('style', 'lyrics')
+            max_retries: Retries after the first attempt before giving up
+            backoff_base: First backoff delay in seconds, doubled on each retry
+            backoff_max: Cap on the backoff delay
+        """
+        self.budgets: Dict[str, AIMDLimiter] = dict(budgets)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping]) -> 'RequestController':
+        """
+        Build a controller from the `requests` section of config.yaml.
+
+        Args:
+            config: Mapping with optional max_retries, backoff_base, backoff_max, and
+                'style'/'lyrics' sections of initial_concurrency, min_concurrency
+                and max_concurrency
+
+        Returns:
+            Request controller
+        """
+        config = config or {}
+        defaults = {'style': (4, 16), 'lyrics': (8, 64)}
+        budgets = {}
+        for kind, (initial, maximum) in defaults.items():
+            budget = config.get(kind) or {}
+            budgets[kind] = AIMDLimiter(
+                initial=budget.get('initial_concurrency', initial),
+                minimum=budget.get('min_concurrency', 1),
+                maximum=budget.get('max_concurrency', maximum),
+            )
+        return cls(
+            budgets,
+            max_retries=config.get('max_retries', 5),
+            backoff_base=config.get('backoff_base', 1.0),
+            backoff_max=config.get('backoff_max', 60.0),
+        )
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            # Small jitter so waiting requests don't all come back at the same instant
+            return retry_after + random.uniform(0, self.backoff_base)
+        # Full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def call(self, kind: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a request within its kind's window, retrying transient failures.
+
+        Args:
+            kind: 'style' or 'lyrics'
+            request: Zero-argument callable making the request
+
+        Returns:
+            The request's result
+        """
+        limiter = self.budgets[kind]
+        attempt = 0
+        while True:
+            started = await limiter.acquire()
+            try:
+                result = await request()
+            except Exception as e:
+                error = e
+                retryable, throttled, retry_after = classify_error(e)
+                if throttled:
+                    limiter.on_throttle(started, retry_after)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+            else:
+                limiter.on_success()
+                return result
+            finally:
+                await limiter.release()
+
+            delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            self.retries += 1
+            console.print(f"    Request failed ({error}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -1,17 +1,61 @@
 """Core functionality for doc2beat."""
 
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import itertools
 import os
+import queue
+import sys
+import threading
+import time
 import yaml
-import requests
-import pandas as pd
-from typing import List, Dict, Optional
-from openai import OpenAI
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterable, Iterator, List, Dict, Optional, Set, Tuple
+from .budget import ContentBudget, split_sections
+from .cache import DocumentCache, DEFAULT_CACHE_DIR
+from .controller import RequestController, StreamInterrupted
+from .fetcher import DocumentFetcher
+from .genres import GenreDeck, load_catalog
+from .inputs import iter_csv_inputs
+from .local import is_local, iter_local_inputs, local_path, read_local_document
+from .manifest import Manifest
+from . import console, metrics
+from .output import OUTPUT_FIELDS, ResultStream, ResultWriter, compact_resumed_output, read_completed
+from .pipeline import DEFAULT_CONCURRENCY, BatchPipeline
+from .sitemap import LastmodState, PageEntry, SiteDiscovery
+from .styles import parse_styles, truncate_style
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .extraction import ExtractionRules
+
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Song lyrics are cut to this length
+LYRICS_MAX_CHARS = 5000
+
+# Bump when the section condensing prompt changes so cached section digests are redone
+SECTION_PROMPT_VERSION = "1"
+
+# Bump when extraction output changes so cached text is re-extracted from the cached raw page
+EXTRACTOR_VERSION = "3"
 
 
 class Doc2Beat:
     """Main class for converting documentation to song lyrics."""
 
-    def __init__(self, creds_path: str = "creds.yaml", config_path: str = "config.yaml", extra_creative: bool = False):
+    def __init__(
+        self,
+        creds_path: str = "creds.yaml",
+        config_path: str = "config.yaml",
+        extra_creative: bool = False,
+        use_cache: bool = True,
+        cache_dir: Optional[str] = None
+    ):
         """
         Initialize Doc2Beat with credentials and configuration.
 
@@ -19,6 +63,8 @@ class Doc2Beat:
             creds_path: Path to credentials YAML file
             config_path: Path to configuration YAML file
             extra_creative: If True, adds additional creativity and experimental elements to style generation
+            use_cache: If False, always download and re-extract pages instead of using the document cache
+            cache_dir: Optional document cache directory (overrides config.yaml)
         """
         # Load credentials
         with open(creds_path, 'r') as f:
@@ -29,16 +75,270 @@ class Doc2Beat:
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
         self.lyric_model = config['lyric_model']
+
+        # OpenAI-compatible endpoint, e.g. a local stand-in for offline benchmarks
+        self.api_base_url = config.get('api_base_url') or OPENROUTER_BASE_URL
         
+        # Token budget for document content in the lyric prompt
+        self.content_budget = ContentBudget(self.lyric_model, config.get('content_token_budget', 4000))
+
+        # Retries, backoff and adaptive concurrency shared by every OpenRouter request
+        self.controller = RequestController.from_config(config.get('requests'))
+
+        # Stream lyric completions so generation stops at the length limit, even without a callback
+        self.stream_lyrics = config.get('stream_lyrics', False)
+
+        # Documents over the content budget are condensed section by section (map-reduce)
+        self.long_document = config.get('long_document') or {}
+
         # Store extra_creative setting
         self.extra_creative = extra_creative
 
-        # Initialize OpenAI client with OpenRouter
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=self.api_key,
+        # Genre samples are dealt from a deck built on first use (seeded and balanced per config.yaml)
+        self.genre_config = config.get('genres') or {}
+        self._genre_deck = None
+        self._genre_combinations = False
+
+        # One pooled fetcher is reused for every page fetched during a run
+        fetch_config = config.get('fetch') or {}
+        self.fetcher = DocumentFetcher(
+            max_connections=fetch_config.get('max_connections', 20),
+            per_host_concurrency=fetch_config.get('per_host_concurrency', 4),
+            requests_per_second=fetch_config.get('requests_per_second', 0),
+            timeout=fetch_config.get('timeout', 15),
+            max_bytes=fetch_config.get('max_bytes', 2_000_000),
         )
 
+        # HTML parser and extraction rules are set up on first use (see html_parser and
+        # extraction_rules), so BeautifulSoup is only imported once a page needs parsing
+        self._html_parser_setting = config.get('html_parser', 'auto')
+        self._extraction_config = config.get('extraction')
+        self._html_parser: Optional[str] = None
+        self._extraction_rules: Optional['ExtractionRules'] = None
+
+        # On-disk cache of raw pages and extracted text, revalidated with ETag/Last-Modified
+        cache_config = config.get('cache') or {}
+        self.cache = None
+        if use_cache:
+            self.cache = DocumentCache(
+                directory=cache_dir or cache_config.get('directory', DEFAULT_CACHE_DIR),
+                ttl=cache_config.get('ttl_hours', 12) * 3600,
+                max_bytes=int(cache_config.get('max_size_mb', 500) * 1024 * 1024),
+                extractor_version=self._extractor_version,
+            )
+
+        # Queue sizes and worker counts of the batch pipeline
+        self.pipeline_config = config.get('pipeline') or {}
+
+        # Page discovery for --sitemap runs
+        self.sitemap_config = config.get('sitemap') or {}
+
+        # Job queue of `doc2beat serve`
+        self.serve_config = config.get('serve') or {}
+
+        # Batches generate this many song styles per LLM request
+        self.style_batch = config.get('style_batch') or {}
+
+        # Per-row instrumentation: output files, extra columns and model prices for cost estimates
+        self.metrics_config = config.get('metrics') or {}
+        self.model_prices = self.metrics_config.get('prices') or {}
+
+        # Async clients are bound to an event loop, so they are opened per run by _session()
+        self.client = None
+        self._session_loop = None
+
+    @property
+    def html_parser(self) -> str:
+        """BeautifulSoup parser backend: the fastest installed one unless config.yaml pins one."""
+        if self._html_parser is None:
+            from .extraction import select_parser
+            self._html_parser = select_parser(self._html_parser_setting)
+        return self._html_parser
+
+    @property
+    def extraction_rules(self) -> 'ExtractionRules':
+        """Per-site content selectors and noise patterns, extendable from config.yaml."""
+        if self._extraction_rules is None:
+            from .extraction import ExtractionRules
+            self._extraction_rules = ExtractionRules.from_config(self._extraction_config)
+        return self._extraction_rules
+
+    def _extractor_version(self) -> str:
+        """Tag of the extraction code, parser and rules, stored with cached extractions."""
+        return f"{EXTRACTOR_VERSION}:{self.html_parser}:{self.extraction_rules.fingerprint}"
+
+    @contextlib.asynccontextmanager
+    async def _session(self):
+        """
+        Open the async OpenRouter client and the document fetcher for the duration of a run.
+
+        Nested entries on the same event loop reuse the already open clients.
+        """
+        loop = asyncio.get_running_loop()
+        if self.client is not None and self._session_loop is loop:
+            yield
+            return
+
+        # openai takes most of a second to import, so it's only loaded once a run starts
+        from openai import AsyncOpenAI
+
+        previous = (self.client, self._session_loop)
+        # Retries are left to self.controller, which also adapts concurrency to throttling
+        openai_client = AsyncOpenAI(base_url=self.api_base_url, api_key=self.api_key, max_retries=0)
+        async with openai_client as client, self.fetcher:
+            self.client, self._session_loop = client, loop
+            try:
+                yield
+            finally:
+                self.client, self._session_loop = previous
+
+    def _run(self, coro_factory):
+        """
+        Run an async method to completion from synchronous code.
+
+        Args:
+            coro_factory: Zero-argument callable returning the coroutine to run
+
+        Returns:
+            The coroutine's result
+        """
+        async def runner():
+            async with self._session():
+                return await coro_factory()
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(runner())
+
+        # Already inside an event loop (e.g. Jupyter), so run on a helper thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, runner()).result()
+
+    async def _complete(self, messages: List[Dict[str, str]], temperature: float, kind: str = 'lyrics') -> str:
+        """
+        Send a chat completion request to OpenRouter and return the reply text.
+
+        Args:
+            messages: Chat messages for the request
+            temperature: Sampling temperature
+            kind: 'style' or 'lyrics', picking the request controller's concurrency window
+
+        Returns:
+            Content of the first choice
+        """
+        async def request():
+            return await self.client.chat.completions.create(
+                model=self.lyric_model,
+                messages=messages,
+                temperature=temperature,
+            )
+
+        started = time.perf_counter()
+        response = await self.controller.call(kind, request)
+        content = response.choices[0].message.content
+        self._record_usage(kind, started, response.usage, messages, content)
+        return content
+
+    def _record_usage(
+        self,
+        kind: str,
+        started: float,
+        usage,
+        messages: List[Dict[str, str]],
+        content: str
+    ):
+        """
+        Record a model call's tokens and cost for the rows it served.
+
+        Token counts come from the response's usage when there is one. Streams
+        closed early never receive it, so their tokens are counted locally.
+
+        Args:
+            kind: 'style' or 'lyrics'
+            started: perf_counter() before the call
+            usage: Usage reported by the API, or None
+            messages: Chat messages sent
+            content: Reply text received
+        """
+        if usage is not None and usage.prompt_tokens is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens or 0
+            estimated = False
+        else:
+            count = self.content_budget.count_tokens
+            prompt_tokens = sum(count(message['content']) for message in messages)
+            completion_tokens = count(content or '')
+            estimated = True
+        # OpenRouter reports the charged cost when usage accounting is on
+        cost = getattr(usage, 'cost', None)
+        if cost is None:
+            cost = metrics.estimate_cost(self.model_prices, self.lyric_model, prompt_tokens, completion_tokens)
+        metrics.record_call(
+            kind, self.lyric_model, prompt_tokens, completion_tokens, cost,
+            time.perf_counter() - started, estimated=estimated,
+        )
+
+    async def _complete_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_chars: int,
+        on_text: Optional[Callable[[str], None]] = None,
+        kind: str = 'lyrics'
+    ) -> str:
+        """
+        Stream a chat completion, closing the stream once more than max_chars have arrived.
+
+        Args:
+            messages: Chat messages for the request
+            temperature: Sampling temperature
+            max_chars: Stop reading (and stop paying for tokens) past this many characters
+            on_text: Optional callback receiving each piece of text as it arrives
+            kind: 'style' or 'lyrics', picking the request controller's concurrency window
+
+        Returns:
+            Text received, which may run slightly past max_chars
+        """
+        async def request():
+            stream = await self.client.chat.completions.create(
+                model=self.lyric_model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={'include_usage': True},
+            )
+            parts = []
+            received = 0
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, 'usage', None) is not None:
+                        usage[0] = chunk.usage
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    parts.append(text)
+                    received += len(text)
+                    if on_text:
+                        on_text(text)
+                    if received > max_chars:
+                        break
+            except Exception as e:
+                if parts and on_text:
+                    # Retrying would hand the same text to on_text twice
+                    raise StreamInterrupted(f"stream failed after {received} characters: {e}") from e
+                raise
+            finally:
+                # Closing the connection early makes the server stop generating
+                await stream.close()
+            return ''.join(parts)
+
+        # The final chunk carries usage, unless the stream was closed early
+        usage = [None]
+        started = time.perf_counter()
+        content = await self.controller.call(kind, request)
+        self._record_usage(kind, started, usage[0], messages, content)
+        return content
+
     def generate_song_style(self, document_url: str, genre: Optional[str] = None) -> str:
         """
         Generate a random song style prompt for the given document.
@@ -50,8 +350,10 @@ class Doc2Beat:
         Returns:
             Song style prompt (under 1000 characters)
         """
-        import random
-        
+        return self._run(lambda: self._agenerate_song_style(document_url, genre=genre))
+
+    async def _agenerate_song_style(self, document_url: str, genre: Optional[str] = None) -> str:
+        """Async implementation of generate_song_style."""
         # If specific genre is provided, use it
         if genre:
             prompt = (
@@ -64,37 +366,18 @@ class Doc2Beat:
             
             system_message = "You are a helpful assistant that generates VOCAL song style prompts. Always specify vocal genres with singing - never instrumental music. Use the provided genre as the foundation and build a detailed song style description around it. Be specific about tempo, vocals, instrumentation, mood, and themes."
             
-            response = self.client.chat.completions.create(
-                model=self.lyric_model,
-                messages=[
+            response = await self._complete(
+                [
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.8,
+                kind='style',
             )
             
-            return response.choices[0].message.content.strip()
+            return response.strip()
         
-        # Load genres based on extra_creative setting
-        if self.extra_creative:
-            # Load Suno v5 experimental genres
-            try:
-                import pandas as pd
-                df = pd.read_csv('suno_v5_genres.csv')
-                music_genres = df['genre'].tolist()
-                use_combinations = True
-            except Exception as e:
-                print(f"Warning: Could not load suno_v5_genres.csv: {e}, using Wikipedia genres")
-                music_genres = self._get_default_genres()
-                use_combinations = False
-        else:
-            # Use Wikipedia comprehensive genres
-            music_genres = self._get_default_genres()
-            use_combinations = False
-        
-        # Randomly shuffle the genre list for each generation
-        random.shuffle(music_genres)
-        selected_genres = music_genres[:5]  # Pick first 5 from shuffled list
+        selected_genres, use_combinations = self._sample_style_genres()
 
         # Base prompt
         if use_combinations:
@@ -117,90 +400,94 @@ class Doc2Beat:
         # Use same system message for both modes
         system_message = "You are a helpful assistant that generates VOCAL song style prompts. Always specify vocal genres with singing - never instrumental music. You will be given a random selection of genres to choose from - pick ONE genre from the provided list (or a creative combination if in extra_creative mode) and build a detailed song style description around it. Be specific about tempo, vocals, instrumentation, mood, and themes."
         
-        response = self.client.chat.completions.create(
-            model=self.lyric_model,
-            messages=[
+        response = await self._complete(
+            [
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt}
             ],
             temperature=1.2,  # Even higher temperature for maximum randomness
+            kind='style',
         )
         
-        song_style = response.choices[0].message.content.strip()
         # Ensure it's under 1000 characters
-        if len(song_style) > 1000:
-            song_style = song_style[:997] + "..."
-        return song_style
-
-    def _get_default_genres(self):
-        """Get the default comprehensive list of music genres from Wikipedia."""
-        return [
-            # Classical
-            "Baroque", "Classical", "Romantic", "Modern Classical", "Opera", "Chamber Music", "Symphony", "Concerto",
-            
-            # Popular - Avant-garde & experimental
-            "Avant-garde", "Experimental", "Noise", "Ambient", "Drone", "Minimalism",
-            
-            # Blues
-            "Blues", "Delta Blues", "Chicago Blues", "Electric Blues", "Blues Rock", "Rhythm and Blues",
-            
-            # Country
-            "Country", "Country Rock", "Bluegrass", "Honky-tonk", "Outlaw Country", "Country Pop", "Alt-Country", "Country Folk",
-            
-            # Easy listening
-            "Easy Listening", "Lounge", "Smooth Jazz", "Adult Contemporary", "Soft Rock",
-            
-            # Electronic
-            "Electronic", "House", "Techno", "Trance", "Ambient", "IDM", "Dubstep", "Drum and Bass", "Breakbeat", "Electro", "Synthwave", "Vaporwave", "Chillwave", "Future Bass", "Trap", "Lo-fi Hip Hop",
-            
-            # Folk
-            "Folk", "Folk Rock", "Indie Folk", "Singer-Songwriter", "Acoustic Folk", "Celtic Folk", "Americana", "Roots Music",
-            
-            # Hip hop
-            "Hip Hop", "Rap", "Trap", "Drill", "Boom Bap", "Alternative Hip Hop", "Conscious Rap", "Gangsta Rap", "Mumble Rap",
-            
-            # Jazz
-            "Jazz", "Bebop", "Swing", "Big Band", "Cool Jazz", "Hard Bop", "Free Jazz", "Fusion", "Smooth Jazz", "Vocal Jazz", "Jazz Blues",
-            
-            # Pop
-            "Pop", "Pop Rock", "Power Pop", "Bubblegum Pop", "Teen Pop", "Dance Pop", "Electropop", "Synthpop", "Indie Pop", "Art Pop", "Baroque Pop",
-            
-            # R&B & Soul
-            "R&B", "Soul", "Motown", "Funk", "Disco", "Contemporary R&B", "Neo-Soul", "Gospel", "Spirituals",
-            
-            # Rock
-            "Rock", "Rock and Roll", "Classic Rock", "Hard Rock", "Soft Rock", "Progressive Rock", "Psychedelic Rock", "Art Rock", "Alternative Rock", "Indie Rock", "Grunge", "Britpop", "Post-Rock", "Math Rock", "Shoegaze", "Dream Pop",
-            
-            # Metal
-            "Heavy Metal", "Thrash Metal", "Death Metal", "Black Metal", "Power Metal", "Progressive Metal", "Nu Metal", "Metalcore", "Deathcore",
-            
-            # Punk
-            "Punk", "Hardcore Punk", "Post-Punk", "New Wave", "Post-Hardcore", "Emo", "Pop Punk", "Ska Punk", "Crust Punk",
-            
-            # Regional - African
-            "Afrobeat", "Highlife", "Mbalax", "Soukous", "Kwaito", "Afro-pop", "Afro-jazz",
-            
-            # Regional - Asian
-            "J-pop", "K-pop", "C-pop", "Bollywood", "Enka", "Kayokyoku", "Mandopop", "Cantopop",
-            
-            # Regional - European
-            "Europop", "Eurodance", "Italo Disco", "French Pop", "Schlager", "Fado", "Flamenco", "Celtic", "Folk Rock",
-            
-            # Regional - Latin & South American
-            "Salsa", "Merengue", "Bachata", "Reggaeton", "Cumbia", "Bossa Nova", "Samba", "Tango", "Mariachi", "Latin Pop", "Latin Rock",
-            
-            # Regional - North American
-            "Americana", "Bluegrass", "Cajun", "Zydeco", "Tejano", "Native American Music",
-            
-            # Religious
-            "Gospel", "Christian Rock", "Christian Pop", "Contemporary Christian", "Spirituals", "Sacred Music", "Chant", "Hymns",
-            
-            # Traditional folk
-            "Traditional Folk", "World Music", "Ethnic Music", "Indigenous Music", "Folk Revival", "Protest Songs",
-            
-            # Other
-            "New Age", "Worldbeat", "Fusion", "Crossover", "Experimental Rock", "Art Rock", "Prog Rock", "Space Rock", "Krautrock", "Canterbury Scene"
-        ]
+        return truncate_style(response)
+
+    def _sample_style_genres(self) -> Tuple[List[str], bool]:
+        """
+        Pick the genres offered to the LLM for one song style.
+
+        Returns:
+            Tuple of 5 genres and whether the LLM may combine them (extra creative mode)
+        """
+        if self._genre_deck is None:
+            use_combinations = False
+            catalog = load_catalog()
+            # Load genres based on extra_creative setting
+            if self.extra_creative:
+                try:
+                    # Suno v5 experimental genres
+                    catalog = load_catalog(extra_creative=True)
+                    use_combinations = True
+                except Exception as e:
+                    console.print(f"Warning: Could not load Suno v5 genres: {e}, using Wikipedia genres")
+            self._genre_deck = GenreDeck(
+                catalog,
+                seed=self.genre_config.get('seed'),
+                balanced=self.genre_config.get('balanced', True)
+            )
+            self._genre_combinations = use_combinations
+        return self._genre_deck.deal(5), self._genre_combinations
+
+    async def _agenerate_song_styles(self, count: int) -> List[str]:
+        """
+        Generate several song styles with one request, each from its own random genre sample.
+
+        The LLM answers with JSON. Items that are missing or malformed are
+        generated again with single _agenerate_song_style calls.
+
+        Args:
+            count: Number of styles to generate
+
+        Returns:
+            List of `count` song style prompts (each under 1000 characters)
+        """
+        if count == 1:
+            return [await self._agenerate_song_style(None)]
+
+        samples = [self._sample_style_genres() for _ in range(count)]
+        items = "\n".join(
+            f'{i}. {"choose ONE genre OR a creative combination of genres" if use_combinations else "randomly pick ONE genre"} '
+            f'from: {", ".join(genres)}'
+            for i, (genres, use_combinations) in enumerate(samples, 1)
+        )
+        prompt = (
+            f"Generate {count} different VOCAL song descriptions for Suno AI, each under 1000 characters. "
+            f"Song N must use the genre selection given on line N:\n{items}\n"
+            f"CRITICAL: Each must be a VOCAL genre - no instrumental music. "
+            f"Include in each: genre/style, tempo, vocal characteristics, instrumentation, mood/atmosphere, and lyrical themes. "
+            f"Be specific and vivid. "
+            f'Output ONLY a JSON object of the form {{"styles": [{{"id": 1, "style": "..."}}, ...]}} with one entry per line above, nothing else.'
+        )
+        system_message = "You are a helpful assistant that generates VOCAL song style prompts. Always specify vocal genres with singing - never instrumental music. For each numbered genre selection, pick from that selection only and build a detailed song style description around it. Be specific about tempo, vocals, instrumentation, mood, and themes. Always answer with valid JSON."
+
+        console.print(f"    Generating {count} song styles in one request...")
+        response = await self._complete(
+            [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=1.0,
+            kind='style',
+        )
+
+        styles = parse_styles(response, count)
+        missing = [i for i, style in enumerate(styles) if style is None]
+        if missing:
+            console.print(f"    {len(missing)} of {count} styles were malformed, generating them one by one")
+            retries = await asyncio.gather(*(self._agenerate_song_style(None) for _ in missing))
+            for i, style in zip(missing, retries):
+                styles[i] = style
+        return styles
 
     def fetch_document_content(self, document_url: str) -> str:
         """
@@ -212,133 +499,204 @@ class Doc2Beat:
         Returns:
             Cleaned documentation content as text
         """
+        return self._run(lambda: self._afetch_document_content(document_url))
+
+    async def _afetch_document_content(self, document_url: str) -> str:
+        """Async implementation of fetch_document_content."""
         try:
-            print(f"    Fetching from: {document_url}")
-            response = requests.get(document_url, timeout=15)
-            response.raise_for_status()
-            html_content = response.text
-            print(f"    Fetched {len(html_content)} characters")
-            
-            # Extract the actual documentation content
-            doc_content = self.extract_documentation_content(html_content)
-            print(f"    Extracted {len(doc_content)} characters of documentation content")
-            
-            # Fallback: if extraction is too small (<300 chars), use the whole page
-            if len(doc_content) < 300:
-                print(f"    Extraction too small ({len(doc_content)} chars), using full page content")
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(html_content, 'html.parser')
-                # Remove script and style tags but keep the rest
-                for element in soup(['script', 'style']):
-                    element.decompose()
-                doc_content = soup.get_text(separator=' ', strip=True)
-                # Limit to 20000 characters for prompt
-                if len(doc_content) > 20000:
-                    doc_content = doc_content[:20000]
-                print(f"    Using full page content: {len(doc_content)} characters")
-            
-            return doc_content
+            return await self._afetch_document(document_url)
         except Exception as e:
-            print(f"Warning: Could not fetch content from {document_url}: {e}")
+            console.print(f"Warning: Could not fetch content from {document_url}: {e}")
             return f"[Could not fetch content from {document_url}]"
 
-    def extract_documentation_content(self, html_content: str) -> str:
+    async def _afetch_document(self, document_url: str) -> str:
+        """
+        Fetch and extract a document, going through the cache. Unlike fetch_document_content, errors are raised.
+
+        Args:
+            document_url: URL of the documentation
+
+        Returns:
+            Cleaned documentation content as text
+        """
+        doc_content, html_content, cache_headers = await self._afetch_page(document_url)
+        if doc_content is None:
+            # Parsing is CPU-bound, so keep it off the event loop. The thread runs in a
+            # copy of this context, so its messages follow console.redirect()
+            loop = asyncio.get_running_loop()
+            with metrics.stage('extract'):
+                doc_content = await loop.run_in_executor(
+                    None, contextvars.copy_context().run, self._content_from_html, html_content, document_url
+                )
+            self._cache_extracted(document_url, html_content, doc_content, cache_headers)
+        return doc_content
+
+    async def _afetch_page(self, document_url: str) -> Tuple[Optional[str], Optional[str], Optional[Dict]]:
+        """
+        Fetch a page through the cache, leaving extraction to the caller.
+
+        Args:
+            document_url: URL of the documentation
+
+        Returns:
+            Tuple of (document_content, html_content, cache_headers). When the cache
+            already has valid text, document_content is set and the rest is None.
+            Otherwise html_content needs extracting, and the result should be passed
+            to _cache_extracted along with cache_headers. Local files skip HTTP and
+            the cache: Markdown and text come back as document_content, HTML as
+            html_content with no cache_headers.
+        """
+        if is_local(document_url):
+            console.print(f"    Reading local file: {document_url}")
+            loop = asyncio.get_running_loop()
+            with metrics.stage('fetch'):
+                text, is_html, size = await loop.run_in_executor(
+                    None, contextvars.copy_context().run, read_local_document, local_path(document_url)
+                )
+            metrics.add_fetch_bytes(size)
+            console.print(f"    Read {size} bytes")
+            return (None, text, None) if is_html else (text, None, None)
+
+        entry = self.cache.get(document_url) if self.cache else None
+
+        if entry and self.cache.is_fresh(entry):
+            console.print(f"    Using cached content for: {document_url}")
+            if entry['extracted'] is not None:
+                return entry['extracted'], None, None
+            # Cached by an older extractor version: re-extract without refetching
+            return None, self._cached_raw(document_url), {
+                'etag': entry.get('etag'),
+                'last-modified': entry.get('last_modified'),
+                'fetched_at': entry['fetched_at'],
+            }
+
+        console.print(f"    Fetching from: {document_url}")
+        with metrics.stage('fetch'):
+            response = await self.fetcher.get_page(document_url, headers=DocumentCache.validators(entry))
+        # Bytes on the wire, before decompression
+        metrics.add_fetch_bytes(response.num_bytes_downloaded)
+
+        if entry and response.status_code == 304:
+            console.print("    Not modified since last fetch, using cached content")
+            if entry['extracted'] is not None:
+                self.cache.revalidated(document_url, entry, response.headers)
+                return entry['extracted'], None, None
+            return None, self._cached_raw(document_url), {
+                'etag': response.headers.get('etag') or entry.get('etag'),
+                'last-modified': response.headers.get('last-modified') or entry.get('last_modified'),
+            }
+
+        response.raise_for_status()
+        html_content = response.text
+        console.print(f"    Fetched {len(html_content)} characters")
+        if response.truncated:
+            console.print(f"    Page is over {self.fetcher.max_bytes} bytes, keeping only the start of it")
+        return None, html_content, dict(response.headers)
+
+    def _cached_raw(self, document_url: str) -> str:
+        html_content = self.cache.raw(document_url)
+        if html_content is None:
+            raise RuntimeError("cached page is missing its raw content")
+        return html_content
+
+    def _cache_extracted(self, document_url: str, html_content: str, doc_content: str, cache_headers: Optional[Dict]):
+        """Store a page and its freshly extracted text in the cache (if enabled)."""
+        if self.cache and cache_headers is not None:
+            self.cache.put(
+                document_url,
+                html_content,
+                doc_content,
+                cache_headers,
+                fetched_at=cache_headers.get('fetched_at')
+            )
+
+    def _content_from_html(self, html_content: str, document_url: Optional[str] = None) -> str:
+        """
+        Turn a fetched page into documentation text, falling back to the full page if extraction is too small.
+
+        Args:
+            html_content: Raw HTML content from the page
+            document_url: URL of the page, used to pick site-specific selectors
+
+        Returns:
+            Cleaned documentation content as text
+        """
+        from .extraction import extract_page
+
+        extraction = extract_page(html_content, document_url, self.html_parser, self.extraction_rules)
+        return self._report_extraction(*extraction)
+
+    @staticmethod
+    def _report_extraction(doc_content: str, extracted_chars: int, used_full_page: bool) -> str:
+        """Print the outcome of extract_page and return the documentation text."""
+        console.print(f"    Extracted {extracted_chars} characters of documentation content")
+        if used_full_page:
+            console.print(f"    Extraction too small ({extracted_chars} chars), using full page content")
+            console.print(f"    Using full page content: {len(doc_content)} characters")
+        return doc_content
+
+    def extract_documentation_content(self, html_content: str, document_url: Optional[str] = None) -> str:
         """
         Extract the actual documentation content from HTML, filtering out navigation, headers, footers, etc.
         
         Args:
             html_content: Raw HTML content from the page
+            document_url: Optional URL of the page, used to pick site-specific selectors
             
         Returns:
             Cleaned documentation text content
         """
+        from .extraction import extract_content_text, parse_html
+
         try:
-            from bs4 import BeautifulSoup
-            import re
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove unwanted elements
-            for element in soup(['nav', 'header', 'footer', 'aside', 'script', 'style', 'meta', 'link']):
-                element.decompose()
-            
-            # Look for common documentation content containers
-            content_selectors = [
-                '#awsdocs-content', '#main-content', '#main-col-body',  # AWS docs
-                'main', 'article', '.content', '.documentation', '.doc-content',
-                '.main-content', '.page-content', '.post-content', '.entry-content',
-                '#content', '#main', '#documentation', '.markdown-body'
-            ]
-            
-            content_text = ""
-            
-            # Try to find the main content area
-            for selector in content_selectors:
-                content_element = soup.select_one(selector)
-                if content_element:
-                    content_text = content_element.get_text(separator=' ', strip=True)
-                    break
-            
-            # If no specific content area found, try to extract from body but filter out common noise
-            if not content_text:
-                body = soup.find('body')
-                if body:
-                    # Remove common navigation and UI elements
-                    for element in body.find_all(['nav', 'header', 'footer', 'aside', 'menu', 'ul', 'ol']):
-                        if any(keyword in element.get_text().lower() for keyword in 
-                              ['navigation', 'menu', 'sidebar', 'footer', 'header', 'breadcrumb', 'toc']):
-                            element.decompose()
-                    
-                    content_text = body.get_text(separator=' ', strip=True)
-            
-            # Clean up the text
-            if content_text:
-                # Remove excessive whitespace
-                content_text = re.sub(r'\s+', ' ', content_text)
-                # Remove common website noise patterns
-                noise_patterns = [
-                    r'cookie\s+policy',
-                    r'privacy\s+policy', 
-                    r'terms\s+of\s+service',
-                    r'follow\s+us\s+on',
-                    r'subscribe\s+to',
-                    r'newsletter',
-                    r'social\s+media',
-                    r'copyright.*?\d{4}',
-                    r'all\s+rights\reserved',
-                    r'last\s+updated.*?\d{4}',
-                    r'page\s+\d+\s+of\s+\d+',
-                    r'next\s+page',
-                    r'previous\s+page',
-                    r'home\s*>\s*.*?>\s*.*?>\s*.*?',  # Breadcrumbs
-                ]
-                
-                for pattern in noise_patterns:
-                    content_text = re.sub(pattern, '', content_text, flags=re.IGNORECASE)
-                
-                # Final cleanup
-                content_text = re.sub(r'\s+', ' ', content_text).strip()
-            
+            content_text = extract_content_text(
+                parse_html(html_content, self.html_parser), document_url, self.extraction_rules
+            )
             return content_text if content_text else html_content
             
         except Exception as e:
-            print(f"Warning: Could not extract documentation content: {e}")
+            console.print(f"Warning: Could not extract documentation content: {e}")
             # Fallback to original content
             return html_content
 
-    def generate_song_lyrics(self, document_content: str, song_style: str) -> str:
+    def generate_song_lyrics(
+        self,
+        document_content: str,
+        song_style: str,
+        on_text: Optional[Callable[[str], None]] = None
+    ) -> str:
         """
         Generate song lyrics based on document content and style.
 
         Args:
             document_content: The text content of the documentation
             song_style: The style of song to generate
+            on_text: Optional callback receiving the lyrics piece by piece as they are
+                generated. The response is streamed and closed at the 5000 character limit.
 
         Returns:
             Generated song lyrics (up to 5000 characters)
         """
-        # Limit document content to prevent overly long lyrics
-        content_for_prompt = document_content[:20000]
+        return self._run(lambda: self._agenerate_song_lyrics(document_content, song_style, on_text))
+
+    async def _agenerate_song_lyrics(
+        self,
+        document_content: str,
+        song_style: str,
+        on_text: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Async implementation of generate_song_lyrics."""
+        # Condense documents over budget section by section instead of cutting them off
+        if self.long_document.get('enabled', True) and self.content_budget.max_tokens:
+            content_tokens = self.content_budget.count_tokens(document_content)
+            if content_tokens > self.content_budget.max_tokens:
+                with metrics.stage('condense'):
+                    document_content = await self._acondense_document(document_content, content_tokens)
+
+        # Keep the prompt within the token budget, dropping prose before instructions
+        content_for_prompt, prompt_tokens, content_tokens = self.content_budget.fit(document_content)
+        if prompt_tokens < content_tokens:
+            console.print(f"    Trimmed content from {content_tokens} to {prompt_tokens} tokens ({self.content_budget.tokenizer})")
         
         prompt = f"""Based on the following technical documentation, create song lyrics in the style: "{song_style}"
 
@@ -362,29 +720,123 @@ Documentation content:
 
 Output ONLY the song lyrics, nothing else."""
 
-        print(f"    Generating lyrics with {self.lyric_model}...")
-        response = self.client.chat.completions.create(
-            model=self.lyric_model,
-            messages=[
-                {"role": "system", "content": "You are a creative songwriter who transforms technical documentation into engaging song lyrics. CRITICAL: Preserve all instructional content, procedures, commands, and technical details from the documentation. Include specific steps, how-to information, best practices, and warnings. Don't generalize - maintain accuracy of technical terms and processes. Always avoid problematic acronyms that Suno mispronounces (like AI, NIH, ORCID) and use full words or alternative phrasing instead."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-        )
-        print(f"    Generated {len(response.choices[0].message.content)} characters of lyrics")
+        messages = [
+            {"role": "system", "content": "You are a creative songwriter who transforms technical documentation into engaging song lyrics. CRITICAL: Preserve all instructional content, procedures, commands, and technical details from the documentation. Include specific steps, how-to information, best practices, and warnings. Don't generalize - maintain accuracy of technical terms and processes. Always avoid problematic acronyms that Suno mispronounces (like AI, NIH, ORCID) and use full words or alternative phrasing instead."},
+            {"role": "user", "content": prompt}
+        ]
+
+        console.print(f"    Generating lyrics with {self.lyric_model}...")
+        emitted = 0
+        if on_text is not None or self.stream_lyrics:
+            def emit(text: str):
+                # Pass on exactly what ends up in the lyrics: no leading whitespace, and nothing
+                # past where "..." would go until the length is known
+                nonlocal emitted
+                if not emitted:
+                    text = text.lstrip()
+                text = text[:LYRICS_MAX_CHARS - 3 - emitted]
+                if text:
+                    emitted += len(text)
+                    on_text(text)
 
-        lyrics = response.choices[0].message.content.strip()
+            with metrics.stage('lyrics'):
+                response = await self._complete_stream(
+                    messages, temperature=0.8, max_chars=LYRICS_MAX_CHARS, on_text=emit if on_text else None
+                )
+        else:
+            with metrics.stage('lyrics'):
+                response = await self._complete(messages, temperature=0.8)
+
+        lyrics = response.strip()
         # Ensure lyrics don't exceed 5000 characters
-        if len(lyrics) > 5000:
-            lyrics = lyrics[:4997] + "..."
+        if len(lyrics) > LYRICS_MAX_CHARS:
+            lyrics = lyrics[:LYRICS_MAX_CHARS - 3] + "..."
+        if on_text:
+            if len(lyrics) > emitted:
+                # The last few characters (or the "...") held back while streaming
+                on_text(lyrics[emitted:])
+            # Streamed lyrics may have been printed as they arrived, so start on a fresh line
+            console.print()
+        console.print(f"    Generated {len(response)} characters of lyrics")
         return lyrics
 
+    async def _acondense_document(self, document_content: str, content_tokens: int) -> str:
+        """
+        Map step of long-document mode: condense each section into its key instructional points.
+
+        Sections are condensed concurrently, so latency follows the longest
+        section rather than the whole document. At most max_sections sections
+        (and max_sections x section_tokens tokens) are condensed per document. Each digest is cached under the
+        hash of its section, so after an edit only the changed sections are redone.
+
+        Args:
+            document_content: Extracted document text over the content budget
+            content_tokens: Its token count
+
+        Returns:
+            Digest of the whole document, section by section
+        """
+        section_tokens = self.long_document.get('section_tokens', 3000)
+        max_sections = self.long_document.get('max_sections', 8)
+        if max_sections:
+            # Bound the map step: past max_sections full sections, trim by priority first
+            document_content, kept_tokens, _ = self.content_budget.fit(
+                document_content, max_tokens=max_sections * section_tokens
+            )
+            if kept_tokens < content_tokens:
+                console.print(f"    Trimmed long document from {content_tokens} to {kept_tokens} tokens before condensing")
+        sections = split_sections(
+            document_content,
+            section_tokens,
+            self.content_budget.count_tokens,
+            max_sections=max_sections
+        )
+        console.print(f"    Long document ({content_tokens} tokens): condensing {len(sections)} sections...")
+        semaphore = asyncio.Semaphore(self.long_document.get('max_parallel', 8))
+        digests = await asyncio.gather(*(self._acondense_section(section, semaphore) for section in sections))
+        digest = '\n\n'.join(digest for digest in digests if digest)
+        console.print(f"    Condensed to {self.content_budget.count_tokens(digest)} tokens")
+        return digest
+
+    async def _acondense_section(self, section: str, semaphore: asyncio.Semaphore) -> str:
+        """Condense one section, going through the section cache."""
+        key = hashlib.sha256(
+            f"{SECTION_PROMPT_VERSION}\0{self.lyric_model}\0{section}".encode('utf-8')
+        ).hexdigest()
+        if self.cache:
+            cached = self.cache.get_section(key)
+            if cached is not None:
+                return cached
+
+        prompt = f"""Condense this section of technical documentation into its key instructional points.
+
+Keep every step, command, code snippet, option, warning and best practice, using the exact technical terms. Drop marketing text, repetition and background that doesn't help someone follow the instructions.
+
+Output a Markdown bullet list, starting with the section heading if there is one. Output nothing else.
+
+Section:
+{section}"""
+
+        async with semaphore:
+            response = await self._complete(
+                [
+                    {"role": "system", "content": "You are a technical writer who condenses documentation into precise, complete instructional notes."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2,
+            )
+        digest = response.strip()
+        if self.cache:
+            self.cache.put_section(key, digest)
+        return digest
+
     def process_single_input(
         self,
         document_url: str,
         song_style: Optional[str] = None,
         genre: Optional[str] = None,
-        verbose: bool = True
+        verbose: bool = True,
+        on_lyrics: Optional[Callable[[str], None]] = None
     ) -> Dict[str, str]:
         """
         Process a single document URL.
@@ -394,33 +846,66 @@ Output ONLY the song lyrics, nothing else."""
             song_style: Optional predefined song style
             genre: Optional specific genre to use for style generation
             verbose: Whether to print detailed progress
+            on_lyrics: Optional callback receiving the lyrics piece by piece as they stream in
 
         Returns:
             Dictionary with document_url, song_style, and song_lyrics
         """
+        return self._run(
+            lambda: self._aprocess_single_input(document_url, song_style, genre, verbose, on_lyrics)
+        )
+
+    async def _aprocess_single_input(
+        self,
+        document_url: str,
+        song_style: Optional[str] = None,
+        genre: Optional[str] = None,
+        verbose: bool = True,
+        on_lyrics: Optional[Callable[[str], None]] = None,
+        fail_on_fetch_error: bool = False
+    ) -> Dict[str, str]:
+        """
+        Async implementation of process_single_input.
+
+        With fail_on_fetch_error, a document that can't be fetched raises
+        instead of getting a song about the '[Could not fetch content...]' placeholder.
+        """
         if verbose:
-            print(f"Processing: {document_url}")
+            console.print(f"Processing: {document_url}")
 
-        # Step 2: Generate song style if not provided
+        # Step 1: Fetch document content
+        if verbose:
+            console.print("  Fetching document content...")
+        if fail_on_fetch_error:
+            fetch = self._afetch_document(document_url)
+        else:
+            fetch = self._afetch_document_content(document_url)
+
+        # Step 2: Generate song style if not provided. It never reads the page,
+        # so it runs at the same time as the fetch and both join before the lyrics.
         if song_style is None:
             if verbose:
                 if genre:
-                    print(f"  Generating song style from genre: {genre}...")
+                    console.print(f"  Generating song style from genre: {genre}...")
                 else:
-                    print("  Generating song style...")
-            song_style = self.generate_song_style(document_url, genre=genre)
-        if verbose:
-            print(f"  Song style: {song_style}")
-
-        # Step 3: Fetch document content
+                    console.print("  Generating song style...")
+            style = asyncio.ensure_future(self._agenerate_song_style(document_url, genre=genre))
+            try:
+                document_content = await fetch
+            except BaseException:
+                style.cancel()
+                await asyncio.gather(style, return_exceptions=True)
+                raise
+            song_style = await style
+        else:
+            document_content = await fetch
         if verbose:
-            print("  Fetching document content...")
-        document_content = self.fetch_document_content(document_url)
+            console.print(f"  Song style: {song_style}")
 
         # Step 3: Generate song lyrics
         if verbose:
-            print("  Generating song lyrics...")
-        song_lyrics = self.generate_song_lyrics(document_content, song_style)
+            console.print("  Generating song lyrics...")
+        song_lyrics = await self._agenerate_song_lyrics(document_content, song_style, on_lyrics)
 
         return {
             'document_url': document_url,
@@ -428,81 +913,489 @@ Output ONLY the song lyrics, nothing else."""
             'song_lyrics': song_lyrics
         }
 
+    def serve(
+        self,
+        host: str = '127.0.0.1',
+        port: Optional[int] = None,
+        socket_path: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        allow_local_files: Optional[bool] = None
+    ):
+        """
+        Run as a local HTTP service until interrupted (see server.JobServer).
+
+        The OpenRouter client, document fetcher and caches stay open between
+        jobs, so callers skip the startup cost of one CLI invocation per document.
+
+        Args:
+            host: Interface to listen on
+            port: TCP port (default: serve.port in config.yaml, or 8700)
+            socket_path: Listen on this Unix socket instead of TCP
+            concurrency: Jobs processed at the same time (default: serve.concurrency in config.yaml)
+            queue_size: Jobs waiting before submissions are refused (default: serve.queue_size in config.yaml)
+            allow_local_files: Let jobs read local files instead of only http(s) URLs
+                (default: serve.allow_local_files in config.yaml, or False)
+        """
+        from .server import DEFAULT_PORT, JobServer
+
+        server = JobServer(
+            self,
+            concurrency=concurrency or self.serve_config.get('concurrency', DEFAULT_CONCURRENCY),
+            queue_size=queue_size or self.serve_config.get('queue_size', 100),
+            keep_finished=self.serve_config.get('keep_finished', 1000),
+            allow_local_files=(
+                allow_local_files if allow_local_files is not None
+                else self.serve_config.get('allow_local_files', False)
+            ),
+        )
+        port = port if port is not None else self.serve_config.get('port', DEFAULT_PORT)
+        self._run(lambda: server.serve(host, port, socket_path))
+
     def process_multiple_inputs(
         self,
-        inputs: List[Dict[str, str]],
-        output_path: str = "output.csv"
-    ) -> pd.DataFrame:
+        inputs: Iterable[Dict[str, str]],
+        output_path: str = "output.csv",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        manifest_path: Optional[str] = None,
+        resume: bool = False,
+        return_results: bool = True,
+        metrics_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        metric_columns: Optional[bool] = None,
+        succeeded_keys: Optional[Set[str]] = None
+    ) -> Optional['pd.DataFrame']:
         """
-        Process multiple document URLs.
+        Process multiple document URLs concurrently.
+
+        Rows are pulled from `inputs` only as workers become free, so it can be a
+        lazy iterator of any length. Each result is appended to the output CSV as
+        soon as it and every row before it are done, so an interrupted batch keeps
+        everything finished so far.
 
         Args:
-            inputs: List of dictionaries with 'document_url' and optional 'song_style'
+            inputs: Iterable of dictionaries with 'document_url' and optional 'song_style'
             output_path: Path to save output CSV
+            concurrency: Maximum number of documents processed at the same time
+            manifest_path: Optional manifest file enabling incremental mode. Rows whose
+                extracted content and model are unchanged since the last run reuse the
+                stored song instead of calling the LLM.
+            resume: Keep the rows that already succeeded in an existing output file and
+                only process the rest, including rows that failed ('Error processing:')
+            return_results: Read the output back into a DataFrame when done. Pass False
+                to keep memory flat for very large batches.
+            metrics_path: JSON lines file receiving each row's stage timings, bytes
+                fetched, tokens and cost (default: metrics.jsonl in config.yaml)
+            prometheus_path: Prometheus textfile for the run's totals (default:
+                metrics.prometheus in config.yaml)
+            metric_columns: Add the metrics to the output CSV as extra columns
+                (default: metrics.columns in config.yaml)
+            succeeded_keys: Optional set receiving the document key of every row whose
+                song was generated (or reused) from its fetched content in this run
 
         Returns:
-            DataFrame with results
+            DataFrame with results in input order, or None if return_results is False
         """
-        results = []
-        total_inputs = len(inputs)
+        total_inputs = len(inputs) if hasattr(inputs, '__len__') else None
         
-        print(f"\n🎵 Starting batch processing of {total_inputs} documents...")
-        print("=" * 60)
-        import sys
+        if total_inputs is None:
+            console.print(f"\n🎵 Starting batch processing (concurrency {concurrency})...")
+        else:
+            console.print(f"\n🎵 Starting batch processing of {total_inputs} documents (concurrency {concurrency})...")
+        console.print("=" * 60)
+
+        completed, existing_rows = read_completed(output_path) if resume else (Counter(), 0)
+        if resume:
+            console.print(f"⏩ Resuming: {sum(completed.values())} documents already completed in {output_path}")
         sys.stdout.flush()
 
-        for i, input_data in enumerate(inputs, 1):
-            document_url = input_data['document_url']
-            song_style = input_data.get('song_style')
+        if metric_columns is None:
+            metric_columns = self.metrics_config.get('columns', False)
+        collector = metrics.MetricsCollector(
+            jsonl_path=metrics_path or self.metrics_config.get('jsonl'),
+            prometheus_path=prometheus_path or self.metrics_config.get('prometheus'),
+        )
+        fields = OUTPUT_FIELDS + metrics.METRIC_FIELDS if metric_columns else OUTPUT_FIELDS
 
-            print(f"\n📄 Processing {i}/{total_inputs}: {document_url}")
-            print(f"Progress: {i}/{total_inputs} ({i/total_inputs*100:.1f}%)")
-            sys.stdout.flush()
-            
-            try:
-                result = self.process_single_input(document_url, song_style, verbose=False)
-                results.append(result)
-                print(f"✅ Completed {i}/{total_inputs}")
-                sys.stdout.flush()
-            except Exception as e:
-                print(f"❌ Error processing {i}/{total_inputs}: {e}")
-                sys.stdout.flush()
-                # Add error result to maintain order
-                results.append({
-                    'document_url': document_url,
-                    'song_style': song_style or 'Error',
-                    'song_lyrics': f'Error processing: {e}'
-                })
-
-        # Create DataFrame and save
-        df = pd.DataFrame(results)
-        df.to_csv(output_path, index=False)
-        print(f"\n🎉 Batch processing complete!")
-        print(f"📊 Results saved to {output_path}")
-        print(f"✅ Successfully processed: {len([r for r in results if not r['song_lyrics'].startswith('Error')])}/{total_inputs}")
+        manifest = Manifest(manifest_path) if manifest_path else None
+        try:
+            with ResultWriter(output_path, append=resume, fields=fields) as writer:
+                stats = self._run(
+                    lambda: self._aprocess_multiple_inputs(
+                        inputs, concurrency, writer, manifest, completed, collector, metric_columns,
+                        succeeded_keys=succeeded_keys
+                    )
+                )
+        finally:
+            collector.close()
+            if manifest:
+                manifest.close()
+
+        if resume and existing_rows:
+            compact_resumed_output(output_path, existing_rows)
+
+        console.print(f"\n🎉 Batch processing complete!")
+        console.print(f"📊 Results saved to {output_path}")
+        console.print(f"✅ Successfully processed: {stats['succeeded'] + stats['skipped']}/{stats['rows']}")
+        if stats['deduplicated']:
+            console.print(f"🔗 Duplicate URLs: {stats['deduplicated']} rows shared an already fetched document "
+                  f"({stats['deduplicated']} fetches and extractions saved)")
+        downloads = self.fetcher.stats
+        if downloads['truncated'] or downloads['aborted']:
+            console.print(f"📥 Downloads: {downloads['pages']} pages, {downloads['bytes'] / 1e6:.2f} MB kept; "
+                  f"{downloads['truncated']} cut off at {self.fetcher.max_bytes} bytes, "
+                  f"{downloads['aborted']} aborted as non-HTML")
+        if self.controller.retries:
+            lyrics_window = self.controller.budgets['lyrics']
+            console.print(
+                f"🔁 Retried requests: {self.controller.retries}, "
+                f"throttled: {sum(budget.throttled for budget in self.controller.budgets.values())}, "
+                f"lyric concurrency now {int(lyrics_window.limit)}"
+            )
+        if manifest:
+            console.print(
+                f"♻️  Reused: {stats['reused']}, "
+                f"regenerated: {stats['regenerated']}, "
+                f"new: {stats['new']}"
+            )
+        if collector.statuses:
+            console.print("⏱️  Per-row stage timings:")
+            for line in collector.summary_lines():
+                console.print(f"   {line}")
         sys.stdout.flush()
 
-        return df
+        if not return_results:
+            return None
+        import pandas as pd
+        return pd.read_csv(output_path, keep_default_na=False)
+
+    async def _aprocess_multiple_inputs(
+        self,
+        inputs: Iterable[Dict[str, str]],
+        concurrency: int,
+        writer: ResultWriter,
+        manifest: Optional[Manifest] = None,
+        completed: Optional[Counter] = None,
+        collector: Optional[metrics.MetricsCollector] = None,
+        metric_columns: bool = False,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        succeeded_keys: Optional[Set[str]] = None
+    ) -> Counter:
+        """
+        Run the batch through the staged pipeline (fetch, extract, style, lyrics, write).
+
+        Args:
+            inputs: Iterable of dictionaries with 'document_url' and optional 'song_style'
+            concurrency: Number of workers per network-bound stage
+            writer: Writer that receives each result, or a ResultStream
+            manifest: Optional manifest for incremental mode
+            completed: Successful rows per document key already in the output (for resume)
+            collector: Optional metrics collector for per-row instrumentation
+            metric_columns: Add each row's metrics to its result as extra columns
+            on_progress: Optional callback receiving row counts after each row is written
+            succeeded_keys: Optional set receiving the document key of each row that succeeded
+                from its fetched content
+
+        Returns:
+            Counts of 'rows', 'succeeded', 'failed', 'skipped' and 'deduplicated' rows, plus manifest statuses
+        """
+        pipeline = BatchPipeline(
+            self,
+            concurrency,
+            writer,
+            manifest=manifest,
+            completed=completed,
+            queue_size=self.pipeline_config.get('queue_size'),
+            extract_workers=self.pipeline_config.get('extract_workers'),
+            report_interval=self.pipeline_config.get('report_interval', 10),
+            style_batch_size=self.style_batch.get('size', 8),
+            style_batch_wait=self.style_batch.get('max_wait', 0.05),
+            metrics_collector=collector,
+            metric_columns=metric_columns,
+            shared_documents=self.pipeline_config.get('shared_documents', 1000),
+            on_progress=on_progress,
+            succeeded_keys=succeeded_keys,
+        )
+        return await pipeline.run(inputs)
+
+    def iter_results(
+        self,
+        inputs: Iterable[Dict[str, str]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = False,
+        manifest_path: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        on_log: Optional[Callable[[str], None]] = None
+    ) -> Iterator[Dict]:
+        """
+        Process documents concurrently, yielding each result as soon as it is ready.
+
+        Synchronous counterpart of aiter_results; the batch runs on a helper
+        thread with its own event loop, so it also works from inside one. The
+        callbacks are called on that thread. Stopping the iteration early
+        cancels the rest of the batch.
+
+        Args:
+            inputs: Iterable of dictionaries with 'document_url' and optional 'song_style'
+            concurrency: Maximum number of documents processed at the same time
+            ordered: Yield results in input order instead of as they complete
+            manifest_path: Optional manifest file enabling incremental mode
+            on_progress: Optional callback receiving row counts after each row
+            on_log: Optional callback receiving progress messages (dropped by default)
+
+        Yields:
+            Result dictionaries, see aiter_results
+        """
+        results: queue.Queue = queue.Queue(maxsize=concurrency)
+        finished = object()
+        state = {}
+
+        async def produce():
+            state['task'] = asyncio.current_task()
+            state['loop'] = asyncio.get_running_loop()
+            loop = state['loop']
+            async for result in self.aiter_results(
+                inputs, concurrency, ordered, manifest_path, on_progress, on_log
+            ):
+                # Blocks a helper thread rather than the loop while the caller is behind
+                await loop.run_in_executor(None, results.put, result)
+
+        def run():
+            try:
+                asyncio.run(produce())
+            except asyncio.CancelledError:
+                pass
+            except BaseException as e:
+                state['error'] = e
+            finally:
+                results.put(finished)
+
+        thread = threading.Thread(target=run, name='doc2beat-results', daemon=True)
+        thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is finished:
+                    break
+                yield result
+            if 'error' in state:
+                raise state['error']
+        finally:
+            if thread.is_alive():
+                if 'task' in state:
+                    state['loop'].call_soon_threadsafe(state['task'].cancel)
+                # Keep draining so that nothing stays blocked on a full queue
+                while thread.is_alive():
+                    try:
+                        results.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                thread.join()
+
+    async def aiter_results(
+        self,
+        inputs: Iterable[Dict[str, str]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = False,
+        manifest_path: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        on_log: Optional[Callable[[str], None]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Process documents concurrently, yielding each result as soon as it is ready.
+
+        Runs the same pipeline as process_multiple_inputs, but nothing is written
+        to disk, pandas isn't needed and nothing is printed: progress goes to the
+        callbacks instead. A consumer that falls behind holds the pipeline back,
+        and leaving the loop early cancels the rest of the batch. A document that
+        can't be fetched fails with the fetch error, without any LLM calls,
+        instead of getting a song about a placeholder as in CSV batches.
+
+        Args:
+            inputs: Iterable (possibly lazy) of dictionaries with 'document_url' and optional 'song_style'
+            concurrency: Maximum number of documents processed at the same time
+            ordered: Yield results in input order instead of as they complete
+            manifest_path: Optional manifest file enabling incremental mode
+            on_progress: Optional callback receiving counts of done, succeeded, failed
+                and skipped rows (and the total, when known) after each row
+            on_log: Optional callback receiving progress messages (dropped by default)
+
+        Yields:
+            Dictionaries with 'index' (1-based position in inputs), 'document_url',
+            'song_style', 'song_lyrics', 'status' ('succeeded', 'reused' or 'failed'),
+            'error' (None unless failed, when song_lyrics is None) and 'metrics'
+            (stage timings, bytes, tokens and cost of the row)
+        """
+        manifest = Manifest(manifest_path) if manifest_path else None
+        try:
+            async with self._session():
+                stream = ResultStream(ordered=ordered, buffer=concurrency)
+
+                async def run():
+                    try:
+                        return await self._aprocess_multiple_inputs(
+                            inputs, concurrency, stream, manifest,
+                            collector=metrics.MetricsCollector(), on_progress=on_progress
+                        )
+                    finally:
+                        stream.close()
+
+                # The batch task inherits the redirected output; the caller's context is left alone
+                with console.redirect(on_log or console.discard):
+                    task = asyncio.ensure_future(run())
+                try:
+                    while True:
+                        result = await stream.get()
+                        if result is None:
+                            break
+                        yield result
+                    await task
+                finally:
+                    if not task.done():
+                        task.cancel()
+                        await asyncio.gather(task, return_exceptions=True)
+        finally:
+            if manifest:
+                manifest.close()
+
+    def process_sitemap(
+        self,
+        root_url: str,
+        output_path: str = "output.csv",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        state_path: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        **batch_options
+    ) -> Optional['pd.DataFrame']:
+        """
+        Process the pages of a doc site found through its sitemap.
+
+        With a state file, only pages whose sitemap lastmod changed since their
+        last successful song (or that have no lastmod) are processed, so a
+        nightly run does work in proportion to what changed on the site.
+
+        Args:
+            root_url: Doc root, or the URL of a sitemap (.xml or .xml.gz). Without a
+                sitemap, pages under the root are found by following links.
+            output_path: Path to save output CSV
+            concurrency: Maximum number of documents processed at the same time
+            state_path: Optional JSON file of lastmods from previous runs
+            max_pages: Stop discovering after this many pages (default: sitemap.max_pages in config.yaml)
+            **batch_options: Other keyword arguments of process_multiple_inputs
+                (manifest_path, return_results, metrics_path, ...)
+
+        Returns:
+            DataFrame with results, or None if return_results is False
+        """
+        console.print(f"\n🗺️  Discovering pages from {root_url}...")
+        pages = self._run(lambda: self._adiscover_pages(root_url, max_pages))
+        state = LastmodState(state_path) if state_path else None
+        changed = [page for page in pages if state is None or state.changed(page)]
+        with_lastmod = sum(1 for page in pages if page.lastmod)
+        console.print(f"🗺️  Found {len(pages)} pages ({with_lastmod} with lastmod)")
+        if state is not None:
+            console.print(f"🗺️  New or changed since the last run: {len(changed)}, unchanged: {len(pages) - len(changed)}")
+
+        # Only pages whose songs came from their fetched content count as done;
+        # a failed fetch still writes a row, but the page must be retried next run
+        succeeded = set()
+        results = self.process_multiple_inputs(
+            [{'document_url': page.url} for page in changed],
+            output_path,
+            concurrency=concurrency,
+            succeeded_keys=succeeded,
+            **batch_options
+        )
+        if state is not None:
+            state.update(pages, succeeded)
+            console.print(f"🗺️  Saved lastmod state to {state_path}")
+        return results
+
+    async def _adiscover_pages(self, root_url: str, max_pages: Optional[int] = None) -> List[PageEntry]:
+        """Async implementation of page discovery for process_sitemap."""
+        discovery = SiteDiscovery(
+            self.fetcher,
+            concurrency=self.sitemap_config.get('concurrency', 8),
+            max_pages=max_pages or self.sitemap_config.get('max_pages', 5000),
+            max_sitemaps=self.sitemap_config.get('max_sitemaps', 500),
+        )
+        return await discovery.discover(root_url)
 
     def process_from_csv(
         self,
         input_path: str,
-        output_path: str = "output.csv"
-    ) -> pd.DataFrame:
+        output_path: str = "output.csv",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        manifest_path: Optional[str] = None,
+        resume: bool = False,
+        return_results: bool = True,
+        metrics_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        metric_columns: Optional[bool] = None
+    ) -> Optional['pd.DataFrame']:
         """
         Process documents from a CSV file.
 
+        The file is streamed row by row into the batch engine rather than loaded
+        up front, so memory stays flat however many URLs it lists.
+
         Args:
             input_path: Path to input CSV file
             output_path: Path to save output CSV
+            concurrency: Maximum number of documents processed at the same time
+            manifest_path: Optional manifest file enabling incremental mode
+            resume: Only process rows that haven't already succeeded in output_path
+            return_results: Read the output back into a DataFrame when done
+            metrics_path: Optional JSON lines file for per-row metrics
+            prometheus_path: Optional Prometheus textfile for the run's totals
+            metric_columns: Add the metrics to the output CSV as extra columns
 
         Returns:
-            DataFrame with results
+            DataFrame with results, or None if return_results is False
         """
-        # Read input CSV
-        df = pd.read_csv(input_path)
+        return self.process_multiple_inputs(
+            iter_csv_inputs(input_path),
+            output_path,
+            concurrency=concurrency,
+            manifest_path=manifest_path,
+            resume=resume,
+            return_results=return_results,
+            metrics_path=metrics_path,
+            prometheus_path=prometheus_path,
+            metric_columns=metric_columns
+        )
 
-        # Convert to list of dictionaries
-        inputs = df.to_dict('records')
+    def process_from_paths(
+        self,
+        pattern: str,
+        output_path: str = "output.csv",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **batch_options
+    ) -> Optional['pd.DataFrame']:
+        """
+        Process local documentation files without going through HTTP.
+
+        Files are listed lazily (directories with os.scandir) and read
+        concurrently by the batch engine. Markdown is parsed directly into
+        documentation text, HTML goes through the usual extraction.
 
-        return self.process_multiple_inputs(inputs, output_path)
+        Args:
+            pattern: A file, a directory (scanned recursively for .md, .html, .txt, ...)
+                or a glob such as 'docs/**/*.md'
+            output_path: Path to save output CSV
+            concurrency: Maximum number of documents processed at the same time
+            **batch_options: Other keyword arguments of process_multiple_inputs
+                (manifest_path, resume, return_results, metrics_path, ...)
+
+        Returns:
+            DataFrame with results, or None if return_results is False
+        """
+        inputs = iter_local_inputs(pattern)
+        # Fail before starting the batch when nothing matches
+        first = next(inputs)
+        return self.process_multiple_inputs(
+            itertools.chain([first], inputs),
+            output_path,
+            concurrency=concurrency,
+            **batch_options
+        )
@@ -0,0 +1,509 @@
+"""HTML parsing and documentation text extraction."""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import soupsieve
+from bs4 import BeautifulSoup, Comment, NavigableString
+
+from . import console
+
+
+# Look for common documentation content containers (sites without a host rule)
+CONTENT_SELECTORS = [
+    '#awsdocs-content', '#main-content', '#main-col-body',  # AWS docs
+    'main', 'article', '.content', '.documentation', '.doc-content',
+    '.main-content', '.page-content', '.post-content', '.entry-content',
+    '#content', '#main', '#documentation', '.markdown-body'
+]
+
+# Content selectors for sites whose layout is known, keyed by hostname.
+# A rule also applies to subdomains, e.g. "readthedocs.io" covers "foo.readthedocs.io".
+HOST_SELECTORS = {
+    'docs.aws.amazon.com': ['#awsdocs-content', '#main-content', '#main-col-body'],
+    'github.com': ['.markdown-body', 'article'],
+    'gitlab.com': ['.md', '.wiki', 'article'],
+    'readthedocs.io': ['[role="main"]', '.rst-content', '.document'],
+    'readthedocs.org': ['[role="main"]', '.rst-content', '.document'],
+    'docs.python.org': ['[role="main"]', '.body', '.document'],
+    'developer.mozilla.org': ['main', 'article'],
+    'learn.microsoft.com': ['main', '#main', 'article'],
+    'cloud.google.com': ['.devsite-article-body', 'article', 'main'],
+}
+
+# Common website noise patterns
+NOISE_PATTERNS = [
+    r'cookie\s+policy',
+    r'privacy\s+policy',
+    r'terms\s+of\s+service',
+    r'follow\s+us\s+on',
+    r'subscribe\s+to',
+    r'newsletter',
+    r'social\s+media',
+    r'copyright.*?\d{4}',
+    r'all\s+rights\s+reserved',
+    r'last\s+updated.*?\d{4}',
+    r'page\s+\d+\s+of\s+\d+',
+    r'next\s+page',
+    r'previous\s+page',
+    r'home\s*>\s*.*?>\s*.*?>\s*.*?',  # Breadcrumbs
+]
+
+WHITESPACE = re.compile(r'\s+')
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+# Elements that start a new block of text
+BLOCK_TAGS = {
+    'address', 'article', 'blockquote', 'body', 'dd', 'details', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'form', 'hr', 'html', 'li', 'main', 'p', 'section',
+    'summary', 'table', 'tbody', 'thead', 'tfoot', 'tr'
+}
+
+# Classes marking callouts such as Sphinx admonitions, rendered as "> " blocks
+CALLOUT_CLASSES = {
+    'admonition', 'alert', 'callout', 'caution', 'danger', 'important', 'note',
+    'notice', 'tip', 'warning'
+}
+
+
+class ExtractionRules:
+    """
+    Per-site content selectors and noise patterns, compiled once per process.
+
+    Pages from a host with a rule only try that host's selectors; other pages
+    try the generic CONTENT_SELECTORS. All noise patterns are combined into a
+    single regex so cleaning is one pass over the text.
+    """
+
+    def __init__(
+        self,
+        host_selectors: Optional[Mapping[str, List[str]]] = None,
+        noise_patterns: Optional[List[str]] = None,
+        default_selectors: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            host_selectors: Selectors keyed by hostname (default: HOST_SELECTORS)
+            noise_patterns: Regexes removed from extracted text (default: NOISE_PATTERNS)
+            default_selectors: Selectors for hosts without a rule (default: CONTENT_SELECTORS)
+        """
+        self.host_selectors = {
+            host.lower(): list(selectors)
+            for host, selectors in (HOST_SELECTORS if host_selectors is None else host_selectors).items()
+        }
+        self.noise_patterns = list(NOISE_PATTERNS if noise_patterns is None else noise_patterns)
+        self.default_selectors = list(CONTENT_SELECTORS if default_selectors is None else default_selectors)
+        self._reset_compiled()
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping]) -> 'ExtractionRules':
+        """
+        Build rules from the `extraction` section of config.yaml, extending the built-in ones.
+
+        Args:
+            config: Mapping with optional 'hosts' ({hostname: {selectors: [...]}}) and
+                'noise_patterns' ([regex, ...]) keys
+
+        Returns:
+            Extraction rules
+        """
+        config = config or {}
+        host_selectors = dict(HOST_SELECTORS)
+        for host, rule in (config.get('hosts') or {}).items():
+            host_selectors[host] = rule['selectors'] if isinstance(rule, Mapping) else rule
+        noise_patterns = NOISE_PATTERNS + list(config.get('noise_patterns') or [])
+        return cls(host_selectors, noise_patterns)
+
+    def _reset_compiled(self):
+        self._compiled_selectors: Dict[str, List] = {}
+        self._host_cache: Dict[str, List] = {}
+        self._noise = None
+
+    def __getstate__(self):
+        # Compiled patterns are rebuilt lazily, which keeps the rules cheap to send to worker processes
+        state = dict(self.__dict__)
+        for key in ('_compiled_selectors', '_host_cache', '_noise'):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_compiled()
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the rules, so cached text extracted under other rules is redone."""
+        rules = [sorted(self.host_selectors.items()), self.noise_patterns, self.default_selectors]
+        return hashlib.sha256(json.dumps(rules).encode('utf-8')).hexdigest()[:12]
+
+    def _compile(self, selectors: List[str]) -> List:
+        compiled = []
+        for selector in selectors:
+            pattern = self._compiled_selectors.get(selector)
+            if pattern is None:
+                pattern = self._compiled_selectors[selector] = soupsieve.compile(selector)
+            compiled.append(pattern)
+        return compiled
+
+    def selectors_for(self, document_url: Optional[str]) -> List:
+        """
+        Compiled content selectors for a page.
+
+        Args:
+            document_url: URL of the page (None for the generic selectors)
+
+        Returns:
+            Compiled selectors, most specific first
+        """
+        host = (urlsplit(document_url).hostname or '').lower() if document_url else ''
+        compiled = self._host_cache.get(host)
+        if compiled is None:
+            selectors = self.default_selectors
+            # Most specific rule wins: a.b.c, then b.c, then c
+            labels = host.split('.')
+            for start in range(len(labels)):
+                rule = self.host_selectors.get('.'.join(labels[start:]))
+                if rule is not None:
+                    selectors = rule
+                    break
+            compiled = self._host_cache[host] = self._compile(selectors)
+        return compiled
+
+    def clean(self, text: str) -> str:
+        """Collapse whitespace and strip noise patterns in one regex pass."""
+        if self._noise is None:
+            self._noise = re.compile('|'.join(f'(?:{pattern})' for pattern in self.noise_patterns), re.IGNORECASE)
+        # Remove excessive whitespace
+        text = WHITESPACE.sub(' ', text)
+        if self.noise_patterns:
+            text = self._noise.sub('', text)
+        # Final cleanup
+        return WHITESPACE.sub(' ', text).strip()
+
+    def clean_blocks(self, blocks: List[str]) -> str:
+        """
+        Clean rendered blocks and join them with blank lines.
+
+        Code blocks are kept verbatim. Other blocks keep their leading Markdown
+        marker ('#', '-', '1.', '>') and are dropped if nothing is left after cleaning.
+        """
+        cleaned = []
+        for block in blocks:
+            if block.startswith('```'):
+                cleaned.append(block)
+                continue
+            marker, text = _split_marker(block)
+            text = self.clean(text)
+            if text:
+                cleaned.append(marker + text)
+        return '\n\n'.join(cleaned)
+
+
+DEFAULT_RULES = ExtractionRules()
+
+
+# Parsers in order of preference for html_parser: auto
+PARSER_BACKENDS = ['lxml', 'html.parser']
+
+
+def select_parser(preferred: str = 'auto') -> str:
+    """
+    Choose the BeautifulSoup parser backend.
+
+    Args:
+        preferred: 'auto' for the fastest installed parser, or a BeautifulSoup parser name
+
+    Returns:
+        Parser name to pass to BeautifulSoup
+    """
+    if preferred != 'auto':
+        return preferred
+    for backend in PARSER_BACKENDS:
+        if backend == 'html.parser':
+            return backend
+        try:
+            __import__(backend)
+            return backend
+        except ImportError:
+            continue
+    return 'html.parser'
+
+
+def parse_html(html_content: str, parser: str = 'html.parser') -> BeautifulSoup:
+    """Parse a page once; the tree is shared by extract_content_text and full_page_text."""
+    return BeautifulSoup(html_content, parser)
+
+
+def _detach(element, detached: List[Tuple[Comment, object]]):
+    """Take an element out of the tree, leaving a placeholder so it can be put back."""
+    # get_text() skips comments, so the placeholder adds no text
+    placeholder = Comment('')
+    element.replace_with(placeholder)
+    detached.append((placeholder, element))
+
+
+def _restore(detached: List[Tuple[Comment, object]]):
+    for placeholder, element in reversed(detached):
+        placeholder.replace_with(element)
+
+
+MARKER = re.compile(r'(?:#{1,6} |> |\s*- |\s*\d+\. )')
+
+
+def _split_marker(block: str) -> Tuple[str, str]:
+    match = MARKER.match(block)
+    return (match.group(0), block[match.end():]) if match else ('', block)
+
+
+def _is_callout(element) -> bool:
+    if element.get('role') in ('alert', 'note'):
+        return True
+    return any(name.lower() in CALLOUT_CLASSES for name in element.get('class') or [])
+
+
+class _BlockRenderer:
+    """
+    Render an element as Markdown-like blocks.
+
+    Headings become '#' lines, list items '- ' or '1. ' lines, <pre> becomes a
+    fenced code block, inline <code> is wrapped in backticks and callouts get a
+    '> ' prefix. Keeping this structure lets the content budgeter tell
+    instructions apart from prose.
+    """
+
+    def __init__(self):
+        self.blocks: List[str] = []
+        self._inline: List[str] = []
+        self._prefix = ''
+
+    def render(self, element) -> List[str]:
+        self._walk(element)
+        self._flush()
+        return self.blocks
+
+    def _flush(self):
+        text = WHITESPACE.sub(' ', ''.join(self._inline)).strip()
+        self._inline = []
+        if text:
+            self.blocks.append(self._prefix + text)
+            # A list marker only goes on the item's first block
+            self._prefix = ''
+
+    def _walk(self, element, depth: int = 0):
+        for child in element.children:
+            if isinstance(child, NavigableString):
+                # Comments include the placeholders of detached elements
+                if type(child) is NavigableString:
+                    self._inline.append(str(child))
+                continue
+
+            name = child.name
+            if name in HEADING_TAGS:
+                self._flush()
+                text = WHITESPACE.sub(' ', child.get_text(' ', strip=True))
+                if text:
+                    self.blocks.append('#' * HEADING_TAGS[name] + ' ' + text)
+            elif name == 'pre':
+                self._flush()
+                code = child.get_text().strip('\n')
+                if code.strip():
+                    self.blocks.append(f"```\n{code}\n```")
+            elif name == 'code':
+                text = child.get_text()
+                if text.strip():
+                    self._inline.append(f" `{text.strip()}` ")
+            elif name in ('ul', 'ol', 'menu'):
+                self._flush()
+                number = 0
+                for item in child.find_all('li', recursive=False):
+                    number += 1
+                    previous = self._prefix
+                    marker = f"{number}. " if name == 'ol' else '- '
+                    self._prefix = '  ' * depth + marker
+                    self._walk(item, depth + 1)
+                    self._flush()
+                    self._prefix = previous
+            elif name in ('br', 'hr'):
+                self._flush()
+            elif name in BLOCK_TAGS and _is_callout(child):
+                self._flush()
+                # The whole callout ("Warning", then its text) becomes one block
+                text = ' '.join(_split_marker(block)[1] for block in _BlockRenderer().render(child))
+                if text:
+                    self.blocks.append('> ' + text)
+            elif name in BLOCK_TAGS:
+                self._flush()
+                self._walk(child, depth)
+                self._flush()
+            elif name in ('td', 'th'):
+                self._inline.append(' ')
+                self._walk(child, depth)
+                self._inline.append(' ')
+            else:
+                self._walk(child, depth)
+
+
+def render_blocks(element) -> List[str]:
+    """
+    Render a parsed element as Markdown-like text blocks.
+
+    Args:
+        element: BeautifulSoup element or document
+
+    Returns:
+        Blocks in document order, without empty ones
+    """
+    return _BlockRenderer().render(element)
+
+
+def extract_content_text(
+    soup: BeautifulSoup,
+    document_url: Optional[str] = None,
+    rules: Optional[ExtractionRules] = None
+) -> str:
+    """
+    Extract the main documentation text, filtering out navigation, headers, footers, etc.
+
+    The text keeps the page structure as lightweight Markdown: headings, list
+    items, code blocks and callouts each form their own block.
+
+    Script, style, meta and link tags are removed from the tree for good. Other
+    elements removed while looking for the content are put back afterwards, so
+    the same tree can still be used by full_page_text().
+
+    Args:
+        soup: Parsed page
+        document_url: URL of the page, used to pick site-specific selectors
+        rules: Extraction rules (default: the built-in rules)
+
+    Returns:
+        Cleaned documentation text ('' if nothing was found)
+    """
+    rules = rules or DEFAULT_RULES
+    for element in soup(['script', 'style', 'meta', 'link']):
+        element.decompose()
+
+    detached: List[Tuple[Comment, object]] = []
+    try:
+        # Remove unwanted elements
+        for element in soup(['nav', 'header', 'footer', 'aside']):
+            _detach(element, detached)
+
+        blocks: List[str] = []
+
+        # Try to find the main content area
+        for selector in rules.selectors_for(document_url):
+            content_element = selector.select_one(soup)
+            if content_element:
+                blocks = render_blocks(content_element)
+                break
+
+        # If no specific content area found, try to extract from body but filter out common noise
+        if not blocks:
+            body = soup.find('body')
+            if body:
+                # Remove common navigation and UI elements
+                for element in body.find_all(['nav', 'header', 'footer', 'aside', 'menu', 'ul', 'ol']):
+                    if any(keyword in element.get_text().lower() for keyword in
+                           ['navigation', 'menu', 'sidebar', 'footer', 'header', 'breadcrumb', 'toc']):
+                        _detach(element, detached)
+
+                blocks = render_blocks(body)
+    finally:
+        _restore(detached)
+
+    # Clean up the text
+    return rules.clean_blocks(blocks)
+
+
+def full_page_text(soup: BeautifulSoup, max_chars: Optional[int] = None) -> str:
+    """
+    Text of the whole page (minus scripts and styles), used when extraction finds too little.
+
+    Args:
+        soup: Parsed page
+        max_chars: Limit on the returned text (None for no limit)
+
+    Returns:
+        Page text as Markdown-like blocks
+    """
+    # Remove script and style tags but keep the rest
+    for element in soup(['script', 'style']):
+        element.decompose()
+    text = '\n\n'.join(render_blocks(soup))
+    if max_chars is not None and len(text) > max_chars:
+        text = text[:max_chars]
+    return text
+
+
+def extract_page(
+    html_content: str,
+    document_url: Optional[str] = None,
+    parser: str = 'html.parser',
+    rules: Optional[ExtractionRules] = None,
+    min_chars: int = 300,
+    max_fallback_chars: Optional[int] = None
+) -> Tuple[str, int, bool]:
+    """
+    Turn a fetched page into documentation text, falling back to the full page if extraction is too small.
+
+    The page is parsed once and the same tree serves both the content
+    selectors and the full-page fallback.
+
+    Args:
+        html_content: Raw HTML content from the page
+        document_url: URL of the page, used to pick site-specific selectors
+        parser: BeautifulSoup parser backend
+        rules: Extraction rules (default: the built-in rules)
+        min_chars: Extractions shorter than this fall back to the full page
+        max_fallback_chars: Limit on the full-page fallback text (None for no limit;
+            the lyric prompt is trimmed to its token budget later anyway)
+
+    Returns:
+        Tuple of the documentation text, the length of the selector-based
+        extraction, and whether the full-page fallback was used
+    """
+    soup = None
+    try:
+        soup = parse_html(html_content, parser)
+        doc_content = extract_content_text(soup, document_url, rules) or html_content
+    except Exception as e:
+        console.print(f"Warning: Could not extract documentation content: {e}")
+        # Fallback to original content
+        doc_content = html_content
+    extracted_chars = len(doc_content)
+
+    if extracted_chars >= min_chars:
+        return doc_content, extracted_chars, False
+
+    if soup is None:
+        soup = parse_html(html_content, parser)
+    return full_page_text(soup, max_chars=max_fallback_chars), extracted_chars, True
+
+
+# Settings of an extraction worker process, sent once by init_worker instead of with every page
+_worker_settings: Dict[str, object] = {}
+
+
+def init_worker(parser: str, rules: ExtractionRules):
+    """ProcessPoolExecutor initializer for extract_page_in_worker."""
+    _worker_settings['parser'] = parser
+    _worker_settings['rules'] = rules
+
+
+def extract_page_in_worker(html_content: str, document_url: Optional[str] = None) -> Tuple[Tuple[str, int, bool], List[str]]:
+    """
+    extract_page with the parser and rules given to init_worker, for use in a process pool.
+
+    Returns:
+        Tuple of extract_page's result and the messages it printed, which the
+        caller prints again so they reach its console handler, not the worker's stdout
+    """
+    messages: List[str] = []
+    with console.redirect(messages.append):
+        extraction = extract_page(html_content, document_url, _worker_settings['parser'], _worker_settings['rules'])
+    return extraction, messages
@@ -0,0 +1,260 @@
+"""Pooled, rate-limited HTTP fetching of documentation pages."""
+
+import asyncio
+import codecs
+import contextlib
+import re
+import time
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+def _accept_encoding() -> str:
+    """Build the Accept-Encoding header from the decoders httpx can use here."""
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except ImportError:
+            pass
+    return ", ".join(encodings)
+
+
+# Content types worth downloading as documentation; anything else is aborted after the headers
+PAGE_CONTENT_TYPES = ("text/", "application/xhtml+xml", "application/xml")
+
+# How much of a page to look through for a <meta charset> declaration
+CHARSET_SNIFF_BYTES = 1024
+
+_CHARSET_PARAM = re.compile(rb'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+class UnsupportedContentError(ValueError):
+    """Raised when a page's content type isn't documentation text (PDFs, images, archives, ...)."""
+
+
+def sniff_charset(content_type: str, head: bytes) -> str:
+    """
+    Pick the encoding of a page without a full detection pass.
+
+    A byte order mark wins, then the Content-Type charset, then a
+    <meta charset> in the first bytes of the page, with UTF-8 as the fallback.
+
+    Args:
+        content_type: Content-Type header value ('' if missing)
+        head: First bytes of the body
+
+    Returns:
+        A codec name known to Python
+    """
+    candidates = []
+    match = _CHARSET_PARAM.search(content_type.encode("latin-1", "replace"))
+    if match:
+        candidates.append(match.group(1))
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = _CHARSET_PARAM.search(head[:CHARSET_SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate.decode("ascii", "replace")).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+class PageResponse:
+    """A page downloaded by DocumentFetcher.get_page, decoded and possibly truncated."""
+
+    __slots__ = ("url", "status_code", "headers", "text", "num_bytes_downloaded", "truncated", "_response")
+
+    def __init__(self, response: httpx.Response, text: str, truncated: bool):
+        self.url = response.url
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.text = text
+        # Bytes on the wire, before decompression
+        self.num_bytes_downloaded = response.num_bytes_downloaded
+        self.truncated = truncated
+        self._response = response
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+
+class _RateLimiter:
+    """Spaces requests evenly so that at most `rate` start per second."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        # Reserve the next slot under the lock, then sleep outside it
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class DocumentFetcher:
+    """
+    Shared HTTP client for documentation pages.
+
+    Connections are pooled and kept alive for the whole run, requests to any
+    one host are capped, and an optional per-host requests-per-second limit
+    keeps batches that hit a few doc sites from being throttled.
+
+    Pages fetched with get_page are streamed: bodies are cut off at
+    `max_bytes` and non-text content types are dropped after the headers.
+    Counts of pages, bytes, truncations and aborts since the fetcher was last
+    opened are kept in `stats`.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        per_host_concurrency: int = 4,
+        requests_per_second: float = 0,
+        timeout: float = 15.0,
+        max_bytes: int = 2_000_000
+    ):
+        """
+        Configure the fetcher. The connection pool is opened by `async with`.
+
+        Args:
+            max_connections: Size of the connection pool shared by all hosts
+            per_host_concurrency: Maximum simultaneous requests to one host
+            requests_per_second: Per-host rate limit (0 disables it)
+            timeout: Request timeout in seconds
+            max_bytes: Stop downloading a page after this many (decompressed) bytes (0 for no limit)
+        """
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.stats: Counter = Counter()
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_rates: Dict[str, _RateLimiter] = {}
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            headers={"Accept-Encoding": _accept_encoding()},
+        )
+        # Semaphores and locks belong to the loop they are used on, so start fresh per run
+        self._host_slots = {}
+        self._host_rates = {}
+        self.stats = Counter()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        client, self._client = self._client, None
+        await client.aclose()
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        GET a URL through the pool, respecting the per-host limits.
+
+        Args:
+            url: URL to fetch
+            headers: Optional extra request headers
+
+        Returns:
+            The httpx response (body already read)
+        """
+        if self._client is None:
+            raise RuntimeError("DocumentFetcher must be opened with 'async with' before use")
+
+        async with self._slot(url):
+            return await self._client.get(url, headers=headers)
+
+    async def get_page(self, url: str, headers: Optional[Dict[str, str]] = None) -> PageResponse:
+        """
+        Stream a documentation page through the pool, respecting the per-host limits.
+
+        The download stops after max_bytes (the page is then truncated) and is
+        abandoned right after the headers when the content type isn't text or
+        HTML. Only the bytes kept are decoded, using sniff_charset.
+
+        Args:
+            url: URL to fetch
+            headers: Optional extra request headers
+
+        Returns:
+            The decoded page
+
+        Raises:
+            UnsupportedContentError: If the page isn't text or HTML
+        """
+        if self._client is None:
+            raise RuntimeError("DocumentFetcher must be opened with 'async with' before use")
+
+        async with self._slot(url):
+            async with self._client.stream("GET", url, headers=headers) as response:
+                content_type = response.headers.get("content-type", "")
+                if response.status_code == 200 and content_type and not content_type.lower().startswith(PAGE_CONTENT_TYPES):
+                    self.stats["aborted"] += 1
+                    raise UnsupportedContentError(f"not a documentation page ({content_type.split(';')[0]})")
+
+                chunks = []
+                size = 0
+                truncated = False
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        # Leaving the block closes the connection instead of draining the rest
+                        truncated = True
+                        break
+
+        body = b"".join(chunks)
+        if self.max_bytes:
+            body = body[:self.max_bytes]
+        self.stats["pages"] += 1
+        self.stats["bytes"] += len(body)
+        if truncated:
+            self.stats["truncated"] += 1
+        text = body.decode(sniff_charset(content_type, body), errors="replace")
+        return PageResponse(response, text, truncated)
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, url: str):
+        """Hold one of a host's request slots, after waiting for its rate limit."""
+        host = urlsplit(url).netloc.lower()
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_concurrency)
+
+        async with slots:
+            if self.requests_per_second:
+                rate = self._host_rates.get(host)
+                if rate is None:
+                    rate = self._host_rates[host] = _RateLimiter(self.requests_per_second)
+                await rate.wait()
+            yield
@@ -0,0 +1,182 @@
+"""Genre catalog used to seed song style generation."""
+
+import csv
+import io
+import random
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+
+# Comprehensive list of music genres from Wikipedia. Some genres appear under
+# more than one heading; GenreCatalog drops the repeats.
+DEFAULT_GENRES = [
+    # Classical
+    "Baroque", "Classical", "Romantic", "Modern Classical", "Opera", "Chamber Music", "Symphony", "Concerto",
+
+    # Popular - Avant-garde & experimental
+    "Avant-garde", "Experimental", "Noise", "Ambient", "Drone", "Minimalism",
+
+    # Blues
+    "Blues", "Delta Blues", "Chicago Blues", "Electric Blues", "Blues Rock", "Rhythm and Blues",
+
+    # Country
+    "Country", "Country Rock", "Bluegrass", "Honky-tonk", "Outlaw Country", "Country Pop", "Alt-Country", "Country Folk",
+
+    # Easy listening
+    "Easy Listening", "Lounge", "Smooth Jazz", "Adult Contemporary", "Soft Rock",
+
+    # Electronic
+    "Electronic", "House", "Techno", "Trance", "Ambient", "IDM", "Dubstep", "Drum and Bass", "Breakbeat", "Electro", "Synthwave", "Vaporwave", "Chillwave", "Future Bass", "Trap", "Lo-fi Hip Hop",
+
+    # Folk
+    "Folk", "Folk Rock", "Indie Folk", "Singer-Songwriter", "Acoustic Folk", "Celtic Folk", "Americana", "Roots Music",
+
+    # Hip hop
+    "Hip Hop", "Rap", "Trap", "Drill", "Boom Bap", "Alternative Hip Hop", "Conscious Rap", "Gangsta Rap", "Mumble Rap",
+
+    # Jazz
+    "Jazz", "Bebop", "Swing", "Big Band", "Cool Jazz", "Hard Bop", "Free Jazz", "Fusion", "Smooth Jazz", "Vocal Jazz", "Jazz Blues",
+
+    # Pop
+    "Pop", "Pop Rock", "Power Pop", "Bubblegum Pop", "Teen Pop", "Dance Pop", "Electropop", "Synthpop", "Indie Pop", "Art Pop", "Baroque Pop",
+
+    # R&B & Soul
+    "R&B", "Soul", "Motown", "Funk", "Disco", "Contemporary R&B", "Neo-Soul", "Gospel", "Spirituals",
+
+    # Rock
+    "Rock", "Rock and Roll", "Classic Rock", "Hard Rock", "Soft Rock", "Progressive Rock", "Psychedelic Rock", "Art Rock", "Alternative Rock", "Indie Rock", "Grunge", "Britpop", "Post-Rock", "Math Rock", "Shoegaze", "Dream Pop",
+
+    # Metal
+    "Heavy Metal", "Thrash Metal", "Death Metal", "Black Metal", "Power Metal", "Progressive Metal", "Nu Metal", "Metalcore", "Deathcore",
+
+    # Punk
+    "Punk", "Hardcore Punk", "Post-Punk", "New Wave", "Post-Hardcore", "Emo", "Pop Punk", "Ska Punk", "Crust Punk",
+
+    # Regional - African
+    "Afrobeat", "Highlife", "Mbalax", "Soukous", "Kwaito", "Afro-pop", "Afro-jazz",
+
+    # Regional - Asian
+    "J-pop", "K-pop", "C-pop", "Bollywood", "Enka", "Kayokyoku", "Mandopop", "Cantopop",
+
+    # Regional - European
+    "Europop", "Eurodance", "Italo Disco", "French Pop", "Schlager", "Fado", "Flamenco", "Celtic", "Folk Rock",
+
+    # Regional - Latin & South American
+    "Salsa", "Merengue", "Bachata", "Reggaeton", "Cumbia", "Bossa Nova", "Samba", "Tango", "Mariachi", "Latin Pop", "Latin Rock",
+
+    # Regional - North American
+    "Americana", "Bluegrass", "Cajun", "Zydeco", "Tejano", "Native American Music",
+
+    # Religious
+    "Gospel", "Christian Rock", "Christian Pop", "Contemporary Christian", "Spirituals", "Sacred Music", "Chant", "Hymns",
+
+    # Traditional folk
+    "Traditional Folk", "World Music", "Ethnic Music", "Indigenous Music", "Folk Revival", "Protest Songs",
+
+    # Other
+    "New Age", "Worldbeat", "Fusion", "Crossover", "Experimental Rock", "Art Rock", "Prog Rock", "Space Rock", "Krautrock", "Canterbury Scene"
+]
+
+# Suno v5 experimental genres used in extra creative mode, shipped with the package
+SUNO_GENRES_FILE = "suno_v5_genres.csv"
+
+
+class GenreCatalog:
+    """An immutable, de-duplicated list of genres."""
+
+    def __init__(self, genres: Iterable[str]):
+        """
+        Args:
+            genres: Genre names; blanks and case-insensitive repeats are dropped
+        """
+        seen = set()
+        unique = []
+        for genre in genres:
+            genre = genre.strip()
+            if genre and genre.lower() not in seen:
+                seen.add(genre.lower())
+                unique.append(genre)
+        self.genres = tuple(unique)
+
+    def __len__(self) -> int:
+        return len(self.genres)
+
+    def sample(self, k: int = 5, rng: Optional[random.Random] = None) -> List[str]:
+        """Pick k distinct genres without shuffling the whole catalog."""
+        return (rng or random).sample(self.genres, min(k, len(self.genres)))
+
+
+class GenreDeck:
+    """
+    Deals genre samples so that a batch covers the catalog evenly.
+
+    Genres are dealt from a shuffled deck: every genre is offered once before
+    any is offered again, and the deck is reshuffled when it runs out. With
+    `balanced=False` every hand is an independent random sample instead.
+    """
+
+    def __init__(self, catalog: GenreCatalog, seed: Optional[int] = None, balanced: bool = True):
+        """
+        Args:
+            catalog: Genres to deal from
+            seed: Random seed for reproducible samples (None for a random one)
+            balanced: Deal from a shuffled deck instead of sampling independently
+        """
+        self.catalog = catalog
+        self.balanced = balanced
+        self._rng = random.Random(seed)
+        self._deck: List[str] = []
+
+    def deal(self, k: int = 5) -> List[str]:
+        """
+        Deal k distinct genres.
+
+        Args:
+            k: Number of genres
+
+        Returns:
+            Genre names
+        """
+        if not self.balanced:
+            return self.catalog.sample(k, self._rng)
+
+        k = min(k, len(self.catalog))
+        hand: List[str] = []
+        while len(hand) < k:
+            if not self._deck:
+                self._deck = list(self.catalog.genres)
+                self._rng.shuffle(self._deck)
+            genre = self._deck.pop()
+            if genre in hand:
+                # Only possible right after a reshuffle; put it back for the next hand
+                self._deck.insert(0, genre)
+                continue
+            hand.append(genre)
+        return hand
+
+
+def _read_package_text(name: str) -> str:
+    try:
+        from importlib.resources import files
+    except ImportError:
+        # Python 3.8
+        from importlib.resources import read_text
+        return read_text(__package__, name, encoding="utf-8")
+    return files(__package__).joinpath(name).read_text(encoding="utf-8")
+
+
+@lru_cache(maxsize=None)
+def load_catalog(extra_creative: bool = False) -> GenreCatalog:
+    """
+    Load a genre catalog, once per process.
+
+    Args:
+        extra_creative: Load the Suno v5 experimental genres instead of the default list
+
+    Returns:
+        Genre catalog
+    """
+    if not extra_creative:
+        return GenreCatalog(DEFAULT_GENRES)
+    rows = csv.DictReader(io.StringIO(_read_package_text(SUNO_GENRES_FILE)))
+    return GenreCatalog(row["genre"] for row in rows)
@@ -0,0 +1,46 @@
+"""Lazy readers for batch input rows."""
+
+import csv
+from typing import IO, Dict, Iterator
+
+
+def iter_csv_inputs(input_path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream input rows from a CSV file one at a time.
+
+    Only the row being handed to the batch engine is held in memory, so the
+    first document starts right away and memory stays flat however large the
+    file is. The file is opened and its header checked right away, so a bad
+    input fails before anything (such as the output file) is touched.
+
+    Args:
+        input_path: Path to CSV with a document_url column and an optional song_style column
+
+    Returns:
+        Iterator of dictionaries with 'document_url' and 'song_style' (None when blank or missing)
+
+    Raises:
+        OSError: If the file can't be opened
+        ValueError: If the file has no document_url column
+    """
+    f = open(input_path, 'r', newline='', encoding='utf-8-sig')
+    try:
+        reader = csv.DictReader(f)
+        if 'document_url' not in (reader.fieldnames or []):
+            raise ValueError(f"Input CSV {input_path} must have a document_url column")
+    except BaseException:
+        f.close()
+        raise
+    return _iter_csv_rows(f, reader)
+
+
+def _iter_csv_rows(f: IO[str], reader: csv.DictReader) -> Iterator[Dict[str, str]]:
+    with f:
+        for row in reader:
+            document_url = (row.get('document_url') or '').strip()
+            if not document_url:
+                continue
+            yield {
+                'document_url': document_url,
+                'song_style': (row.get('song_style') or '').strip() or None,
+            }
@@ -0,0 +1,310 @@
+"""Local documentation files: discovery, fast reading and direct Markdown parsing."""
+
+import glob
+import itertools
+import mmap
+import os
+import re
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+
+MARKDOWN_EXTENSIONS = {'.md', '.markdown', '.mdx'}
+HTML_EXTENSIONS = {'.html', '.htm'}
+TEXT_EXTENSIONS = {'.txt', '.rst'}
+DOCUMENT_EXTENSIONS = MARKDOWN_EXTENSIONS | HTML_EXTENSIONS | TEXT_EXTENSIONS
+
+# Directories never worth descending into when scanning a docs tree
+SKIP_DIRS = {'node_modules', '__pycache__', 'site-packages', '_build', 'venv'}
+
+# Files at least this big are memory-mapped instead of read into a buffer first
+MMAP_THRESHOLD = 1024 * 1024
+
+FRONT_MATTER = re.compile(r'\A(?:---|\+\+\+)\s*\n.*?\n(?:---|\+\+\+)\s*\n', re.DOTALL)
+HTML_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+FENCE = re.compile(r'^\s*(```|~~~)')
+ATX_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+SETEXT_UNDERLINE = re.compile(r'^\s*(=+|-+)\s*$')
+BULLET = re.compile(r'^(\s*)[-*+]\s+(?:\[[ xX]\]\s+)?(.*)$')
+NUMBERED = re.compile(r'^(\s*)(\d+)[.)]\s+(.*)$')
+QUOTE = re.compile(r'^\s*>\s?(.*)$')
+GITHUB_ALERT = re.compile(r'^\[!(NOTE|TIP|IMPORTANT|WARNING|CAUTION)\]\s*', re.IGNORECASE)
+ADMONITION = re.compile(r'^(?:!!!|\?\?\?\+?|:::)\s*(\w+)(?:\s+"([^"]*)")?\s*$')
+REFERENCE_DEFINITION = re.compile(r'^\s*\[[^\]]+\]:\s+\S+')
+TABLE_RULE = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+IMAGE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+LINK = re.compile(r'\[([^\]]+)\]\([^)]*\)|\[([^\]]+)\]\[[^\]]*\]')
+EMPHASIS = re.compile(r'(\*\*|__|\*|_|~~)(?=\S)(.+?)(?<=\S)\1')
+CODE_SPAN = re.compile(r'(`+[^`]*`+)')
+INLINE_TAG = re.compile(r'</?[a-zA-Z][^>]*>')
+WHITESPACE = re.compile(r'\s+')
+
+
+def is_local(document_url: str) -> bool:
+    """
+    Whether an input refers to a local file rather than a web page.
+
+    file:// URLs, Windows drive paths and existing files are local, as are
+    path-like inputs ('/...', './...', '~/...', 'docs/guide.md'). A scheme-less
+    input whose first segment looks like a host ('example.com/page') is not.
+    """
+    scheme = urlsplit(document_url).scheme.lower()
+    if scheme in ('http', 'https'):
+        return False
+    # One-letter schemes are Windows drive letters
+    if scheme == 'file' or len(scheme) == 1 or os.path.exists(os.path.expanduser(document_url)):
+        return True
+    if scheme:
+        return False
+    if document_url.startswith(('/', '\\', '.', '~')):
+        return True
+    first, _, rest = document_url.replace('\\', '/').partition('/')
+    if rest:
+        return '.' not in first
+    return os.path.splitext(first)[1].lower() in DOCUMENT_EXTENSIONS
+
+
+def local_path(document_url: str) -> str:
+    """File system path of a local input."""
+    parts = urlsplit(document_url)
+    if parts.scheme.lower() == 'file':
+        return url2pathname(parts.path)
+    return os.path.expanduser(document_url)
+
+
+def _scan_directory(directory: str) -> Iterator[str]:
+    """Documents under a directory, depth first, in name order, skipping hidden and vendored directories."""
+    try:
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name not in SKIP_DIRS:
+                yield from _scan_directory(entry.path)
+        elif os.path.splitext(entry.name)[1].lower() in DOCUMENT_EXTENSIONS:
+            yield entry.path
+
+
+def iter_local_inputs(pattern: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream input rows for local documentation files.
+
+    The first file is looked up right away, so a pattern matching nothing fails
+    before anything (such as the output file) is touched.
+
+    Args:
+        pattern: A file, a directory (scanned recursively) or a glob such as
+            'docs/**/*.md'
+
+    Returns:
+        Iterator of dictionaries with 'document_url' (the file path) and 'song_style' (None)
+
+    Raises:
+        ValueError: If no documentation files are found
+    """
+    if os.path.isdir(pattern):
+        paths = _scan_directory(pattern)
+    elif os.path.isfile(pattern):
+        paths = iter([pattern])
+    else:
+        paths = (
+            path for path in sorted(glob.iglob(pattern, recursive=True))
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in DOCUMENT_EXTENSIONS
+        )
+
+    first = next(paths, None)
+    if first is None:
+        raise ValueError(f"No documentation files ({', '.join(sorted(DOCUMENT_EXTENSIONS))}) found at {pattern}")
+    return ({'document_url': path, 'song_style': None} for path in itertools.chain([first], paths))
+
+
+def read_text(path: str) -> Tuple[str, int]:
+    """
+    Read a text file as UTF-8.
+
+    Big files are memory-mapped and decoded straight from the mapping, which
+    skips copying them into an intermediate buffer.
+
+    Returns:
+        Tuple of the text and the file size in bytes
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            data = f.read()
+            return data.decode('utf-8-sig', errors='replace'), size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                return str(view, 'utf-8-sig', 'replace'), size
+
+
+def _inline(text: str) -> str:
+    """Strip inline Markdown (links, images, emphasis, HTML tags), keeping `code` spans."""
+    parts = CODE_SPAN.split(text) if '`' in text else [text]
+    for i in range(0, len(parts), 2):
+        # Most lines have no markup at all, so only run the patterns that can match
+        part = parts[i]
+        if '[' in part:
+            part = LINK.sub(_link_text, IMAGE.sub(r'\1', part))
+        if '<' in part:
+            part = INLINE_TAG.sub('', part)
+        if '*' in part or '_' in part or '~' in part:
+            part = EMPHASIS.sub(r'\2', part)
+        parts[i] = part
+    return WHITESPACE.sub(' ', ''.join(parts)).strip()
+
+
+def _link_text(match) -> str:
+    return match.group(1) or match.group(2)
+
+
+def markdown_to_text(markdown: str) -> str:
+    """
+    Convert Markdown into the block text produced by HTML extraction.
+
+    Headings become '#' lines, list items '- ' or '1. ' blocks, fenced code
+    stays fenced, and blockquotes, GitHub alerts and admonitions become '> '
+    callouts, all without rendering to HTML and scraping it again.
+
+    Args:
+        markdown: Markdown source
+
+    Returns:
+        Blocks separated by blank lines
+    """
+    markdown = FRONT_MATTER.sub('', markdown.replace('\r\n', '\n'), count=1)
+    markdown = HTML_COMMENT.sub('', markdown)
+
+    blocks: List[str] = []
+    paragraph: List[str] = []
+    quote: List[str] = []
+    fence: List[str] = []
+    fence_marker = None
+    admonition = None
+
+    def flush():
+        nonlocal paragraph, quote
+        if paragraph:
+            text = _inline(' '.join(paragraph))
+            if text:
+                blocks.append(text)
+            paragraph = []
+        if quote:
+            text = _inline(' '.join(quote))
+            alert = GITHUB_ALERT.match(text)
+            if alert:
+                text = f"{alert.group(1).capitalize()}: {text[alert.end():]}"
+            if text:
+                blocks.append('> ' + text)
+            quote = []
+
+    for line in markdown.split('\n'):
+        if fence_marker:
+            if line.strip().startswith(fence_marker):
+                blocks.append('```\n' + '\n'.join(fence) + '\n```')
+                fence, fence_marker = [], None
+            else:
+                fence.append(line)
+            continue
+
+        if admonition is not None:
+            # Admonition bodies are indented by four spaces
+            if line.startswith('    ') or not line.strip():
+                if line.strip():
+                    admonition.append(line.strip())
+                continue
+            blocks.append('> ' + _inline(' '.join(admonition)))
+            admonition = None
+
+        fence_match = FENCE.match(line)
+        if fence_match:
+            flush()
+            fence_marker = fence_match.group(1)
+            continue
+        if not line.strip():
+            flush()
+            continue
+        # A '---' under a paragraph is a setext heading, not a table rule (those have pipes)
+        if paragraph and not quote and '|' not in line and SETEXT_UNDERLINE.match(line):
+            level = '#' if line.strip().startswith('=') else '##'
+            text = _inline(' '.join(paragraph))
+            paragraph = []
+            if text:
+                blocks.append(f"{level} {text}")
+            continue
+        if REFERENCE_DEFINITION.match(line) or TABLE_RULE.match(line):
+            continue
+
+        heading = ATX_HEADING.match(line)
+        if heading:
+            flush()
+            text = _inline(heading.group(2))
+            if text:
+                blocks.append(f"{heading.group(1)} {text}")
+            continue
+
+        callout = ADMONITION.match(line)
+        if callout:
+            flush()
+            title = callout.group(2) or callout.group(1).capitalize()
+            admonition = [f"{title}:"]
+            continue
+
+        quoted = QUOTE.match(line)
+        if quoted:
+            if paragraph:
+                flush()
+            quote.append(quoted.group(1))
+            continue
+
+        item = BULLET.match(line) or NUMBERED.match(line)
+        if item:
+            flush()
+            indent = '  ' * (len(item.group(1).expandtabs(4)) // 2)
+            marker = f"{item.group(2)}. " if item.re is NUMBERED else '- '
+            text = _inline(item.group(item.re.groups))
+            if text:
+                blocks.append(indent + marker + text)
+            continue
+
+        if quote:
+            # Lazy continuation of a blockquote
+            quote.append(line)
+        elif blocks and not paragraph and line.startswith((' ', '\t')) and blocks[-1].lstrip()[:1] in '-0123456789':
+            # Continuation line of a list item
+            blocks[-1] += ' ' + _inline(line)
+        else:
+            paragraph.append(line)
+
+    if fence_marker:
+        blocks.append('```\n' + '\n'.join(fence) + '\n```')
+    if admonition is not None:
+        blocks.append('> ' + _inline(' '.join(admonition)))
+    flush()
+    return '\n\n'.join(blocks)
+
+
+def read_local_document(path: str) -> Tuple[str, bool, int]:
+    """
+    Read a local documentation file.
+
+    Markdown is converted directly to extraction blocks, plain text is used as
+    is, and HTML is returned raw for the usual extraction.
+
+    Args:
+        path: File path
+
+    Returns:
+        Tuple of the text, whether it is HTML that still needs extracting, and the file size
+    """
+    text, size = read_text(path)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in HTML_EXTENSIONS:
+        return text, True, size
+    if extension in MARKDOWN_EXTENSIONS:
+        return markdown_to_text(text), False, size
+    return text.strip(), False, size
@@ -0,0 +1,118 @@
+"""Manifest of previously generated songs, used to skip unchanged documents."""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from .urls import document_key
+
+
+class Manifest:
+    """
+    Record of (URL, content hash, style, model, lyrics) from earlier runs.
+
+    The file is JSON lines, appended to as each row finishes so that a crash
+    loses nothing, and compacted to one line per URL on close.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load a manifest, creating it on first write if it doesn't exist.
+
+        Args:
+            path: Path to the manifest JSON lines file
+        """
+        self.path = path
+        self._records: Dict[str, Dict[str, str]] = {}
+        self._file = None
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash mid-write can leave a truncated last line
+                        continue
+                    self._records[document_key(record["url"])] = record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def hash_content(document_content: str) -> str:
+        """Hash extracted document text."""
+        return hashlib.sha256(document_content.encode("utf-8")).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict[str, str]]:
+        """Return the stored record for a URL, if any."""
+        return self._records.get(document_key(url))
+
+    @staticmethod
+    def is_current(
+        record: Dict[str, str],
+        content_hash: str,
+        model: str,
+        song_style: Optional[str] = None
+    ) -> bool:
+        """
+        Whether a stored record can be reused for this row.
+
+        Args:
+            record: Stored manifest record
+            content_hash: Hash of the freshly extracted document text
+            model: Model that would generate the song now
+            song_style: Style requested by the row, if any
+
+        Returns:
+            True if the content and model are unchanged and the style still fits
+        """
+        return (
+            record["content_hash"] == content_hash
+            and record["model"] == model
+            and (song_style is None or record["song_style"] == song_style)
+        )
+
+    def record(self, url: str, content_hash: str, song_style: str, model: str, song_lyrics: str):
+        """
+        Store a freshly generated song.
+
+        Args:
+            url: Document URL
+            content_hash: Hash of the extracted document text
+            song_style: Style the song was generated with
+            model: Model that generated it
+            song_lyrics: Generated lyrics
+        """
+        record = {
+            "url": url,
+            "content_hash": content_hash,
+            "song_style": song_style,
+            "model": model,
+            "song_lyrics": song_lyrics,
+        }
+        self._records[document_key(url)] = record
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Rewrite the manifest with one line per URL."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,302 @@
+"""Per-row timing, bandwidth, token and cost instrumentation."""
+
+import contextlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+
+STAGES = ('fetch', 'extract', 'style', 'condense', 'lyrics')
+
+# Extra output columns added by --metrics-columns
+METRIC_FIELDS = [f'{stage}_seconds' for stage in STAGES] + [
+    'total_seconds', 'fetch_bytes', 'prompt_tokens', 'completion_tokens', 'cost_usd'
+]
+
+# Rows the code running in this context works for. Style batches serve several rows at once.
+_current_rows: ContextVar[Tuple['RowMetrics', ...]] = ContextVar('doc2beat_rows', default=())
+_active_stages: ContextVar[frozenset] = ContextVar('doc2beat_stages', default=frozenset())
+
+
+class RowMetrics:
+    """Measurements for one input row."""
+
+    __slots__ = ('document_url', 'started', 'finished', 'stages', 'fetch_bytes', 'calls')
+
+    def __init__(self, document_url: str):
+        self.document_url = document_url
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.stages: Dict[str, float] = Counter()
+        self.fetch_bytes = 0
+        self.calls: List[Dict] = []
+
+    @property
+    def total_seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def tokens(self, kind: str) -> float:
+        return sum(call[f'{kind}_tokens'] for call in self.calls)
+
+    @property
+    def cost(self) -> Optional[float]:
+        costs = [call['cost_usd'] for call in self.calls]
+        if not costs or any(cost is None for cost in costs):
+            return None
+        return sum(costs)
+
+    def as_fields(self) -> Dict[str, object]:
+        """Values for the METRIC_FIELDS output columns."""
+        fields = {f'{stage}_seconds': round(self.stages[stage], 3) for stage in STAGES}
+        cost = self.cost
+        fields.update(
+            total_seconds=round(self.total_seconds, 3),
+            fetch_bytes=self.fetch_bytes,
+            prompt_tokens=round(self.tokens('prompt')),
+            completion_tokens=round(self.tokens('completion')),
+            cost_usd='' if cost is None else round(cost, 6),
+        )
+        return fields
+
+    def as_record(self, status: str) -> Dict[str, object]:
+        """JSON lines record for the row."""
+        record = {'document_url': self.document_url, 'status': status}
+        record.update(self.as_fields())
+        record['cost_usd'] = self.cost
+        record['calls'] = self.calls
+        return record
+
+
+@contextlib.contextmanager
+def bind(*rows: RowMetrics) -> Iterator[None]:
+    """Attribute measurements made in this context (and tasks it starts) to the given rows."""
+    token = _current_rows.set(tuple(row for row in rows if row is not None))
+    try:
+        yield
+    finally:
+        _current_rows.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a stage for the current rows.
+
+    Each row is charged the full wall time, since it waited that long. Nested
+    timers for a stage that is already being timed don't count twice.
+    """
+    active = _active_stages.get()
+    rows = _current_rows.get()
+    if not rows or name in active:
+        yield
+        return
+    token = _active_stages.set(active | {name})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _active_stages.reset(token)
+        for row in rows:
+            row.stages[name] += elapsed
+
+
+def add_fetch_bytes(num_bytes: int):
+    """Record bytes downloaded for the current row."""
+    for row in _current_rows.get():
+        row.fetch_bytes += num_bytes
+
+
+def record_call(
+    kind: str,
+    model: str,
+    prompt_tokens: float,
+    completion_tokens: float,
+    cost: Optional[float],
+    seconds: float,
+    estimated: bool = False
+):
+    """
+    Record a model call, splitting its tokens and cost evenly across the current rows.
+
+    Args:
+        kind: 'style' or 'lyrics'
+        model: Model that served the call
+        prompt_tokens: Prompt tokens used
+        completion_tokens: Completion tokens used
+        cost: Cost in USD (None if unknown)
+        seconds: Duration of the call, including retries
+        estimated: Whether the token counts were estimated locally
+    """
+    rows = _current_rows.get()
+    for row in rows:
+        row.calls.append({
+            'kind': kind,
+            'model': model,
+            'prompt_tokens': prompt_tokens / len(rows),
+            'completion_tokens': completion_tokens / len(rows),
+            'cost_usd': None if cost is None else cost / len(rows),
+            'seconds': round(seconds, 3),
+            'estimated': estimated,
+            'shared_by': len(rows),
+        })
+
+
+def estimate_cost(
+    prices: Mapping[str, Mapping[str, float]],
+    model: str,
+    prompt_tokens: float,
+    completion_tokens: float
+) -> Optional[float]:
+    """
+    Price a call from a table of USD per million tokens.
+
+    Args:
+        prices: {model: {'prompt': price, 'completion': price}}
+        model: Model name
+        prompt_tokens: Prompt tokens
+        completion_tokens: Completion tokens
+
+    Returns:
+        Cost in USD, or None if the model isn't in the table
+    """
+    price = prices.get(model)
+    if not price:
+        return None
+    return (prompt_tokens * price.get('prompt', 0) + completion_tokens * price.get('completion', 0)) / 1_000_000
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+class MetricsCollector:
+    """
+    Collects finished rows, writes them as JSON lines, and summarizes the run.
+
+    Per-stage timings are kept for the p50/p95 summary. Totals go to an
+    optional Prometheus textfile (for node_exporter's textfile collector),
+    rewritten atomically every `prometheus_every` rows and at the end.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        prometheus_every: int = 100
+    ):
+        """
+        Args:
+            jsonl_path: Optional file receiving one JSON record per row
+            prometheus_path: Optional Prometheus textfile
+            prometheus_every: Rows between textfile rewrites
+        """
+        self.prometheus_path = prometheus_path
+        self.prometheus_every = prometheus_every
+        self._jsonl = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self.stage_seconds: Dict[str, List[float]] = defaultdict(list)
+        self.statuses = Counter()
+        self.totals = Counter()
+        self.cost_known = True
+
+    def start_row(self, document_url: str) -> RowMetrics:
+        return RowMetrics(document_url)
+
+    def finish_row(self, row: RowMetrics, status: str):
+        """
+        Record a finished row.
+
+        Args:
+            row: The row's measurements
+            status: 'succeeded', 'reused' or 'failed'
+        """
+        row.finished = time.perf_counter()
+        self.statuses[status] += 1
+        for name in STAGES:
+            if name in row.stages:
+                self.stage_seconds[name].append(row.stages[name])
+        self.stage_seconds['total'].append(row.total_seconds)
+        self.totals['fetch_bytes'] += row.fetch_bytes
+        self.totals['prompt_tokens'] += row.tokens('prompt')
+        self.totals['completion_tokens'] += row.tokens('completion')
+        # A batched call is shared by its rows, so count each once
+        self.totals['calls'] += sum(1 / call['shared_by'] for call in row.calls)
+        cost = row.cost
+        if cost is None and row.calls:
+            self.cost_known = False
+        self.totals['cost_usd'] += cost or 0
+
+        if self._jsonl:
+            self._jsonl.write(json.dumps(row.as_record(status)) + '\n')
+            self._jsonl.flush()
+        if self.prometheus_path and sum(self.statuses.values()) % self.prometheus_every == 0:
+            self.write_prometheus()
+
+    def summary_lines(self) -> List[str]:
+        """End-of-run summary: p50/p95 per stage, bandwidth, tokens and cost."""
+        lines = [f"{'stage':<10} {'rows':>6} {'p50 s':>8} {'p95 s':>8} {'total s':>9}"]
+        for name in STAGES + ('total',):
+            values = self.stage_seconds.get(name)
+            if values:
+                lines.append(
+                    f"{name:<10} {len(values):>6} {percentile(values, 0.5):>8.2f} "
+                    f"{percentile(values, 0.95):>8.2f} {sum(values):>9.1f}"
+                )
+        cost = f"${self.totals['cost_usd']:.4f}"
+        if not self.cost_known:
+            cost = f"{cost} (some calls unpriced)" if self.totals['cost_usd'] else "unknown (see metrics.prices)"
+        lines.append(
+            f"Fetched {self.totals['fetch_bytes'] / 1024 / 1024:.2f} MB; "
+            f"{round(self.totals['calls'])} model calls, {round(self.totals['prompt_tokens'])} prompt + "
+            f"{round(self.totals['completion_tokens'])} completion tokens; cost {cost}"
+        )
+        return lines
+
+    def write_prometheus(self):
+        """Rewrite the Prometheus textfile with the metrics so far."""
+        if not self.prometheus_path:
+            return
+        lines = [
+            '# HELP doc2beat_stage_seconds Wall time spent by each row in each stage.',
+            '# TYPE doc2beat_stage_seconds summary',
+        ]
+        for name in STAGES + ('total',):
+            values = self.stage_seconds.get(name)
+            if not values:
+                continue
+            for quantile in (0.5, 0.95):
+                lines.append(
+                    f'doc2beat_stage_seconds{{stage="{name}",quantile="{quantile}"}} {percentile(values, quantile):.6f}'
+                )
+            lines.append(f'doc2beat_stage_seconds_sum{{stage="{name}"}} {sum(values):.6f}')
+            lines.append(f'doc2beat_stage_seconds_count{{stage="{name}"}} {len(values)}')
+        lines += ['# HELP doc2beat_rows_total Rows finished, by status.', '# TYPE doc2beat_rows_total counter']
+        lines += [f'doc2beat_rows_total{{status="{status}"}} {count}' for status, count in sorted(self.statuses.items())]
+        lines += [
+            '# HELP doc2beat_fetch_bytes_total Bytes downloaded while fetching documents.',
+            '# TYPE doc2beat_fetch_bytes_total counter',
+            f"doc2beat_fetch_bytes_total {self.totals['fetch_bytes']}",
+            '# HELP doc2beat_tokens_total Model tokens used, by type.',
+            '# TYPE doc2beat_tokens_total counter',
+            f"doc2beat_tokens_total{{type=\"prompt\"}} {round(self.totals['prompt_tokens'])}",
+            f"doc2beat_tokens_total{{type=\"completion\"}} {round(self.totals['completion_tokens'])}",
+            '# HELP doc2beat_cost_usd_total Estimated model cost in USD.',
+            '# TYPE doc2beat_cost_usd_total counter',
+            f"doc2beat_cost_usd_total {self.totals['cost_usd']:.6f}",
+        ]
+        tmp_path = f"{self.prometheus_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prometheus_path)
+
+    def close(self):
+        """Write the final Prometheus textfile and close the JSON lines file."""
+        self.write_prometheus()
+        if self._jsonl:
+            self._jsonl.close()
+            self._jsonl = None
@@ -0,0 +1,244 @@
+"""Crash-safe streaming output of batch results."""
+
+import asyncio
+import csv
+import os
+import time
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+from .urls import document_key
+
+
+OUTPUT_FIELDS = ['document_url', 'song_style', 'song_lyrics']
+
+# Lyrics of rows that failed start with this, which is what --resume retries
+ERROR_PREFIX = 'Error processing:'
+
+
+def is_error_row(row: Dict[str, str]) -> bool:
+    """Whether an output row records a failed document."""
+    return (row.get('song_lyrics') or '').startswith(ERROR_PREFIX)
+
+
+class ResultWriter:
+    """
+    Appends result rows to the output CSV as they complete, in input order.
+
+    Rows that finish early wait in a small reorder buffer until every row
+    before them has been written. The file is flushed every `flush_every` rows
+    and fsynced at most every `fsync_interval` seconds, so a crash loses at
+    most the last few rows instead of the whole batch.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        append: bool = False,
+        flush_every: int = 10,
+        fsync_interval: float = 5.0,
+        fields: Optional[List[str]] = None
+    ):
+        """
+        Open the output file.
+
+        Args:
+            path: Output CSV path
+            append: Append to an existing file (for --resume) instead of truncating it
+            flush_every: Flush the file after this many rows
+            fsync_interval: Minimum seconds between fsyncs
+            fields: Output columns (default: OUTPUT_FIELDS). When appending, the
+                existing file's header wins so the columns stay aligned.
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync_interval = fsync_interval
+
+        fields = fields or OUTPUT_FIELDS
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        if not write_header:
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                fields = next(csv.reader(f), None) or fields
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction='ignore')
+        if write_header:
+            self._writer.writeheader()
+
+        self._pending: Dict[int, Dict[str, str]] = {}
+        self._next_index = 0
+        self._unflushed = 0
+        self._last_fsync = time.monotonic()
+        self.rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, index: int, result: Dict[str, str]) -> int:
+        """
+        Hand over the result for the index-th row of this run.
+
+        Args:
+            index: 0-based position of the row among the rows processed in this run
+            result: Result dictionary
+
+        Returns:
+            Number of rows written to the file by this call
+        """
+        self._pending[index] = result
+        written = 0
+        while self._next_index in self._pending:
+            self._writer.writerow(self._pending.pop(self._next_index))
+            self._next_index += 1
+            written += 1
+
+        self.rows_written += written
+        self._unflushed += written
+        if self._unflushed >= self.flush_every:
+            self._sync(force=False)
+        return written
+
+    def _sync(self, force: bool):
+        self._file.flush()
+        self._unflushed = 0
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def close(self):
+        """Flush and fsync everything written so far and close the file."""
+        if self._file.closed:
+            return
+        self._sync(force=True)
+        self._file.close()
+
+
+class ResultStream:
+    """
+    Hands batch results to an async consumer instead of a file.
+
+    Results come out as soon as each row finishes, or in input order with
+    `ordered`. At most `buffer` results wait for the consumer. Past that,
+    add() blocks, which holds the whole pipeline back until the consumer
+    catches up.
+    """
+
+    def __init__(self, ordered: bool = False, buffer: int = 8):
+        """
+        Args:
+            ordered: Yield results in input order rather than as they complete
+            buffer: Results that may wait for the consumer before the pipeline is held back
+        """
+        self.ordered = ordered
+        self._results: asyncio.Queue = asyncio.Queue()
+        self._space = asyncio.Semaphore(buffer)
+        self._pending: Dict[int, Dict] = {}
+        self._next_index = 0
+        self.rows_written = 0
+
+    async def add(self, index: int, result: Dict) -> int:
+        """
+        Hand over the result for the index-th row of this run.
+
+        Args:
+            index: 0-based position of the row among the rows processed in this run
+            result: Result dictionary
+
+        Returns:
+            Number of results released to the consumer by this call
+        """
+        if not self.ordered:
+            ready = [result]
+        else:
+            self._pending[index] = result
+            ready = []
+            while self._next_index in self._pending:
+                ready.append(self._pending.pop(self._next_index))
+                self._next_index += 1
+        for item in ready:
+            await self._space.acquire()
+            self._results.put_nowait(item)
+        self.rows_written += len(ready)
+        return len(ready)
+
+    def close(self):
+        """Signal the consumer that no more results are coming."""
+        self._results.put_nowait(None)
+
+    async def get(self) -> Optional[Dict]:
+        """Next result, or None once the stream is closed and drained."""
+        result = await self._results.get()
+        if result is not None:
+            self._space.release()
+        return result
+
+
+def read_completed(path: str) -> Tuple[Counter, int]:
+    """
+    Scan an existing output file for --resume.
+
+    Args:
+        path: Output CSV path
+
+    Returns:
+        Count of successful rows per document key, and the total number of rows
+        (both empty if there is no output yet)
+    """
+    completed = Counter()
+    row_count = 0
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return completed, row_count
+
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            row_count += 1
+            if row.get('document_url') and not is_error_row(row):
+                completed[document_key(row['document_url'])] += 1
+    return completed, row_count
+
+
+def compact_resumed_output(path: str, first_new_row: int) -> int:
+    """
+    Fold rows appended by a resumed run back into the places of the error rows they retried.
+
+    A retried row replaces the earliest earlier error row for the same URL, so
+    the file keeps its original row order. The file is rewritten atomically.
+
+    Args:
+        path: Output CSV path
+        first_new_row: Number of data rows the file had before the resumed run
+
+    Returns:
+        Number of error rows replaced
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fields = reader.fieldnames or OUTPUT_FIELDS
+
+    error_slots = defaultdict(deque)
+    replaced = 0
+    compacted = []
+    for position, row in enumerate(rows):
+        key = document_key(row['document_url'])
+        if position >= first_new_row and error_slots[key]:
+            compacted[error_slots[key].popleft()] = row
+            replaced += 1
+            continue
+        if position < first_new_row and is_error_row(row):
+            error_slots[key].append(len(compacted))
+        compacted.append(row)
+
+    if replaced:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(compacted)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    return replaced
@@ -0,0 +1,484 @@
+"""Stage-separated batch pipeline: fetch, extract, style, lyrics, write."""
+
+import asyncio
+import math
+import os
+import sys
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+
+from . import console, metrics
+from .manifest import Manifest
+from .metrics import MetricsCollector
+from .output import ERROR_PREFIX, ResultStream, ResultWriter
+from .urls import document_key
+
+
+# Number of documents processed at once by the batch engine
+DEFAULT_CONCURRENCY = 8
+
+STAGES = ['fetch', 'extract', 'style', 'lyrics', 'write']
+
+
+class _Row:
+    """A document moving through the pipeline."""
+
+    __slots__ = (
+        'index', 'sequence', 'document_url', 'song_style', 'html_content', 'cache_headers',
+        'document_content', 'fetch_failed', 'result', 'metrics', 'status', 'error', 'document'
+    )
+
+    def __init__(self, index: int, sequence: int, document_url: str, song_style: Optional[str]):
+        self.index = index
+        self.sequence = sequence
+        self.document_url = document_url
+        self.song_style = song_style
+        self.html_content = None
+        self.cache_headers = None
+        self.document_content = None
+        self.fetch_failed = False
+        self.result = None
+        self.metrics = None
+        self.status = None
+        self.error = None
+        # Set on the row that fetches and extracts a document for every row referencing it
+        self.document = None
+
+
+class _Document:
+    """A unique document (by document key), fetched and extracted once and shared by its rows."""
+
+    __slots__ = ('key', 'content', 'fetch_failed', 'error', 'resolved', 'waiters')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.content: Optional[str] = None
+        self.fetch_failed = False
+        self.error: Optional[Exception] = None
+        self.resolved = False
+        # Rows that arrived while the document was still being fetched or extracted
+        self.waiters: List[_Row] = []
+
+
+class BatchPipeline:
+    """
+    Batch engine built from stages connected by bounded queues.
+
+    Fetch and lyrics stages each run `concurrency` async workers, since they
+    mostly wait on the network. Style workers take rows in batches and
+    generate a whole batch of song styles with one request. Extraction is CPU-bound, so it runs in a
+    process pool sized to the CPU count, which keeps cores parsing while the
+    other stages wait on OpenRouter. A full queue blocks the stage feeding it,
+    so memory stays bounded however long the input is. A single writer stage
+    hands results to the ResultWriter in input order, or to a ResultStream
+    whose consumer then sets the pace of the whole pipeline.
+    """
+
+    def __init__(
+        self,
+        doc2beat,
+        concurrency: int,
+        writer: Union[ResultWriter, ResultStream],
+        manifest: Optional[Manifest] = None,
+        completed: Optional[Counter] = None,
+        queue_size: Optional[int] = None,
+        extract_workers: Optional[int] = None,
+        report_interval: float = 10.0,
+        style_batch_size: int = 8,
+        style_batch_wait: float = 0.05,
+        metrics_collector: Optional[MetricsCollector] = None,
+        metric_columns: bool = False,
+        shared_documents: int = 1000,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        succeeded_keys: Optional[Set[str]] = None
+    ):
+        """
+        Args:
+            doc2beat: Doc2Beat instance with an open session
+            concurrency: Maximum documents in flight: workers for each network-bound stage
+            writer: Writer that receives each result, or a stream receiving structured results
+            manifest: Optional manifest for incremental mode
+            completed: Successful rows per document key already in the output (for resume)
+            queue_size: Capacity of each stage queue (default: 2 x concurrency)
+            extract_workers: Extraction processes (default: CPU count)
+            report_interval: Seconds between queue-depth readouts (0 disables them)
+            style_batch_size: Song styles generated per LLM request (1 for one request per row)
+            style_batch_wait: Seconds a style worker waits for a batch to fill up
+            metrics_collector: Optional collector receiving each row's timings, bytes and tokens
+            metric_columns: Add the metrics to each result as extra output columns
+            shared_documents: Extracted documents kept in memory for later rows with the same URL
+            on_progress: Optional callback receiving counts of done, succeeded, failed
+                and skipped rows (and the total, when known) after each row is written
+            succeeded_keys: Optional set receiving the document key of each row whose
+                song was made from its fetched content (not a failed-fetch fallback)
+        """
+        self.doc2beat = doc2beat
+        self.concurrency = concurrency
+        self.writer = writer
+        self.manifest = manifest
+        self.completed = completed if completed is not None else Counter()
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.report_interval = report_interval
+        self.style_batch_size = max(1, style_batch_size)
+        # --concurrency caps the workers; within it, the controller's AIMD windows
+        # decide how many LLM calls are in flight (workers past a window's maximum would only wait)
+        budgets = doc2beat.controller.budgets
+        self.lyric_workers = min(concurrency, math.ceil(budgets['lyrics'].maximum))
+        # Each style worker handles up to a batch of rows per request
+        self.style_workers = min(-(-concurrency // self.style_batch_size), math.ceil(budgets['style'].maximum))
+        self.queue_size = queue_size or concurrency * 2
+        self.style_batch_wait = style_batch_wait
+        self.metrics = metrics_collector
+        self.metric_columns = metric_columns and metrics_collector is not None
+        self.shared_documents = shared_documents
+        self.on_progress = on_progress
+        self.succeeded_keys = succeeded_keys if succeeded_keys is not None else set()
+        self._written = 0
+
+        # Documents being fetched or extracted, and recently finished ones (oldest first)
+        self._pending_documents: Dict[str, _Document] = {}
+        self._finished_documents: 'OrderedDict[str, _Document]' = OrderedDict()
+
+        self.stats = Counter()
+        self.max_depth = Counter()
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._total: Optional[int] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _of_total(self) -> str:
+        return f"/{self._total}" if self._total is not None else ""
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Current number of rows waiting in front of each stage."""
+        return {stage: queue.qsize() for stage, queue in self._queues.items()}
+
+    async def _put(self, stage: str, row: _Row):
+        queue = self._queues[stage]
+        await queue.put(row)
+        self.max_depth[stage] = max(self.max_depth[stage], queue.qsize())
+
+    async def run(self, inputs: Iterable[Dict[str, str]]) -> Counter:
+        """
+        Process every input row.
+
+        Args:
+            inputs: Iterable of dictionaries with 'document_url' and optional 'song_style'
+
+        Returns:
+            Counts of 'rows', 'succeeded', 'failed', 'skipped' and 'deduplicated' rows, plus manifest statuses
+        """
+        self._total = len(inputs) if hasattr(inputs, '__len__') else None
+        self._queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in STAGES}
+        # Rows can't start more than this far ahead of the last written row,
+        # which bounds the writer's reorder buffer behind a slow document
+        self._window = asyncio.Semaphore(self.concurrency * 4)
+
+        from .extraction import init_worker
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.extract_workers,
+            initializer=init_worker,
+            initargs=(self.doc2beat.html_parser, self.doc2beat.extraction_rules),
+        )
+        workers = (
+            [self._worker('fetch', self._fetch) for _ in range(self.concurrency)]
+            + [self._worker('extract', self._extract) for _ in range(self.extract_workers)]
+            + [self._style_worker() for _ in range(self.style_workers)]
+            + [self._worker('lyrics', self._lyrics) for _ in range(self.lyric_workers)]
+            + [self._worker('write', self._write)]
+        )
+        tasks = [asyncio.ensure_future(worker) for worker in workers]
+        if self.report_interval:
+            tasks.append(asyncio.ensure_future(self._report()))
+
+        try:
+            await self._feed(inputs)
+            # Each stage hands a row on before marking it done, so once a queue
+            # is drained nothing more can arrive in it from upstream
+            for stage in STAGES:
+                await self._queues[stage].join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._pool.shutdown()
+
+        console.print(
+            "📦 Peak queue depth: "
+            + ", ".join(f"{stage}={self.max_depth[stage]}" for stage in STAGES)
+        )
+        return self.stats
+
+    async def _feed(self, inputs: Iterable[Dict[str, str]]):
+        sequence = 0
+        for i, input_data in enumerate(inputs, 1):
+            self.stats['rows'] += 1
+            document_url = input_data['document_url']
+            key = document_key(document_url)
+            if self.completed[key]:
+                self.completed[key] -= 1
+                self.stats['skipped'] += 1
+                continue
+
+            song_style = input_data.get('song_style')
+            # Blank CSV cells arrive as NaN; treat them as "no style given"
+            if not isinstance(song_style, str) or not song_style.strip():
+                song_style = None
+
+            await self._window.acquire()
+            console.print(f"\n📄 Processing {i}{self._of_total()}: {document_url}")
+            sys.stdout.flush()
+            row = _Row(i, sequence, document_url, song_style)
+            if self.metrics:
+                row.metrics = self.metrics.start_row(document_url)
+            sequence += 1
+
+            # Rows for a document already seen in this batch share its extracted text
+            document = self._pending_documents.get(key) or self._finished_documents.get(key)
+            if document is None:
+                row.document = self._pending_documents[key] = _Document(key)
+                await self._put('fetch', row)
+                continue
+            self.stats['deduplicated'] += 1
+            console.print("    Same document as an earlier row, sharing its content")
+            if document.resolved:
+                self._finished_documents.move_to_end(key)
+                await self._share(document, row)
+            else:
+                document.waiters.append(row)
+
+    async def _worker(self, stage: str, handler):
+        queue = self._queues[stage]
+        while True:
+            row = await queue.get()
+            try:
+                # Timings, bytes and tokens recorded while handling the row are charged to it
+                with metrics.bind(row.metrics):
+                    await handler(row)
+            except Exception as e:
+                await self._fail(row, e)
+            finally:
+                queue.task_done()
+
+    async def _fail(self, row: _Row, error: Exception):
+        console.print(f"❌ Error processing {row.index}{self._of_total()}: {error}")
+        sys.stdout.flush()
+        self.stats['failed'] += 1
+        row.status = 'failed'
+        row.error = str(error)
+        # Add error result to maintain order
+        row.result = {
+            'document_url': row.document_url,
+            'song_style': row.song_style or 'Error',
+            'song_lyrics': f'{ERROR_PREFIX} {error}'
+        }
+        await self._put('write', row)
+        if row.document and not row.document.resolved:
+            # Rows waiting on this document fail the same way; later rows try it again
+            document = row.document
+            document.error = error
+            del self._pending_documents[document.key]
+            await self._release_waiters(document)
+
+    def _resolve(self, row: _Row):
+        """Store the document content of the row that fetched it, for the rows sharing it."""
+        document = row.document
+        document.content = row.document_content
+        document.fetch_failed = row.fetch_failed
+        document.resolved = True
+        del self._pending_documents[document.key]
+        self._finished_documents[document.key] = document
+        while len(self._finished_documents) > self.shared_documents:
+            self._finished_documents.popitem(last=False)
+
+    async def _release_waiters(self, document: _Document):
+        waiters, document.waiters = document.waiters, []
+        for waiter in waiters:
+            await self._share(document, waiter)
+
+    async def _share(self, document: _Document, row: _Row):
+        """Hand a row the content of a document fetched for an earlier row."""
+        if document.error is not None:
+            await self._fail(row, document.error)
+            return
+        row.document_content = document.content
+        row.fetch_failed = document.fetch_failed
+        try:
+            with metrics.bind(row.metrics):
+                await self._route(row)
+        except Exception as e:
+            await self._fail(row, e)
+
+    async def _fetch(self, row: _Row):
+        try:
+            row.document_content, row.html_content, row.cache_headers = \
+                await self.doc2beat._afetch_page(row.document_url)
+        except Exception as e:
+            if isinstance(self.writer, ResultStream):
+                # Structured results report the fetch error rather than a song about a placeholder
+                await self._fail(row, RuntimeError(f"Could not fetch content from {row.document_url}: {e}"))
+                return
+            console.print(f"Warning: Could not fetch content from {row.document_url}: {e}")
+            row.document_content = f"[Could not fetch content from {row.document_url}]"
+            row.fetch_failed = True
+
+        if row.document_content is None:
+            await self._put('extract', row)
+        else:
+            await self._route(row)
+
+    async def _extract(self, row: _Row):
+        from .extraction import extract_page_in_worker
+
+        loop = asyncio.get_running_loop()
+        with metrics.stage('extract'):
+            extraction, messages = await loop.run_in_executor(
+                self._pool, extract_page_in_worker, row.html_content, row.document_url
+            )
+        for message in messages:
+            console.print(message)
+        row.document_content = self.doc2beat._report_extraction(*extraction)
+        self.doc2beat._cache_extracted(row.document_url, row.html_content, row.document_content, row.cache_headers)
+        row.html_content = None
+        await self._route(row)
+
+    async def _route(self, row: _Row):
+        """Send a row with its document content to the next stage it needs."""
+        if row.document and not row.document.resolved:
+            self._resolve(row)
+            await self._release_waiters(row.document)
+        if self.manifest and not row.fetch_failed:
+            record = self.manifest.get(row.document_url)
+            content_hash = Manifest.hash_content(row.document_content)
+            if record and Manifest.is_current(record, content_hash, self.doc2beat.lyric_model, row.song_style):
+                self.stats['reused'] += 1
+                row.status = 'reused'
+                row.result = {
+                    'document_url': row.document_url,
+                    'song_style': record['song_style'],
+                    'song_lyrics': record['song_lyrics']
+                }
+                await self._complete(row)
+                return
+            self.stats['regenerated' if record else 'new'] += 1
+        elif self.manifest:
+            self.stats['regenerated' if self.manifest.get(row.document_url) else 'new'] += 1
+
+        await self._put('style' if row.song_style is None else 'lyrics', row)
+
+    async def _style_worker(self):
+        """Take up to a batch of rows from the style queue and generate their styles with one request."""
+        queue = self._queues['style']
+        loop = asyncio.get_running_loop()
+        while True:
+            rows = [await queue.get()]
+            deadline = loop.time() + self.style_batch_wait
+            while len(rows) < self.style_batch_size:
+                if not queue.empty():
+                    rows.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                try:
+                    # The batch's tokens are split between its rows
+                    with metrics.bind(*(row.metrics for row in rows)), metrics.stage('style'):
+                        styles = await self.doc2beat._agenerate_song_styles(len(rows))
+                except Exception as e:
+                    for row in rows:
+                        await self._fail(row, e)
+                    continue
+                for row, song_style in zip(rows, styles):
+                    row.song_style = song_style
+                    await self._put('lyrics', row)
+            finally:
+                for _ in rows:
+                    queue.task_done()
+
+    async def _lyrics(self, row: _Row):
+        song_lyrics = await self.doc2beat._agenerate_song_lyrics(row.document_content, row.song_style)
+        row.result = {
+            'document_url': row.document_url,
+            'song_style': row.song_style,
+            'song_lyrics': song_lyrics
+        }
+        if self.manifest and not row.fetch_failed:
+            self.manifest.record(
+                row.document_url,
+                Manifest.hash_content(row.document_content),
+                row.song_style,
+                self.doc2beat.lyric_model,
+                song_lyrics
+            )
+        await self._complete(row)
+
+    async def _complete(self, row: _Row):
+        console.print(f"✅ Completed {row.index}{self._of_total()}")
+        sys.stdout.flush()
+        self.stats['succeeded'] += 1
+        row.status = row.status or 'succeeded'
+        if not row.fetch_failed:
+            self.succeeded_keys.add(document_key(row.document_url))
+        await self._put('write', row)
+
+    async def _write(self, row: _Row):
+        row.document_content = None
+        if row.metrics:
+            self.metrics.finish_row(row.metrics, row.status)
+            if self.metric_columns:
+                row.result = dict(row.result, **row.metrics.as_fields())
+        if isinstance(self.writer, ResultStream):
+            written = await self.writer.add(row.sequence, self._structured_result(row))
+        else:
+            written = self.writer.add(row.sequence, row.result)
+        for _ in range(written):
+            self._window.release()
+        self._written += 1
+
+        done = self.stats['succeeded'] + self.stats['failed'] + self.stats['skipped']
+        if self._total:
+            console.print(f"Progress: {done}/{self._total} ({done/self._total*100:.1f}%)")
+        else:
+            console.print(f"Progress: {done} done")
+        sys.stdout.flush()
+        if self.on_progress:
+            try:
+                self.on_progress({
+                    'done': self._written + self.stats['skipped'],
+                    'total': self._total,
+                    'succeeded': self.stats['succeeded'],
+                    'failed': self.stats['failed'],
+                    'skipped': self.stats['skipped'],
+                })
+            except Exception as e:
+                console.print(f"Warning: progress callback failed: {e}")
+
+    def _structured_result(self, row: _Row) -> Dict:
+        """A row's result for a ResultStream, with the error on its own instead of in the lyrics."""
+        failed = row.status == 'failed'
+        result = {
+            'index': row.index,
+            'document_url': row.document_url,
+            'song_style': row.song_style if failed else row.result['song_style'],
+            'song_lyrics': None if failed else row.result['song_lyrics'],
+            'status': row.status,
+            'error': row.error,
+        }
+        if row.metrics:
+            result['metrics'] = row.metrics.as_fields()
+        return result
+
+    async def _report(self):
+        """Periodically print how many rows are waiting in front of each stage."""
+        while True:
+            await asyncio.sleep(self.report_interval)
+            depths = self.queue_depths()
+            console.print("📦 Queue depth: " + ", ".join(f"{stage}={depth}" for stage, depth in depths.items()))
+            sys.stdout.flush()
@@ -0,0 +1,440 @@
+"""Long-running local service: one warm Doc2Beat working through a bounded job queue over HTTP."""
+
+import asyncio
+import json
+import os
+import signal
+import time
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+if TYPE_CHECKING:
+    from .core import Doc2Beat
+
+
+DEFAULT_PORT = 8700
+
+# Largest request body accepted (job submissions are a few hundred bytes)
+MAX_BODY_BYTES = 64 * 1024
+
+# Most header lines accepted in one request
+MAX_HEADERS = 100
+
+# Longest a client may block on GET /jobs/<id>?wait=...
+MAX_WAIT_SECONDS = 300
+
+REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 415: "Unsupported Media Type", 431: "Request Header Fields Too Large",
+    503: "Service Unavailable",
+}
+
+
+class _BadRequest(Exception):
+    """A request that can't be parsed; answered with `status` before closing the connection."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """One document submitted to the service, from queued to succeeded or failed."""
+
+    __slots__ = (
+        'id', 'document_url', 'song_style', 'genre', 'status', 'result', 'error',
+        'created', 'started', 'finished', 'pieces', 'listeners', 'done',
+    )
+
+    def __init__(self, document_url: str, song_style: Optional[str] = None, genre: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.document_url = document_url
+        self.song_style = song_style
+        self.genre = genre
+        self.status = 'queued'
+        self.result: Optional[Dict[str, str]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Lyrics streamed so far, replayed to clients that start listening late
+        self.pieces: List[str] = []
+        self.listeners: List[asyncio.Queue] = []
+        self.done = asyncio.Event()
+
+    def as_dict(self) -> Dict:
+        """JSON view of the job."""
+        job = {
+            'id': self.id,
+            'status': self.status,
+            'document_url': self.document_url,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+        if self.result is not None:
+            job['song_style'] = self.result['song_style']
+            job['song_lyrics'] = self.result['song_lyrics']
+        if self.error is not None:
+            job['error'] = self.error
+        return job
+
+
+class JobServer:
+    """
+    HTTP service around a single Doc2Beat instance.
+
+    The instance stays warm for the whole lifetime of the service: the
+    OpenRouter client and the pooled document fetcher are opened once, and the
+    document cache, genre deck and request controller carry over between jobs.
+    Jobs wait in a bounded queue (submissions get a 503 once it's full) and
+    `concurrency` workers process them. Only http(s) document URLs are
+    accepted unless `allow_local_files` is set, so clients can't have the
+    service read files from its disk.
+
+    Endpoints:
+        POST /jobs: submit {"document_url": ..., "song_style": ..., "genre": ...}
+        GET /jobs/<id>: job status and result; add ?wait=<seconds> to block until it finishes
+        GET /jobs/<id>/events: newline-delimited JSON events (status, lyrics pieces, done)
+        GET /health: queue and worker counts
+    """
+
+    def __init__(
+        self,
+        doc2beat: 'Doc2Beat',
+        concurrency: int = 8,
+        queue_size: int = 100,
+        keep_finished: int = 1000,
+        allow_local_files: bool = False
+    ):
+        """
+        Args:
+            doc2beat: Configured Doc2Beat instance
+            concurrency: Jobs processed at the same time
+            queue_size: Jobs waiting for a worker before submissions are refused
+            keep_finished: Finished jobs kept for polling before the oldest are forgotten
+            allow_local_files: Accept local file paths and file:// URLs as document_url
+        """
+        self.doc2beat = doc2beat
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.keep_finished = keep_finished
+        self.allow_local_files = allow_local_files
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self.counts = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'rejected': 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._running = 0
+
+    async def serve(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+        """
+        Accept jobs until SIGINT or SIGTERM.
+
+        Runs inside the Doc2Beat session (see Doc2Beat.serve), so that every
+        job shares the open clients.
+
+        Args:
+            host: Interface to listen on
+            port: TCP port (0 picks a free one)
+            socket_path: Listen on this Unix socket instead of TCP
+        """
+        self._queue = asyncio.Queue(self.queue_size)
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self._handle_connection, path=socket_path)
+            address = f"unix:{socket_path}"
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            bound_host, bound_port = server.sockets[0].getsockname()[:2]
+            address = f"http://{bound_host}:{bound_port}"
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows, or not on the main thread: Ctrl+C still interrupts the run
+                pass
+
+        print(f"🎧 doc2beat serving on {address} "
+              f"(concurrency {self.concurrency}, queue size {self.queue_size})")
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            print("\n🛑 Shutting down")
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(signum)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def submit(self, document_url: str, song_style: Optional[str] = None, genre: Optional[str] = None) -> Job:
+        """
+        Queue a job.
+
+        Raises:
+            ValueError: If document_url isn't an http(s) URL and local files aren't allowed
+            asyncio.QueueFull: If the queue is full
+        """
+        if not self.allow_local_files and urlsplit(document_url).scheme.lower() not in ('http', 'https'):
+            raise ValueError("document_url must be an http:// or https:// URL")
+        job = Job(document_url, song_style, genre)
+        self._queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self.counts['submitted'] += 1
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            try:
+                await self._run_job(job)
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _run_job(self, job: Job):
+        job.status = 'running'
+        job.started = time.time()
+        self._publish(job, {'event': 'status', 'status': 'running'})
+        print(f"\n📄 Job {job.id}: {job.document_url}")
+
+        def on_lyrics(text: str):
+            job.pieces.append(text)
+            self._publish(job, {'event': 'lyrics', 'text': text})
+
+        try:
+            job.result = await self.doc2beat._aprocess_single_input(
+                job.document_url, job.song_style, job.genre, verbose=False, on_lyrics=on_lyrics,
+                fail_on_fetch_error=True
+            )
+            job.status = 'succeeded'
+            print(f"✅ Job {job.id} done")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"❌ Job {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            job.pieces = []
+            self.counts[job.status] += 1
+            self._publish(job, {'event': 'done', 'job': job.as_dict()})
+            job.listeners = []
+            job.done.set()
+            self._forget_finished()
+
+    def _publish(self, job: Job, event: Dict):
+        for listener in job.listeners:
+            listener.put_nowait(event)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    def health(self) -> Dict:
+        """Queue depth, running jobs and totals since start."""
+        return {
+            'status': 'ok',
+            'queued': self._queue.qsize(),
+            'running': self._running,
+            'queue_size': self.queue_size,
+            'concurrency': self.concurrency,
+            **self.counts,
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive between requests."""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                keep_alive = await self._dispatch(writer, method, target, headers, body, keep_alive)
+                if not keep_alive:
+                    break
+        except _BadRequest as e:
+            try:
+                await self._send_json(writer, e.status, {'error': str(e)}, keep_alive=False)
+            except ConnectionError:
+                pass
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _readline(reader: asyncio.StreamReader, status: int, what: str) -> bytes:
+        """Read one line, answering `status` if it's longer than the reader's limit."""
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise _BadRequest(status, f"{what} too long")
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes, bool]]:
+        request_line = await self._readline(reader, 400, "request line")
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise _BadRequest(400, "malformed request line")
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADERS + 1):
+            line = await self._readline(reader, 431, "header line")
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _BadRequest(431, f"more than {MAX_HEADERS} header lines")
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise _BadRequest(400, "invalid Content-Length")
+        if length < 0:
+            raise _BadRequest(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise _BadRequest(413, f"request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+        return method.upper(), target, headers, body, keep_alive
+
+    async def _dispatch(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        body: bytes,
+        keep_alive: bool
+    ) -> bool:
+        """Route one request. Returns whether the connection can be kept alive."""
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ['health']:
+            return await self._send_json(writer, 200, self.health(), keep_alive)
+
+        if parts == ['jobs']:
+            if method != 'POST':
+                return await self._send_json(writer, 405, {'error': 'use POST to submit a job'}, keep_alive)
+            content_type = headers.get('content-type', '').partition(';')[0].strip().lower()
+            if content_type != 'application/json':
+                return await self._send_json(
+                    writer, 415, {'error': 'send the job as Content-Type: application/json'}, keep_alive
+                )
+            try:
+                payload = json.loads(body or b'{}')
+                document_url = payload['document_url']
+                if not isinstance(document_url, str) or not document_url.strip():
+                    raise ValueError
+            except (ValueError, KeyError, TypeError):
+                return await self._send_json(
+                    writer, 400, {'error': 'expected a JSON object with a document_url'}, keep_alive
+                )
+            options = {}
+            for name in ('song_style', 'genre'):
+                value = payload.get(name)
+                if value is not None and (not isinstance(value, str) or not value.strip()):
+                    return await self._send_json(
+                        writer, 400, {'error': f'{name} must be a non-empty string or null'}, keep_alive
+                    )
+                options[name] = value.strip() if value is not None else None
+            try:
+                job = self.submit(document_url.strip(), options['song_style'], options['genre'])
+            except ValueError as e:
+                return await self._send_json(writer, 400, {'error': str(e)}, keep_alive)
+            except asyncio.QueueFull:
+                self.counts['rejected'] += 1
+                return await self._send_json(
+                    writer, 503, {'error': 'job queue is full, retry later'}, keep_alive, {'Retry-After': '1'}
+                )
+            return await self._send_json(writer, 202, job.as_dict(), keep_alive, {'Location': f"/jobs/{job.id}"})
+
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await self._send_json(writer, 404, {'error': 'no such job'}, keep_alive)
+            if method != 'GET':
+                return await self._send_json(writer, 405, {'error': 'use GET to read a job'}, keep_alive)
+            if len(parts) == 3 and parts[2] == 'events':
+                await self._stream_events(writer, job)
+                return False
+            if len(parts) == 2:
+                wait = parse_qs(url.query).get('wait')
+                if wait and not job.done.is_set():
+                    try:
+                        timeout = min(float(wait[0]), MAX_WAIT_SECONDS)
+                        await asyncio.wait_for(job.done.wait(), timeout)
+                    except (ValueError, asyncio.TimeoutError):
+                        pass
+                return await self._send_json(writer, 200, job.as_dict(), keep_alive)
+
+        return await self._send_json(writer, 404, {'error': 'not found'}, keep_alive)
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Dict,
+        keep_alive: bool,
+        extra_headers: Optional[Dict[str, str]] = None
+    ) -> bool:
+        body = json.dumps(payload).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **(extra_headers or {}),
+        }
+        writer.write(self._head(status, headers) + body)
+        await writer.drain()
+        return keep_alive
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, job: Job):
+        """Send a job's events as chunked newline-delimited JSON until it finishes."""
+        headers = {'Content-Type': 'application/x-ndjson', 'Transfer-Encoding': 'chunked', 'Connection': 'close'}
+        writer.write(self._head(200, headers))
+
+        events: asyncio.Queue = asyncio.Queue()
+        if job.done.is_set():
+            events.put_nowait({'event': 'done', 'job': job.as_dict()})
+        else:
+            events.put_nowait({'event': 'status', 'status': job.status})
+            for text in job.pieces:
+                events.put_nowait({'event': 'lyrics', 'text': text})
+            job.listeners.append(events)
+        try:
+            while True:
+                event = await events.get()
+                line = json.dumps(event).encode('utf-8') + b'\n'
+                writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+                await writer.drain()
+                if event['event'] == 'done':
+                    break
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        finally:
+            if events in job.listeners:
+                job.listeners.remove(events)
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
@@ -0,0 +1,320 @@
+"""Page discovery for whole doc sites, from sitemaps or by following links."""
+
+import asyncio
+import gzip
+import json
+import os
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from . import console
+from .fetcher import DocumentFetcher
+from .urls import normalize_url
+
+
+# Extensions that are never documentation pages when following links
+SKIP_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.css', '.js', '.json', '.xml',
+    '.pdf', '.zip', '.gz', '.tar', '.whl', '.mp3', '.mp4', '.woff', '.woff2', '.ttf',
+)
+
+
+class PageEntry(NamedTuple):
+    """A discovered page and its sitemap lastmod (None when unknown)."""
+    url: str
+    lastmod: Optional[str] = None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[PageEntry], List[str]]:
+    """
+    Parse a sitemap or sitemap index.
+
+    Args:
+        content: Response body, optionally gzipped (sitemap.xml.gz)
+
+    Returns:
+        Tuple of the pages listed and the child sitemaps listed by an index
+    """
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    root = ET.fromstring(content)
+    pages: List[PageEntry] = []
+    sitemaps: List[str] = []
+    for item in root:
+        kind = _local_name(item.tag)
+        if kind not in ('url', 'sitemap'):
+            continue
+        fields = {_local_name(child.tag): (child.text or '').strip() for child in item}
+        if not fields.get('loc'):
+            continue
+        if kind == 'sitemap':
+            sitemaps.append(fields['loc'])
+        else:
+            pages.append(PageEntry(fields['loc'], fields.get('lastmod') or None))
+    return pages, sitemaps
+
+
+class _LinkParser(HTMLParser):
+    """Collects the href of every <a> on a page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+
+def extract_links(html_content: str, base_url: str) -> List[str]:
+    """Absolute http(s) links on a page, without fragments."""
+    parser = _LinkParser()
+    parser.feed(html_content)
+    links = []
+    for href in parser.links:
+        url = urljoin(base_url, href)
+        parts = urlsplit(url)
+        if parts.scheme in ('http', 'https'):
+            links.append(urlunsplit(parts._replace(fragment='')))
+    return links
+
+
+def _is_web_url(url: str) -> bool:
+    return urlsplit(url).scheme.lower() in ('http', 'https')
+
+
+def _scope_prefix(url: str) -> str:
+    """Normalized URL prefix that pages must share with a doc root ('' to allow anything)."""
+    normalized = normalize_url(url)
+    base, _, _ = normalized.partition('?')
+    return base if base.endswith('/') else base.rsplit('/', 1)[0] + '/'
+
+
+class SiteDiscovery:
+    """
+    Finds the pages of a doc site.
+
+    A sitemap URL is read directly. For a doc root, sitemaps are looked up in
+    robots.txt and at the usual sitemap.xml locations, and only pages under
+    the root are kept. Without any sitemap, pages are found by following links
+    from the root within the same prefix. Either way, URLs go through a
+    deduplicated frontier worked on by `concurrency` tasks, and discovery stops
+    at `max_pages` pages.
+    """
+
+    def __init__(
+        self,
+        fetcher: DocumentFetcher,
+        concurrency: int = 8,
+        max_pages: int = 5000,
+        max_sitemaps: int = 500
+    ):
+        """
+        Args:
+            fetcher: Open document fetcher
+            concurrency: Sitemaps or pages fetched at the same time
+            max_pages: Stop after discovering this many pages
+            max_sitemaps: Stop following sitemap indexes after this many sitemaps
+        """
+        self.fetcher = fetcher
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.max_sitemaps = max_sitemaps
+
+    async def discover(self, root_url: str) -> List[PageEntry]:
+        """
+        Discover the pages of a site.
+
+        Args:
+            root_url: Doc root, or the URL of a sitemap (.xml or .xml.gz)
+
+        Returns:
+            Unique pages in discovery order, with their sitemap lastmod
+        """
+        path = urlsplit(root_url).path.lower()
+        if path.endswith(('.xml', '.xml.gz')):
+            return await self._from_sitemaps([root_url], scope='')
+
+        sitemaps = await self._find_sitemaps(root_url)
+        if sitemaps:
+            pages = await self._from_sitemaps(sitemaps, scope=_scope_prefix(root_url))
+            if pages:
+                return pages
+        console.print("    No sitemap found, following links instead")
+        return await self._from_links(root_url)
+
+    async def _get(self, url: str):
+        try:
+            response = await self.fetcher.get(url)
+        except Exception as e:
+            console.print(f"    Warning: could not fetch {url}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        return response
+
+    async def _find_sitemaps(self, root_url: str) -> List[str]:
+        parts = urlsplit(root_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        sitemaps: List[str] = []
+        response = await self._get(f"{origin}/robots.txt")
+        if response is not None:
+            for line in response.text.splitlines():
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'sitemap' and value.strip():
+                    sitemaps.append(value.strip())
+        if not sitemaps:
+            candidates = [_scope_prefix(root_url) + 'sitemap.xml', f"{origin}/sitemap.xml"]
+            for candidate in dict.fromkeys(candidates):
+                response = await self._get(candidate)
+                if response is not None:
+                    sitemaps.append(candidate)
+                    break
+        return sitemaps
+
+    async def _from_sitemaps(self, sitemap_urls: List[str], scope: str) -> List[PageEntry]:
+        pages: Dict[str, PageEntry] = {}
+        fetched = [0]
+
+        async def visit(url: str) -> Iterable[str]:
+            if fetched[0] >= self.max_sitemaps:
+                return []
+            fetched[0] += 1
+            response = await self._get(url)
+            if response is None:
+                return []
+            try:
+                entries, children = parse_sitemap(response.content)
+            except (ET.ParseError, OSError, EOFError) as e:
+                console.print(f"    Warning: could not parse sitemap {url}: {e}")
+                return []
+            # A sitemap is remote input: never let it point at local files (file://, /home/...)
+            entries = [entry for entry in entries if _is_web_url(entry.url)]
+            children = [child for child in children if _is_web_url(child)]
+            for entry in entries:
+                key = normalize_url(entry.url)
+                if key.startswith(scope) and key not in pages and len(pages) < self.max_pages:
+                    pages[key] = entry
+            console.print(f"    Read sitemap {url}: {len(entries)} pages, {len(children)} child sitemaps")
+            return children if len(pages) < self.max_pages else []
+
+        await self._crawl(sitemap_urls, visit)
+        return list(pages.values())
+
+    async def _from_links(self, root_url: str) -> List[PageEntry]:
+        scope = _scope_prefix(root_url)
+        pages: Dict[str, PageEntry] = {}
+
+        async def visit(url: str) -> Iterable[str]:
+            if len(pages) >= self.max_pages:
+                return []
+            response = await self._get(url)
+            if response is None or 'html' not in response.headers.get('content-type', 'text/html'):
+                return []
+            # Redirects can leave the scope
+            key = normalize_url(str(response.url))
+            if not key.startswith(scope) or key in pages:
+                return []
+            pages[key] = PageEntry(str(response.url))
+            return [
+                link for link in extract_links(response.text, str(response.url))
+                if normalize_url(link).startswith(scope)
+                and not urlsplit(link).path.lower().endswith(SKIP_EXTENSIONS)
+            ]
+
+        await self._crawl([root_url], visit)
+        return list(pages.values())[:self.max_pages]
+
+    async def _crawl(self, start_urls: List[str], visit: Callable[[str], Awaitable[Iterable[str]]]):
+        """
+        Work through a frontier of URLs with `concurrency` workers.
+
+        Each URL is visited once (by normalized URL). The frontier holds at most
+        max_pages URLs that haven't been visited yet, so discovery memory stays
+        bounded on sites with huge link graphs.
+        """
+        frontier: asyncio.Queue = asyncio.Queue()
+        seen = set()
+
+        def enqueue(url: str):
+            key = normalize_url(url)
+            if key not in seen and frontier.qsize() < self.max_pages:
+                seen.add(key)
+                frontier.put_nowait(url)
+
+        for url in start_urls:
+            enqueue(url)
+
+        async def worker():
+            while True:
+                url = await frontier.get()
+                try:
+                    for link in await visit(url):
+                        enqueue(link)
+                except Exception as e:
+                    console.print(f"    Warning: could not read {url}: {e}")
+                finally:
+                    frontier.task_done()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            await frontier.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+class LastmodState:
+    """
+    Sitemap lastmod of every page as of its last successful song, kept between runs.
+
+    Pages are new or changed when their lastmod differs from the stored one,
+    or when the sitemap gives none. A page's lastmod is only stored once its
+    song was generated, so failed pages come up again on the next run.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: JSON file holding {normalized URL: lastmod}
+        """
+        self.path = path
+        self.lastmods: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.lastmods = json.load(f)
+
+    def changed(self, entry: PageEntry) -> bool:
+        """Whether a page is new or changed since its last successful run."""
+        return entry.lastmod is None or self.lastmods.get(normalize_url(entry.url)) != entry.lastmod
+
+    def update(self, entries: List[PageEntry], succeeded: Iterable[str]):
+        """
+        Record a run and save the state.
+
+        Pages that weren't discovered this time (e.g. past --max-pages) keep
+        their stored lastmod.
+
+        Args:
+            entries: Every page discovered in this run
+            succeeded: Normalized URLs whose songs were generated in this run
+        """
+        succeeded = set(succeeded)
+        for entry in entries:
+            key = normalize_url(entry.url)
+            if key in succeeded and entry.lastmod:
+                self.lastmods[key] = entry.lastmod
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.lastmods, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
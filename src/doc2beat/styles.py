@@ -0,0 +1,63 @@
+"""Parsing of batched song style responses."""
+
+import json
+import re
+from typing import List, Optional
+
+
+# Song styles are cut to this length, matching single-style generation
+MAX_STYLE_CHARS = 1000
+
+CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$', re.IGNORECASE)
+
+
+def truncate_style(song_style: str) -> str:
+    """Strip a song style and cut it to MAX_STYLE_CHARS."""
+    song_style = song_style.strip()
+    if len(song_style) > MAX_STYLE_CHARS:
+        song_style = song_style[:MAX_STYLE_CHARS - 3] + "..."
+    return song_style
+
+
+def parse_styles(response: str, count: int) -> List[Optional[str]]:
+    """
+    Read the styles out of a batched style response.
+
+    Accepts {"styles": [{"id": 1, "style": "..."}, ...]}, a bare list of such
+    objects, or a list of strings, optionally wrapped in a Markdown code fence.
+
+    Args:
+        response: Raw LLM response
+        count: Number of styles that were asked for
+
+    Returns:
+        List of `count` styles, truncated to MAX_STYLE_CHARS, with None for
+        every item that is missing or malformed
+    """
+    styles: List[Optional[str]] = [None] * count
+    text = CODE_FENCE.sub('', response.strip())
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # Tolerate chatter around the JSON object
+        start, end = text.find('{'), text.rfind('}')
+        try:
+            data = json.loads(text[start:end + 1]) if start != -1 else None
+        except ValueError:
+            data = None
+
+    items = data.get('styles') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return styles
+
+    for position, item in enumerate(items):
+        index, song_style = position, item
+        if isinstance(item, dict):
+            song_style = item.get('style')
+            if isinstance(item.get('id'), int):
+                index = item['id'] - 1
+        if not isinstance(song_style, str) or not song_style.strip():
+            continue
+        if 0 <= index < count and styles[index] is None:
+            styles[index] = truncate_style(song_style)
+    return styles
@@ -0,0 +1,70 @@
+"""URL helpers shared by the fetcher, cache and batch engine."""
+
+import os
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .local import is_local, local_path
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track where a visitor came from and never change the page
+TRACKING_PARAMS = {
+    "gclid", "dclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "twclid", "igshid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "ref_src",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+
+def is_tracking_param(name: str) -> bool:
+    """Whether a query parameter is a known tracking parameter."""
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that trivially different spellings of the same page compare equal.
+
+    Lowercases the scheme and host, drops default ports, the #fragment and
+    tracking parameters (utm_*, gclid, fbclid, ...), and sorts the remaining
+    query parameters.
+
+    Args:
+        url: URL to normalize
+
+    Returns:
+        Normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo += f":{parts.password}"
+        host = f"{userinfo}@{host}"
+
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    query = urlencode(sorted((name, value) for name, value in params if not is_tracking_param(name)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def document_key(document_url: str) -> str:
+    """
+    Key identifying the document an input refers to, for deduplication, resume and the manifest.
+
+    Web pages are keyed by their normalized URL. Local files are keyed by their
+    real path instead, since '#' and '?' are ordinary characters in file names.
+
+    Args:
+        document_url: URL or local file path
+
+    Returns:
+        Normalized URL, or the absolute path of a local file
+    """
+    if is_local(document_url):
+        return os.path.realpath(local_path(document_url))
+    return normalize_url(document_url)
@@ -0,0 +1,55 @@
+"""Tests for splitting long documents into sections."""
+
+from doc2beat.budget import split_blocks, split_sections
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def make_document(sections: int, words: int = 20) -> str:
+    body = " ".join(["word"] * words)
+    parts = ["# Title"]
+    for i in range(1, sections + 1):
+        parts.extend([f"## Section {i}", body])
+    return "\n\n".join(parts)
+
+
+def test_split_blocks_keeps_code_fences_whole():
+    text = "Intro\n\n```\nline one\n\nline two\n```\n\nAfter"
+    assert split_blocks(text) == ["Intro", "```\nline one\n\nline two\n```", "After"]
+
+
+def test_split_sections_starts_sections_at_repeated_heading_level():
+    text = "# Title\n\nIntro\n\n## One\n\nFirst\n\n### Detail\n\nMore\n\n## Two\n\nSecond"
+    sections = split_sections(text, max_tokens=10, count_tokens=count_words)
+    assert sections[1].startswith("## One")
+    assert "### Detail" in sections[1]
+    assert sections[2] == "## Two\n\nSecond"
+
+
+def test_split_sections_packs_small_sections_up_to_max_tokens():
+    text = make_document(sections=6, words=20)
+    sections = split_sections(text, max_tokens=100, count_tokens=count_words)
+    # Each section is about 24 tokens, so four fit in one call
+    assert len(sections) == 2
+    assert "\n\n".join(sections) == text
+    assert all(count_words(section) <= 100 for section in sections)
+
+
+def test_split_sections_splits_a_section_over_max_tokens():
+    paragraphs = "\n\n".join(" ".join(["word"] * 30) for _ in range(4))
+    sections = split_sections(f"## Long\n\n{paragraphs}", max_tokens=50, count_tokens=count_words)
+    assert len(sections) > 1
+    assert sections[0].startswith("## Long")
+
+
+def test_split_sections_caps_the_number_of_sections():
+    text = make_document(sections=20, words=40)
+    sections = split_sections(text, max_tokens=50, count_tokens=count_words, max_sections=4)
+    assert len(sections) == 4
+    assert "\n\n".join(sections) == text
+
+
+def test_split_sections_short_document_is_one_section():
+    assert split_sections("# Title\n\nJust a little text.", 100, count_words) == ["# Title\n\nJust a little text."]
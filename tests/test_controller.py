@@ -0,0 +1,34 @@
+"""Tests for the adaptive concurrency window."""
+
+import asyncio
+
+from doc2beat.controller import AIMDLimiter
+
+
+async def _run(limiter: AIMDLimiter, workers: int, requests: int):
+    async def worker():
+        for _ in range(requests):
+            await limiter.acquire()
+            await asyncio.sleep(0)
+            limiter.on_success()
+            await limiter.release()
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+
+def test_window_grows_while_full():
+    limiter = AIMDLimiter(initial=2, maximum=64)
+    asyncio.run(_run(limiter, workers=16, requests=50))
+    assert limiter.limit > 8
+
+
+def test_window_does_not_grow_past_what_callers_use():
+    limiter = AIMDLimiter(initial=8, maximum=64)
+    asyncio.run(_run(limiter, workers=4, requests=200))
+    assert limiter.limit == 8
+
+
+def test_throttle_halves_the_window():
+    limiter = AIMDLimiter(initial=8, minimum=1, maximum=64)
+    limiter.on_throttle(started=0.0)
+    assert limiter.limit == 4
@@ -0,0 +1,26 @@
+"""Tests for streaming batch inputs."""
+
+import pytest
+
+from doc2beat.inputs import iter_csv_inputs
+
+
+def test_rows_are_streamed_with_blank_styles_as_none(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text("document_url,song_style\nhttps://a.example/x, jazz \n,\nhttps://b.example/y,\n", encoding="utf-8")
+    assert list(iter_csv_inputs(str(path))) == [
+        {"document_url": "https://a.example/x", "song_style": "jazz"},
+        {"document_url": "https://b.example/y", "song_style": None},
+    ]
+
+
+def test_missing_file_fails_before_iterating(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        iter_csv_inputs(str(tmp_path / "missing.csv"))
+
+
+def test_missing_document_url_column_fails_before_iterating(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text("url\nhttps://a.example/x\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="document_url"):
+        iter_csv_inputs(str(path))
@@ -0,0 +1,100 @@
+"""Tests for local inputs and direct Markdown parsing."""
+
+import pytest
+
+from doc2beat.local import is_local, iter_local_inputs, local_path, markdown_to_text, read_local_document
+
+
+def test_headings_and_paragraphs():
+    markdown = "# Title\n\nSome *emphasis* and a [link](https://example.com).\n\n## Usage\n\nRun it."
+    assert markdown_to_text(markdown) == "# Title\n\nSome emphasis and a link.\n\n## Usage\n\nRun it."
+
+
+def test_setext_headings():
+    assert markdown_to_text("Title\n=====\n\nIntro") == "# Title\n\nIntro"
+    assert markdown_to_text("Setext\n------\n\nBody") == "## Setext\n\nBody"
+
+
+def test_table_rules_are_dropped():
+    text = markdown_to_text("| a | b |\n|---|---|\n| 1 | 2 |")
+    assert "---" not in text
+    assert "| 1 | 2 |" in text
+
+
+def test_lists_keep_markers_and_nesting():
+    markdown = "- one\n  - nested\n- [x] done\n\n1. first\n2) second"
+    assert markdown_to_text(markdown) == "- one\n\n  - nested\n\n- done\n\n1. first\n\n2. second"
+
+
+def test_fenced_code_is_kept_verbatim():
+    markdown = "Intro\n\n~~~python\nx = *y*\n\nprint(x)\n~~~\n\nAfter"
+    assert markdown_to_text(markdown) == "Intro\n\n```\nx = *y*\n\nprint(x)\n```\n\nAfter"
+
+
+def test_blockquotes_and_github_alerts():
+    assert markdown_to_text("> Plain quote\ncontinued") == "> Plain quote continued"
+    assert markdown_to_text("> [!WARNING]\n> Back up first.") == "> Warning: Back up first."
+
+
+def test_admonitions():
+    markdown = '!!! note "Heads up"\n    Indented body\n    over two lines.\n\nAfter'
+    assert markdown_to_text(markdown) == "> Heads up: Indented body over two lines.\n\nAfter"
+
+
+def test_front_matter_comments_and_reference_links_are_dropped():
+    markdown = "---\ntitle: Page\n---\n# Page\n\n<!-- hidden -->\n\n[ref]: https://example.com\n\nText"
+    assert markdown_to_text(markdown) == "# Page\n\nText"
+
+
+def test_code_spans_keep_their_markup():
+    assert markdown_to_text("Use `**kwargs` with **care**") == "Use `**kwargs` with care"
+
+
+def test_is_local():
+    assert is_local("./docs/guide.md")
+    assert is_local("/srv/docs")
+    assert is_local("docs/C#.md")
+    assert is_local("README.md")
+    assert is_local("file:///srv/docs/guide.md")
+    assert not is_local("https://example.com/docs")
+    assert not is_local("example.com/page")
+    assert not is_local("docs.example.com/guide/intro")
+
+
+def test_local_path_decodes_file_urls():
+    assert local_path("file:///srv/docs/C%23.md") == "/srv/docs/C#.md"
+    assert local_path("docs/guide.md") == "docs/guide.md"
+
+
+def test_read_local_document(tmp_path):
+    (tmp_path / "guide.md").write_text("# Guide\n\nStep one.", encoding="utf-8")
+    (tmp_path / "page.html").write_text("<h1>Page</h1>", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("  plain  \n", encoding="utf-8")
+
+    assert read_local_document(str(tmp_path / "guide.md"))[:2] == ("# Guide\n\nStep one.", False)
+    assert read_local_document(str(tmp_path / "page.html"))[:2] == ("<h1>Page</h1>", True)
+    assert read_local_document(str(tmp_path / "notes.txt")) == ("plain", False, 10)
+
+
+def test_iter_local_inputs_scans_directories_in_order(tmp_path):
+    (tmp_path / "b.md").write_text("# B")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "page.html").write_text("<p>A</p>")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "skip.md").write_text("# Skip")
+    (tmp_path / "image.png").write_bytes(b"")
+    rows = list(iter_local_inputs(str(tmp_path)))
+    assert [row["document_url"] for row in rows] == [str(tmp_path / "a" / "page.html"), str(tmp_path / "b.md")]
+
+
+def test_iter_local_inputs_fails_before_iterating_when_nothing_matches(tmp_path):
+    with pytest.raises(ValueError, match="No documentation files"):
+        iter_local_inputs(str(tmp_path / "*.md"))
+
+
+def test_web_urls_are_never_local(tmp_path, monkeypatch):
+    # 'https://example.com/a' is also a relative path that could exist on disk
+    (tmp_path / "https:" / "example.com").mkdir(parents=True)
+    (tmp_path / "https:" / "example.com" / "a").write_text("secret")
+    monkeypatch.chdir(tmp_path)
+    assert not is_local("https://example.com/a")
@@ -0,0 +1,87 @@
+"""Tests for sitemap and link parsing."""
+
+import asyncio
+import gzip
+
+from doc2beat.sitemap import PageEntry, SiteDiscovery, extract_links, parse_sitemap
+
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://docs.example.com/a</loc><lastmod>2024-05-01</lastmod></url>
+  <url><loc> https://docs.example.com/b </loc></url>
+  <url><lastmod>2024-05-01</lastmod></url>
+</urlset>"""
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://docs.example.com/sitemap-1.xml</loc></sitemap>
+  <sitemap><loc>https://docs.example.com/sitemap-2.xml.gz</loc><lastmod>2024-01-01</lastmod></sitemap>
+</sitemapindex>"""
+
+
+def test_parse_urlset():
+    pages, sitemaps = parse_sitemap(URLSET)
+    assert pages == [
+        PageEntry("https://docs.example.com/a", "2024-05-01"),
+        PageEntry("https://docs.example.com/b", None),
+    ]
+    assert sitemaps == []
+
+
+def test_parse_sitemap_index():
+    pages, sitemaps = parse_sitemap(INDEX)
+    assert pages == []
+    assert sitemaps == ["https://docs.example.com/sitemap-1.xml", "https://docs.example.com/sitemap-2.xml.gz"]
+
+
+def test_parse_gzipped_sitemap():
+    assert parse_sitemap(gzip.compress(URLSET)) == parse_sitemap(URLSET)
+
+
+def test_parse_sitemap_without_namespace():
+    content = b"<urlset><url><loc>https://example.com/x</loc></url></urlset>"
+    assert parse_sitemap(content) == ([PageEntry("https://example.com/x")], [])
+
+
+def test_extract_links_resolves_and_filters():
+    html = """
+    <a href="/guide/intro#setup">Intro</a>
+    <a href="next.html">Next</a>
+    <a href="https://other.example.org/page">Other</a>
+    <a href="mailto:docs@example.com">Mail</a>
+    <a href="javascript:void(0)">JS</a>
+    <a name="anchor">No href</a>
+    """
+    assert extract_links(html, "https://docs.example.com/guide/start") == [
+        "https://docs.example.com/guide/intro",
+        "https://docs.example.com/guide/next.html",
+        "https://other.example.org/page",
+    ]
+
+
+class _Response:
+    def __init__(self, content: bytes):
+        self.status_code = 200
+        self.content = content
+
+
+class _SitemapFetcher:
+    """Serves fixed sitemap bodies by URL."""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+
+    async def get(self, url):
+        return _Response(self.bodies[url])
+
+
+def test_discovery_keeps_only_web_urls_from_a_sitemap():
+    sitemap = b"""<urlset>
+      <url><loc>https://docs.example.com/a</loc></url>
+      <url><loc>file:///etc/passwd</loc></url>
+      <url><loc>/home/user/creds.yaml</loc></url>
+    </urlset>"""
+    discovery = SiteDiscovery(_SitemapFetcher({"https://docs.example.com/sitemap.xml": sitemap}))
+    pages = asyncio.run(discovery.discover("https://docs.example.com/sitemap.xml"))
+    assert pages == [PageEntry("https://docs.example.com/a")]
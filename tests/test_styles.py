@@ -0,0 +1,42 @@
+"""Tests for parsing batched song style responses."""
+
+import json
+
+from doc2beat.styles import MAX_STYLE_CHARS, parse_styles
+
+
+def test_styles_object_with_ids():
+    response = json.dumps({"styles": [{"id": 2, "style": "jazz"}, {"id": 1, "style": "folk"}]})
+    assert parse_styles(response, 2) == ["folk", "jazz"]
+
+
+def test_bare_list_of_strings():
+    assert parse_styles('["synthwave", "  sea shanty  "]', 2) == ["synthwave", "sea shanty"]
+
+
+def test_code_fence_and_chatter_are_tolerated():
+    fenced = '```json\n{"styles": [{"id": 1, "style": "punk"}]}\n```'
+    assert parse_styles(fenced, 1) == ["punk"]
+    chatty = 'Here you go: {"styles": [{"id": 1, "style": "blues"}]} Enjoy!'
+    assert parse_styles(chatty, 1) == ["blues"]
+
+
+def test_missing_and_malformed_items_are_none():
+    response = json.dumps({"styles": [{"id": 1, "style": ""}, {"id": 3, "style": 42}, {"id": 9, "style": "x"}]})
+    assert parse_styles(response, 3) == [None, None, None]
+
+
+def test_duplicate_ids_keep_the_first_style():
+    response = json.dumps([{"id": 1, "style": "first"}, {"id": 1, "style": "second"}])
+    assert parse_styles(response, 2) == ["first", None]
+
+
+def test_unparseable_response():
+    assert parse_styles("no JSON here", 2) == [None, None]
+    assert parse_styles('{"styles": "not a list"}', 1) == [None]
+
+
+def test_long_styles_are_truncated():
+    style = parse_styles(json.dumps(["a" * (MAX_STYLE_CHARS + 50)]), 1)[0]
+    assert len(style) == MAX_STYLE_CHARS
+    assert style.endswith("...")
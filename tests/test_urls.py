@@ -0,0 +1,49 @@
+"""Tests for URL normalization and document keys."""
+
+import os
+
+from doc2beat.urls import document_key, normalize_url
+
+
+def test_normalize_url_lowercases_scheme_and_host():
+    assert normalize_url("HTTPS://Docs.Example.COM/Guide") == "https://docs.example.com/Guide"
+
+
+def test_normalize_url_drops_default_port_and_fragment():
+    assert normalize_url("https://example.com:443/a#intro") == "https://example.com/a"
+    assert normalize_url("http://example.com:8080/a") == "http://example.com:8080/a"
+
+
+def test_normalize_url_adds_root_path():
+    assert normalize_url("https://example.com") == "https://example.com/"
+
+
+def test_normalize_url_removes_tracking_and_sorts_query():
+    url = "https://example.com/a?utm_source=x&b=2&gclid=abc&a=1&fbclid=y"
+    assert normalize_url(url) == "https://example.com/a?a=1&b=2"
+
+
+def test_normalize_url_keeps_blank_parameters():
+    assert normalize_url("https://example.com/a?flag=&x=1") == "https://example.com/a?flag=&x=1"
+
+
+def test_document_key_normalizes_web_urls():
+    assert document_key("https://Example.com/a?utm_medium=b#top") == "https://example.com/a"
+
+
+def test_document_key_keeps_hash_and_question_mark_in_file_names(tmp_path):
+    first = tmp_path / "C#.md"
+    second = tmp_path / "C#intro.md"
+    first.write_text("# C sharp")
+    second.write_text("# Intro")
+    assert document_key(str(first)) == os.path.realpath(first)
+    assert document_key(str(first)) != document_key(str(second))
+    assert document_key(str(tmp_path / "what?.md")) == os.path.realpath(tmp_path / "what?.md")
+
+
+def test_document_key_matches_spellings_of_the_same_file(tmp_path, monkeypatch):
+    (tmp_path / "guide.md").write_text("# Guide")
+    monkeypatch.chdir(tmp_path)
+    key = document_key("guide.md")
+    assert document_key("./guide.md") == key
+    assert document_key(f"file://{tmp_path}/guide.md") == key